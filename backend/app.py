@@ -1,14 +1,127 @@
 """ FastAPI application to generate conversations using the DualChatbot class. """
 
+import asyncio
+import contextvars
+import hmac
+import json
 import os
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import (
+    JSONResponse, PlainTextResponse, Response, StreamingResponse
+)
 from pydantic import BaseModel
-from src.chatbot import DualChatbot
+from src.chatbot import AUDIO_SPEECH, EXCHANGE_COUNTS, GENERATION_MODES
+from src.idempotency import ExchangeConflict, InFlight, serve_exchange_once
+from src.llm_pool import LLMPool
+from src.metrics import (
+    ACTIVE_SESSIONS, METRICS_CONTENT_TYPE, REQUEST_LATENCY, TURN_REQUESTS,
+    format_server_timing, mark_worker_stopped, render_metrics,
+    request_llm_calls, request_timings, set_on_scrape, start_request_timings,
+    timings_in_ms
+)
+from src.profiling import RequestProfiler, run_profiled
+from src.request_log import RequestLog, build_record
+from src.semantic_cache import SemanticCache, cached_step, create_embedder
+from src.session_store import create_session_store
+from src.warmup import Warmup
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Warm up the LLM servers in the background while the backend starts, and
+    drop the live metrics of the worker when it stops.
+
+    Args:
+        app (FastAPI): The application.
+
+    Yields:
+        None
+    """
+    warmup.start()
+    yield
+    warmup.stop()
+    mark_worker_stopped()
+
+
+app = FastAPI(lifespan=lifespan)
 # Use the llamafile server URL
 LLM_SERVER = os.environ.get('LLM_SERVER', 'http://localhost:8080')
 
+# Spread the sessions over several LLM servers with a comma-separated
+# LLM_SERVERS. Each session sticks to one server, and fan-out requests run
+# at most LLM_CONCURRENCY sessions at once per server, e.g. the --parallel
+# slots of llama.cpp.
+LLM_SERVERS = [server.strip() for server in
+               os.environ.get('LLM_SERVERS', LLM_SERVER).split(',')
+               if server.strip()]
+LLM_CONCURRENCY = int(os.environ.get('LLM_CONCURRENCY', '4'))
+llm_pool = LLMPool(LLM_SERVERS, concurrency=LLM_CONCURRENCY)
+
+# Warm up the LLM servers before reporting ready on /ready: 'prompts' primes
+# the system prompts of the common sessions, one per slot, 'connect' only
+# waits until the servers answer and 'off' reports ready at once. With
+# WARMUP_LOCK_DIR, a directory emptied before the workers start, only one
+# worker warms up each server.
+WARMUP = os.environ.get('WARMUP', 'prompts')
+warmup = Warmup(LLM_SERVERS, mode=WARMUP, slots=LLM_CONCURRENCY,
+                lock_dir=os.environ.get('WARMUP_LOCK_DIR') or None)
+
+# Keep sessions in the configured store, so any worker can serve them.
+# Use 'sqlite:////path/to/sessions.db' or 'redis://host:port/db' when running
+# more than one worker.
+SESSION_STORE = os.environ.get('SESSION_STORE', 'memory://')
+session_store = create_session_store(SESSION_STORE)
+set_on_scrape(ACTIVE_SESSIONS, session_store.count)
+
+# Share the exchanges being generated with the retries of their requests
+exchanges_in_flight = InFlight()
+
+# Serve the opening exchange or the script of new sessions similar to a
+# cached one, e.g. 'in a restaurant' after 'at a restaurant', without LLM
+# calls. Disabled unless SEMANTIC_CACHE is set; the threshold is the lowest
+# similarity of the roles and of the scenario served as a hit, by default that
+# of the embedder. SEMANTIC_CACHE_MODEL names a sentence-embedding model that
+# also matches synonyms, used when sentence-transformers is installed.
+SEMANTIC_CACHE = os.environ.get('SEMANTIC_CACHE', '').lower() in (
+    '1', 'true', 'yes')
+semantic_cache = SemanticCache(
+    threshold=float(os.environ['SEMANTIC_CACHE_THRESHOLD'])
+    if os.environ.get('SEMANTIC_CACHE_THRESHOLD') else None,
+    embed=create_embedder(os.environ.get('SEMANTIC_CACHE_MODEL')),
+    max_entries=int(os.environ.get('SEMANTIC_CACHE_SIZE', '1000')),
+    eviction=os.environ.get('SEMANTIC_CACHE_EVICTION', 'lru'),
+    ttl=float(os.environ['SEMANTIC_CACHE_TTL'])
+    if os.environ.get('SEMANTIC_CACHE_TTL') else None
+) if SEMANTIC_CACHE else None
+
+# Define the session used by clients that do not send a session id
+DEFAULT_SESSION_ID = 'default'
+
+# Define the largest number of variants of a /generate_variants request
+MAX_VARIANTS = 8
+
+# Enable the /admin endpoints by setting a token, sent as X-Admin-Token
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+profiler = RequestProfiler()
+
+# Define the largest number of requests profiled at once
+MAX_PROFILED_REQUESTS = 100
+
+# Log the POST requests of a sample of the sessions to a JSON Lines file, to
+# be replayed with benchmarks/replay.py. Payloads hold the learner's roles and
+# scenario, so they are only logged with REQUEST_LOG_PAYLOADS set.
+REQUEST_LOG = os.environ.get('REQUEST_LOG')
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', '1'))
+REQUEST_LOG_PAYLOADS = os.environ.get('REQUEST_LOG_PAYLOADS', '').lower() in (
+    '1', 'true', 'yes')
+request_log = RequestLog(REQUEST_LOG, sample_rate=REQUEST_LOG_SAMPLE_RATE,
+                         payloads=REQUEST_LOG_PAYLOADS) if REQUEST_LOG else None
+
 
 class ConversationRequest(BaseModel):
     """
@@ -21,6 +134,14 @@ class ConversationRequest(BaseModel):
         proficiency_level (str): The proficiency level of the language learner.
         learning_mode (str): The learning mode ('Conversation' or 'Debate').
         session_length (str): The length of the session ('Short' or 'Long').
+        generation_mode (str): 'Dialogue' to let two chatbots alternate turns,
+          or 'Script' to write the whole script in one completion.
+        session_id (str): The id of the conversation session.
+        exchange_index (int): The index of the requested exchange, from 0,
+          which makes the request idempotent: a retry gets the same exchange
+          instead of the next one.
+        debug (bool): Whether to include the timing breakdown and the LLM
+          calls in the response.
     """
     engine: str
     role_dict: dict
@@ -29,6 +150,10 @@ class ConversationRequest(BaseModel):
     proficiency_level: str
     learning_mode: str
     session_length: str
+    generation_mode: str = 'Dialogue'
+    session_id: Optional[str] = None
+    exchange_index: Optional[int] = None
+    debug: bool = False
 
 
 class ConversationResponse(BaseModel):
@@ -39,15 +164,149 @@ class ConversationResponse(BaseModel):
         response2 (str): The response from the second chatbot.
         translate1 (str): The translation of the first response.
         translate2 (str): The translation of the second response.
+        complete (bool): Whether the conversation has come to a natural end,
+          so further exchanges can be skipped.
+        timings (dict): The time spent per stage, when requested with debug.
+        llm_calls (list): The purpose, timings and token counts of every LLM
+          call, when requested with debug.
     """
     response1: str
     response2: str
     translate1: str
     translate2: str
+    complete: bool = False
+    timings: Optional[dict] = None
+    llm_calls: Optional[list] = None
+
+
+class FanoutRequest(BaseModel):
+    """
+    Pydantic model to define the request schema for generating the same
+    scenario in several languages.
+    Attributes:
+        engine (str): The type of engine to use for the chatbots.
+        role_dict (dict): The dictionary containing the roles for each chatbot.
+        scenario (str): The scenario of the conversation.
+        proficiency_level (str): The proficiency level of the language learner.
+        learning_mode (str): The learning mode ('Conversation' or 'Debate').
+        session_length (str): The length of the session ('Short' or 'Long').
+        generation_mode (str): 'Dialogue' or 'Script', see ConversationRequest.
+        languages (list): The languages of the sessions. Defaults to all
+          supported languages.
+        exchanges (int): The exchanges per session. Defaults to the length of
+          the session.
+        session_id (str): The prefix of the ids the sessions are saved under,
+          as '<session_id>-<language>', or None not to save them.
+    """
+    engine: str
+    role_dict: dict
+    scenario: str
+    proficiency_level: str
+    learning_mode: str
+    session_length: str
+    generation_mode: str = 'Dialogue'
+    languages: List[str] = list(AUDIO_SPEECH)
+    exchanges: Optional[int] = None
+    session_id: Optional[str] = None
+
+
+class VariantsRequest(ConversationRequest):
+    """
+    Pydantic model to define the request schema for generating alternative
+    versions of a conversation.
+    Attributes:
+        variants (int): The number of variants, at most MAX_VARIANTS.
+        exchanges (int): The exchanges per variant. Defaults to the rest of
+          the session.
+    """
+    variants: int = 3
+    exchanges: Optional[int] = None
+
 
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """
+    Middleware to time every request, profile it when profiling is armed and
+    log it when it belongs to a sampled session.
 
-# Global variable to store the DualChatbot instance
-dual_chatbot = None
+    The end-to-end latency is recorded per endpoint and the time spent per
+    stage is returned in the Server-Timing header.
+
+    Args:
+        request (Request): The incoming request.
+        call_next (callable): The next handler.
+
+    Returns:
+        Response: The response of the endpoint.
+    """
+    endpoint = request.url.path
+    if endpoint not in ENDPOINTS:
+        endpoint = 'other'
+    timings = start_request_timings()
+    arrival = time.time()
+    start = time.perf_counter()
+    body = None
+    if endpoint.startswith('/admin') or endpoint in ('/metrics', '/ready'):
+        response = await call_next(request)
+    else:
+        if request_log is not None and request.method == 'POST':
+            body = await request.body()
+        with profiler.profile():
+            response = await call_next(request)
+    total = time.perf_counter() - start
+    REQUEST_LATENCY.labels(endpoint).observe(total)
+    response.headers['Server-Timing'] = format_server_timing(timings, total)
+    if body is not None:
+        log_request(request, response, body, arrival, total, timings)
+    return response
+
+
+def log_request(request, response, body, arrival, total, timings):
+    """
+    Write the record of a request to the request log, if its session is
+    sampled.
+
+    Args:
+        request (Request): The request.
+        response (Response): The response of the endpoint.
+        body (bytes): The body of the request.
+        arrival (float): The arrival time of the request, as a Unix timestamp.
+        total (float): The time to serve the request, in seconds.
+        timings (dict): The time spent per stage, in seconds.
+    """
+    try:
+        body = json.loads(body) if body else None
+    except ValueError:
+        body = None
+    query = dict(request.query_params)
+    session_id = (body.get('session_id') if isinstance(body, dict) else None) \
+        or query.get('session_id') or DEFAULT_SESSION_ID
+    if not request_log.sampled(session_id):
+        return
+    request_log.write(build_record(
+        arrival, request.url.path, request.method, response.status_code,
+        session_id, body, query, total, timings_in_ms(timings),
+        request_llm_calls(), payloads=request_log.payloads
+    ))
+
+
+async def run_blocking(function):
+    """
+    Run a blocking call of a request, such as a session store or LLM call, in
+    a worker thread, so the event loop keeps serving other requests.
+
+    The call runs in a copy of the request's context, so its stage timings
+    and LLM calls are still recorded with the request, and it is profiled
+    with the request.
+
+    Args:
+        function (callable): Called without arguments.
+
+    Returns:
+        The result of the function.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, partial(contextvars.copy_context().run, run_profiled, function))
 
 
 @app.post("/generate_conversation", response_model=ConversationResponse)
@@ -59,16 +318,292 @@ async def generate_conversation(request: ConversationRequest):
         request (ConversationRequest): The request parameters for generating the
           conversation.
 
+    The exchange is generated in a worker thread. Requests with an
+    exchange_index are idempotent: the exchange is generated once and retries
+    get it again, see src/idempotency.py.
+
     Returns:
         ConversationResponse: The responses and translations from both chatbots.
 
     Raises:
-        HTTPException: If there is an error during the conversation generation.
+        HTTPException: If the requested exchange is neither the latest nor the
+          next one, or if there is an error during the conversation generation.
+    """
+    session_id = request.session_id or DEFAULT_SESSION_ID
+    try:
+        llm_server = llm_pool.server_for(session_id)
+        if request.exchange_index is None:
+            dual_chatbot, exchange = await run_blocking(partial(
+                serve_exchange, request, session_id, llm_server))
+        else:
+            dual_chatbot, exchange = await exchanges_in_flight.run(
+                (session_id, request.exchange_index),
+                partial(serve_exchange_once, session_store, session_id,
+                        request.exchange_index,
+                        partial(open_session, request, session_id, llm_server),
+                        partial(advance_session, session_id)))
+        response1, response2, translate1, translate2 = exchange
+        return ConversationResponse(
+            response1=response1,
+            response2=response2,
+            translate1=translate1,
+            translate2=translate2,
+            complete=dual_chatbot.ended,
+            timings=timings_in_ms(request_timings()) if request.debug else None,
+            llm_calls=request_llm_calls() if request.debug else None
+        )
+    except ExchangeConflict as e:
+        TURN_REQUESTS.labels('conflict').inc()
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def open_session(request, session_id, llm_server):
+    """
+    Load a session, or create it from a conversation request.
+
+    Args:
+        request (ConversationRequest): The conversation request.
+        session_id (str): The id of the session.
+        llm_server (str): The URL of the LLM server of the session.
+
+    Returns:
+        DualChatbot: The session.
+
+    Raises:
+        HTTPException: If the session does not exist and the generation mode
+          is unsupported.
+    """
+    dual_chatbot = session_store.load(session_id, llm_server)
+    if dual_chatbot is None:
+        if request.generation_mode not in GENERATION_MODES:
+            raise HTTPException(status_code=400,
+                                detail="Unsupported generation mode.")
+        dual_chatbot = GENERATION_MODES[request.generation_mode](
+            request.engine,
+            request.role_dict,
+            request.language,
+            request.scenario,
+            request.proficiency_level,
+            request.learning_mode,
+            request.session_length,
+            llm_server=llm_server
+        )
+    return dual_chatbot
+
+
+def serve_exchange(request, session_id, llm_server):
+    """
+    Generate the next exchange of a session, creating it if needed.
+
+    Args:
+        request (ConversationRequest): The conversation request.
+        session_id (str): The id of the session.
+        llm_server (str): The URL of the LLM server of the session.
+
+    Returns:
+        tuple: The session and the responses and translations from both
+        chatbots.
+    """
+    dual_chatbot = open_session(request, session_id, llm_server)
+    return dual_chatbot, advance_session(session_id, dual_chatbot)
+
+
+def summarize_session(session_id):
+    """
+    Summarize the key learning points of a stored session.
+
+    Args:
+        session_id (str): The id of the session.
+
+    Returns:
+        str: The summary.
+
+    Raises:
+        HTTPException: If the session does not exist.
+    """
+    dual_chatbot = session_store.load(session_id,
+                                      llm_pool.server_for(session_id))
+    if dual_chatbot is None:
+        raise HTTPException(status_code=400,
+                            detail="No conversation has been generated yet.")
+    return dual_chatbot.summary()
+
+
+def advance_session(session_id, dual_chatbot):
+    """
+    Generate the next exchange of a session and save the session.
+
+    Args:
+        session_id (str): The id of the session.
+        dual_chatbot (DualChatbot): The session.
+
+    Returns:
+        tuple: The responses and translations from both chatbots.
+    """
+    if semantic_cache is not None:
+        exchange = cached_step(semantic_cache, dual_chatbot)
+    else:
+        exchange = dual_chatbot.step()
+    session_store.save(session_id, dual_chatbot)
+    return exchange
+
+
+def run_fanout_session(request, language, llm_server):
+    """
+    Generate a whole session of a fan-out request.
+
+    Args:
+        request (FanoutRequest): The fan-out request.
+        language (str): The language of the session.
+        llm_server (str): The URL of the LLM server to use.
+
+    Returns:
+        dict: The language, the exchanges, whether the conversation came to a
+        natural end, the time taken and the id the session was saved under,
+        or the error that stopped the session.
+    """
+    start = time.perf_counter()
+    result = {'language': language, 'exchanges': []}
+    try:
+        dual_chatbot = GENERATION_MODES[request.generation_mode](
+            request.engine,
+            {key: dict(role) for key, role in request.role_dict.items()},
+            language,
+            request.scenario,
+            request.proficiency_level,
+            request.learning_mode,
+            request.session_length,
+            llm_server=llm_server
+        )
+        exchanges = request.exchanges or \
+            EXCHANGE_COUNTS[request.session_length][request.learning_mode]
+        while len(result['exchanges']) < exchanges and not dual_chatbot.ended:
+            if semantic_cache is not None:
+                exchange = cached_step(semantic_cache, dual_chatbot)
+            else:
+                exchange = dual_chatbot.step()
+            result['exchanges'].append(dict(zip(
+                ('response1', 'response2', 'translate1', 'translate2'),
+                exchange)))
+        result['complete'] = dual_chatbot.ended
+        if request.session_id:
+            result['session_id'] = f"{request.session_id}-{language}"
+            session_store.save(result['session_id'], dual_chatbot)
+    except Exception as e:
+        result['error'] = str(e)
+    result['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+@app.post("/generate_fanout")
+async def generate_fanout(request: FanoutRequest):
+    """
+    Endpoint to generate the same scenario in several languages at once.
+
+    The sessions run concurrently on the LLM pool, at most LLM_CONCURRENCY
+    per server, and each one is streamed as a line of JSON as soon as it is
+    done, so the fastest languages arrive first.
+
+    Args:
+        request (FanoutRequest): The scenario and the languages.
+
+    Returns:
+        StreamingResponse: One JSON object per language, see
+        run_fanout_session(), as newline-delimited JSON.
+
+    Raises:
+        HTTPException: If a language or the generation mode is unsupported.
+    """
+    unsupported = [language for language in request.languages
+                   if language not in AUDIO_SPEECH]
+    if unsupported or not request.languages:
+        raise HTTPException(status_code=400, detail="Unsupported languages: "
+                            f"{', '.join(unsupported) or 'none given'}.")
+    if request.generation_mode not in GENERATION_MODES:
+        raise HTTPException(status_code=400,
+                            detail="Unsupported generation mode.")
+    sessions = [
+        asyncio.wrap_future(llm_pool.submit(
+            partial(run_fanout_session, request, language)))
+        for language in dict.fromkeys(request.languages)
+    ]
+
+    async def results():
+        for session in asyncio.as_completed(sessions):
+            yield json.dumps(await session, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def continue_variant(fork, exchange, exchanges):
+    """
+    Generate the rest of a variant of a session.
+
+    Args:
+        fork (DualChatbot): The variant, one exchange after the branch point.
+        exchange (tuple): The first exchange of the variant.
+        exchanges (int): The exchanges of the variant, including the first.
+
+    Returns:
+        dict: The exchanges and whether the conversation came to a natural
+        end.
+    """
+    result = {'exchanges': [exchange]}
+    while len(result['exchanges']) < exchanges and not fork.ended:
+        result['exchanges'].append(fork.step())
+    result['exchanges'] = [
+        dict(zip(('response1', 'response2', 'translate1', 'translate2'),
+                 exchange))
+        for exchange in result['exchanges']
+    ]
+    result['complete'] = fork.ended
+    return result
+
+
+@app.post("/generate_variants")
+async def generate_variants(request: VariantsRequest):
+    """
+    Endpoint to generate alternative versions of a conversation.
+
+    The session is branched into forks sharing its turns so far. The turns
+    opening the variants, or their whole scripts in 'Script' mode, are
+    sampled in one completion, so the shared prompt is processed once; the
+    variants then continue concurrently on the LLM pool. Forks share the
+    client of their session, so all of this runs in slots of the session's
+    server, where the shared prompt is cached.
+
+    Args:
+        request (VariantsRequest): The conversation and the number of
+          variants. If session_id names a stored session, the variants branch
+          from it and are saved as '<session_id>-v<i>'; the session itself is
+          left as it is.
+
+    Returns:
+        dict: The variants, see continue_variant(), with the id each one was
+        saved under.
+
+    Raises:
+        HTTPException: If the number of variants or the generation mode is
+          unsupported, or if there is an error during the generation.
     """
-    global dual_chatbot
+    if not 1 <= request.variants <= MAX_VARIANTS:
+        raise HTTPException(status_code=400, detail="The number of variants "
+                            f"must be between 1 and {MAX_VARIANTS}.")
+    session_id = request.session_id or DEFAULT_SESSION_ID
     try:
+        llm_server = llm_pool.server_for(session_id)
+        dual_chatbot = await run_blocking(partial(
+            session_store.load, session_id, llm_server)) \
+            if request.session_id else None
         if dual_chatbot is None:
-            dual_chatbot = DualChatbot(
+            if request.generation_mode not in GENERATION_MODES:
+                raise HTTPException(status_code=400,
+                                    detail="Unsupported generation mode.")
+            dual_chatbot = GENERATION_MODES[request.generation_mode](
                 request.engine,
                 request.role_dict,
                 request.language,
@@ -76,17 +611,35 @@ async def generate_conversation(request: ConversationRequest):
                 request.proficiency_level,
                 request.learning_mode,
                 request.session_length,
-                llm_server=LLM_SERVER
+                llm_server=llm_server
             )
-        response1, response2, translate1, translate2 = dual_chatbot.step()
-        return ConversationResponse(
-            response1=response1,
-            response2=response2,
-            translate1=translate1,
-            translate2=translate2
-        )
+        exchanges = request.exchanges or max(
+            EXCHANGE_COUNTS[dual_chatbot.session_length][
+                dual_chatbot.learning_mode] - len(dual_chatbot.transcript) // 2,
+            1)
+        # Sampling the variants may send one call per variant at once
+        branches = await asyncio.wrap_future(llm_pool.submit(
+            lambda server: dual_chatbot.variants(request.variants),
+            server=llm_server, slots=request.variants))
+        variants = await asyncio.gather(*(
+            asyncio.wrap_future(llm_pool.submit(
+                lambda server, fork=fork, exchange=exchange: continue_variant(
+                    fork, exchange, exchanges),
+                server=llm_server))
+            for fork, exchange in branches
+        ))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if request.session_id:
+        for index, ((fork, _), variant) in enumerate(zip(branches, variants)):
+            variant['session_id'] = f"{session_id}-v{index}"
+            await run_blocking(partial(session_store.save,
+                                       variant['session_id'], fork))
+    return {"variants": variants}
 
 
 @app.post("/generate_summary")
@@ -105,27 +658,31 @@ async def generate_summary(request: ConversationRequest):
         HTTPException: If no conversation has been generated or if there is an error
           during the summary generation.
     """
-    global dual_chatbot
+    session_id = request.session_id or DEFAULT_SESSION_ID
     try:
-        if dual_chatbot is None:
-            raise HTTPException(status_code=400,
-                                detail="No conversation has been generated yet.")
-        summary = dual_chatbot.summary()
+        summary = await run_blocking(partial(summarize_session, session_id))
+        if request.debug:
+            return {"summary": summary, "timings": timings_in_ms(request_timings()),
+                    "llm_calls": request_llm_calls()}
         return {"summary": summary}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/reset_conversation")
-async def reset_conversation():
+async def reset_conversation(session_id: str = DEFAULT_SESSION_ID):
     """
     Endpoint to reset the conversation history.
 
+    Args:
+        session_id (str): The id of the conversation session to reset.
+
     Returns:
         dict: A message indicating that the conversation has been reset.
     """
-    global dual_chatbot
-    dual_chatbot = None
+    await run_blocking(partial(session_store.delete, session_id))
     return {"message": "Conversation reset successfully"}
 
 
@@ -138,3 +695,109 @@ async def root():
         dict: A message indicating that the Parrot-AI backend is running.
     """
     return {"message": "Parrot-AI backend is running"}
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness endpoint, answering with 200 once the warm-up is done and 503
+    before.
+
+    Returns:
+        JSONResponse: The progress of the warm-up and its duration.
+    """
+    return JSONResponse(warmup.status(),
+                        status_code=200 if warmup.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Endpoint to expose the backend metrics to Prometheus.
+
+    Returns:
+        PlainTextResponse: The metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+def check_admin_token(token):
+    """
+    Check the token sent to an admin endpoint.
+
+    Args:
+        token (str): The X-Admin-Token header of the request.
+
+    Raises:
+        HTTPException: If admin endpoints are disabled or the token is wrong.
+    """
+    if not ADMIN_TOKEN or token is None or not hmac.compare_digest(
+            token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Admin access denied.")
+
+
+@app.post("/admin/profile")
+async def arm_profiler(requests: int = 1,
+                       x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin endpoint to profile the next requests with cProfile.
+
+    The profiler runs on the event loop thread, so a profile also captures
+    the requests running alongside the profiled one, and in the worker
+    threads running the blocking calls of the profiled request.
+
+    Args:
+        requests (int): The number of requests to profile, from 1 to
+          MAX_PROFILED_REQUESTS.
+        x_admin_token (str): The admin token.
+
+    Returns:
+        dict: The state of the profiler.
+
+    Raises:
+        HTTPException: If the token is wrong or the number of requests is out
+          of range.
+    """
+    check_admin_token(x_admin_token)
+    if not 1 <= requests <= MAX_PROFILED_REQUESTS:
+        raise HTTPException(status_code=400, detail="The number of requests "
+                            f"must be between 1 and {MAX_PROFILED_REQUESTS}.")
+    profiler.arm(requests)
+    return profiler.status()
+
+
+@app.get("/admin/profile")
+async def download_profile(text: bool = False,
+                           x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin endpoint to download the aggregated profile.
+
+    Args:
+        text (bool): Whether to return a text report sorted by cumulative
+          time instead of a file loadable with pstats or snakeviz.
+        x_admin_token (str): The admin token.
+
+    Returns:
+        Response: The profile.
+
+    Raises:
+        HTTPException: If no request has been profiled yet.
+    """
+    check_admin_token(x_admin_token)
+    if text:
+        report = profiler.report()
+        if report is not None:
+            return PlainTextResponse(report)
+    else:
+        data = profiler.dump()
+        if data is not None:
+            return Response(
+                data, media_type="application/octet-stream",
+                headers={"Content-Disposition":
+                         'attachment; filename="parrot-ai.prof"'}
+            )
+    raise HTTPException(status_code=404, detail="No request has been profiled.")
+
+
+# Define the endpoints whose latency is recorded under their own label
+ENDPOINTS = {route.path for route in app.routes}
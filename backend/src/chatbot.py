@@ -2,16 +2,52 @@
 Module for chatbot interaction system.
 """
 
+import contextvars
+import json
 import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 from io import BytesIO
-from openai import OpenAI
+from openai import BadRequestError, OpenAI
 from dotenv import load_dotenv
 from gtts import gTTS
+from .metrics import (
+    COMPLETION_TOKENS, LLM_COALESCED, LLM_IN_FLIGHT, LLM_INTER_TOKEN, LLM_LATENCY,
+    LLM_TIME_TO_FIRST_TOKEN, PROMPT_TOKENS, STAGE_LATENCY, record_llm_call,
+    timed
+)
+from .profiling import run_profiled
+from .singleflight import SingleFlight
+from .termination import detect_conversation_end
+from .transcript import Transcript
 
 # Load environment variables
 load_dotenv()
 LLM_SERVER = os.environ.get('LLM_SERVER', 'http://localhost:8080')
 
+# Stream completions to measure the time to first token and the inter-token
+# latency of every LLM call
+STREAM_COMPLETIONS = os.environ.get('LLM_STREAM', '').lower() in ('1', 'true',
+                                                                  'yes')
+
+# Define how several variants of a completion are sampled: 'choices' asks for
+# them in one call with the n parameter, so the prompt is processed once, and
+# 'parallel' sends one call per variant, for servers without n support
+VARIANT_SAMPLING = os.environ.get('LLM_VARIANT_SAMPLING', 'choices')
+
+# Share identical LLM calls in flight at the same time, such as the opening
+# turns of sessions with the same settings, instead of sending each one.
+# Opt-in: with sampling on, learners sharing a call also share its sampled
+# completion, so enable it for greedy decoding or a fixed seed
+COALESCE_COMPLETIONS = os.environ.get('LLM_COALESCE', '0').lower() in (
+    '1', 'true', 'yes')
+
+# Define the LLM calls in flight in the worker, shared by identical calls
+IN_FLIGHT_COMPLETIONS = SingleFlight()
+
 # Define language codes for speech synthesis
 AUDIO_SPEECH = {
     'English': 'en',
@@ -21,6 +57,215 @@ AUDIO_SPEECH = {
     'French': 'fr'
 }
 
+# Define the number of exchanges per session length and learning mode
+EXCHANGE_COUNTS = {
+    'Short': {'Conversation': 4, 'Debate': 4},
+    'Long': {'Conversation': 8, 'Debate': 8}
+}
+
+# Define the maximum number of sentences per response for each proficiency level
+ARGUMENT_NUM_DICT = {
+    'Beginner': 4,
+    'Intermediate': 6,
+    'Advanced': 8
+}
+
+# Define the token budget of the conversation context sent with each request
+MAX_CONTEXT_TOKENS = 4096 - 500
+
+# Define the system prompt profiles: 'full' spells the instructions out and
+# 'compact' states the same instructions tersely, as the system prompt is
+# prefilled again by every turn and translation call
+PROMPT_PROFILES = ('full', 'compact')
+PROMPT_PROFILE = os.environ.get('PROMPT_PROFILE', 'full')
+
+# Define the token budget of a compact system prompt, measured with the
+# model's tokenizer by benchmarks/prompts.py
+COMPACT_PROMPT_TOKENS = 128
+
+# Define the input that asks the starting chatbot for the opening turn
+OPENING_INPUT = "Start the conversation."
+
+# Define the end-of-turn markers of the common chat templates
+CHAT_MARKERS = ['</s>', '[INST]', '<|im_end|>']
+
+# Define the token budget per sentence used to derive max_tokens ceilings,
+# and how many more tokens a sentence takes in languages the tokenizer
+# splits into short pieces
+TOKENS_PER_SENTENCE = 40
+LANGUAGE_TOKEN_FACTOR = {
+    'Hindi': 3
+}
+
+
+def max_response_tokens(proficiency_level, language='English'):
+    """
+    Derive the max_tokens ceiling of a single turn.
+
+    The ceiling follows the sentence limit of the proficiency level in
+    ARGUMENT_NUM_DICT, so a model that keeps talking is cut off instead of
+    generating a long monologue or its partner's lines.
+
+    Args:
+        proficiency_level (str): The proficiency level of the language learner.
+        language (str, optional): The language of the turn. Defaults to
+            'English'.
+
+    Returns:
+        int: The maximum number of tokens to generate.
+
+    Raises:
+        KeyError: If the proficiency level is unsupported.
+    """
+    return (
+        ARGUMENT_NUM_DICT[proficiency_level] * TOKENS_PER_SENTENCE
+        * LANGUAGE_TOKEN_FACTOR.get(language, 1)
+    )
+
+
+def language_requirement(proficiency_level):
+    """
+    Describe the language requirement for a proficiency level.
+
+    Args:
+        proficiency_level (str): The proficiency level of the language learner.
+
+    Returns:
+        str: The language requirement to include in a system message.
+
+    Raises:
+        KeyError: If the proficiency level is unsupported.
+    """
+    if proficiency_level == 'Beginner':
+        return (
+            "use basic and simple vocabulary and sentence structures. "
+            "Avoid idioms, slang, and complex grammatical constructs."
+        )
+    if proficiency_level == 'Intermediate':
+        return (
+            "use a moderate range of vocabulary and varied sentence "
+            "structures. You can include some common idioms and "
+            "colloquial expressions, but avoid highly technical language "
+            "or complex literary expressions."
+        )
+    if proficiency_level == 'Advanced':
+        return (
+            "use sophisticated vocabulary, complex sentence structures, "
+            "idioms, colloquial expressions, and technical language "
+            "where appropriate."
+        )
+    raise KeyError('Currently unsupported proficiency level!')
+
+
+def compact_language_requirement(proficiency_level):
+    """
+    Describe the language requirement for a proficiency level tersely.
+
+    Args:
+        proficiency_level (str): The proficiency level of the language learner.
+
+    Returns:
+        str: The language requirement to include in a compact system message.
+
+    Raises:
+        KeyError: If the proficiency level is unsupported.
+    """
+    if proficiency_level == 'Beginner':
+        return "basic words and simple sentences, no idioms or slang"
+    if proficiency_level == 'Intermediate':
+        return ("everyday words, varied sentences, some common idioms, "
+                "nothing technical or literary")
+    if proficiency_level == 'Advanced':
+        return ("rich vocabulary, complex sentences, idioms and technical "
+                "terms where fitting")
+    raise KeyError('Currently unsupported proficiency level!')
+
+
+def parse_script(text, speakers):
+    """
+    Split a speaker-tagged script into turns.
+
+    Every line starting with one of the speaker names followed by a colon
+    opens a new turn; untagged lines are appended to the current turn, and
+    consecutive turns of the same speaker are merged.
+
+    Args:
+        text (str): The generated script, one "Name: text" line per turn.
+        speakers (list): The speaker names to look for.
+
+    Returns:
+        list: The turns as (speaker, text) tuples, speaker names normalized
+        to the given spelling.
+    """
+    by_lower = {name.lower(): name for name in speakers}
+    pattern = re.compile(
+        r"^[\s*_>#-]*(" + "|".join(re.escape(name) for name in speakers)
+        + r")[\s*_]*:[\s*_]*(.*)$",
+        re.IGNORECASE
+    )
+    turns = []
+    for line in text.replace("</s>", "").splitlines():
+        match = pattern.match(line)
+        if match:
+            speaker = by_lower[match.group(1).lower()]
+            line_text = match.group(2).strip()
+            if turns and turns[-1][0] == speaker:
+                turns[-1] = (speaker, f"{turns[-1][1]} {line_text}".strip())
+            else:
+                turns.append((speaker, line_text))
+        elif turns and line.strip():
+            turns[-1] = (turns[-1][0], f"{turns[-1][1]} {line.strip()}".strip())
+    return [turn for turn in turns if turn[1]]
+
+
+def server_finish_reason(choice, stop):
+    """
+    Read the finish reason of a choice, telling stop sequences apart.
+
+    Servers that honor the stop parameter leave the stop sequence out of the
+    completion and report 'stop' as at the end of a turn. The sequence they
+    stopped at is reported apart: as stop_reason by vLLM, and as
+    stopping_word or stopped_word by llama.cpp servers.
+
+    Args:
+        choice: A choice of a chat completion or of a streamed chunk.
+        stop (list): The sequences that end the generation, or None.
+
+    Returns:
+        str: The finish reason, 'stop_sequence' when the server stopped at one
+        of the stop sequences, or None if none was reported.
+    """
+    finish_reason = getattr(choice, 'finish_reason', None)
+    if finish_reason != 'stop' or not stop:
+        return finish_reason
+    for field in ('stop_reason', 'stopping_word', 'stopped_word'):
+        word = getattr(choice, field, None)
+        if isinstance(word, str) and word in stop:
+            return 'stop_sequence'
+    return finish_reason
+
+
+def run_in_parallel(function, items):
+    """
+    Call a function on every item in its own thread.
+
+    Each call runs in a copy of the caller's context, so its LLM calls and
+    timings are still recorded with the current request, and it is profiled
+    with the request.
+
+    Args:
+        function (callable): Called with one item.
+        items (list): The items.
+
+    Returns:
+        list: The results, in the order of the items.
+    """
+    with ThreadPoolExecutor(max_workers=max(len(items), 1)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, run_profiled,
+                                   function, item)
+                   for item in items]
+        return [future.result() for future in futures]
+
 
 class Chatbot:
     """
@@ -29,16 +274,33 @@ class Chatbot:
     Attributes:
         client (OpenAI): The OpenAI client for interacting with the language
         model.
-        memory (list): The conversation history.
+        transcript (Transcript): The conversation history, shared with the
+        partner chatbot in a dual chatbot system.
         prompt (str): The system prompt for the chatbot.
+        usage (dict): The number of LLM calls and the prompt and completion
+        tokens reported by the language model.
+        finish_reasons (Counter): How often each finish reason was reported,
+        e.g. 'stop' at the end of a turn, 'stop_sequence' when a stop
+        sequence ended the completion, whether the server reported the
+        sequence it stopped at or the completion was cut off here, and
+        'length' when the max_tokens ceiling cut the completion off.
+        stream (bool): Whether completions are streamed, see
+        STREAM_COMPLETIONS.
+        variant_sampling (str): How several variants of a completion are
+        sampled, see VARIANT_SAMPLING.
+        coalesce (bool): Whether identical calls in flight share one
+        completion, see COALESCE_COMPLETIONS.
     """
 
-    def __init__(self, engine, llm_server):
+    def __init__(self, engine, llm_server, transcript=None):
         """
         Initialize the Chatbot with a specific engine.
 
         Args:
             engine (str): The type of engine to use for the chatbot.
+            llm_server (str): The URL of the language model server.
+            transcript (Transcript, optional): The transcript to read and
+              append to. Defaults to a new, private transcript.
 
         Raises:
             KeyError: If the engine type is unsupported.
@@ -50,12 +312,37 @@ class Chatbot:
             )
         else:
             raise KeyError("Currently unsupported language model type!")
-        self.memory = []
+        self.llm_server = llm_server
+        self.transcript = transcript if transcript is not None else Transcript()
         self.prompt = None
+        self.usage = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self.finish_reasons = Counter()
+        self.stream = STREAM_COMPLETIONS
+        self.variant_sampling = VARIANT_SAMPLING
+        self.coalesce = COALESCE_COMPLETIONS
+
+    def fork(self, transcript):
+        """
+        Copy the instructed chatbot for a fork of the session.
+
+        The copy shares the client and the system prompt, and starts with its
+        own usage and finish reasons.
+
+        Args:
+            transcript (Transcript): The transcript of the fork.
+
+        Returns:
+            Chatbot: The copy, reading and appending to the given transcript.
+        """
+        fork = copy(self)
+        fork.transcript = transcript
+        fork.usage = dict.fromkeys(self.usage, 0)
+        fork.finish_reasons = Counter()
+        return fork
 
     def instruct(
         self, role, oppo_role, language, scenario, session_length,
-        proficiency_level, learning_mode, starter=False
+        proficiency_level, learning_mode, starter=False, prompt_profile=None
     ):
         """
         Instruct the chatbot with specific conversation parameters.
@@ -73,6 +360,8 @@ class Chatbot:
             ('Conversation' or 'Debate').
             starter (bool, optional): Whether the chatbot starts the
             conversation. Defaults to False.
+            prompt_profile (str, optional): The system prompt profile, see
+            PROMPT_PROFILES. Defaults to PROMPT_PROFILE.
         """
         self.role = role
         self.oppo_role = oppo_role
@@ -82,7 +371,14 @@ class Chatbot:
         self.proficiency_level = proficiency_level
         self.learning_mode = learning_mode
         self.starter = starter
-        self.prompt = self._specify_system_message()
+        self.prompt_profile = prompt_profile or PROMPT_PROFILE
+        with timed(STAGE_LATENCY, 'system_prompt'):
+            if self.prompt_profile == 'full':
+                self.prompt = self._specify_system_message()
+            elif self.prompt_profile == 'compact':
+                self.prompt = self._specify_compact_message()
+            else:
+                raise KeyError('Currently unsupported prompt profile!')
 
     def _specify_system_message(self):
         """
@@ -94,41 +390,12 @@ class Chatbot:
         Raises:
             KeyError: If the proficiency level or learning mode is unsupported.
         """
-        exchange_counts_dict = {
-            'Short': {'Conversation': 4, 'Debate': 4},
-            'Long': {'Conversation': 8, 'Debate': 8}
-        }
         exchange_counts = (
-            exchange_counts_dict[self.session_length][self.learning_mode]
+            EXCHANGE_COUNTS[self.session_length][self.learning_mode]
         )
 
-        argument_num_dict = {
-            'Beginner': 4,
-            'Intermediate': 6,
-            'Advanced': 8
-        }
-
         # Define language requirements based on proficiency level
-        if self.proficiency_level == 'Beginner':
-            lang_requirement = (
-                "use basic and simple vocabulary and sentence structures. "
-                "Avoid idioms, slang, and complex grammatical constructs."
-            )
-        elif self.proficiency_level == 'Intermediate':
-            lang_requirement = (
-                "use a moderate range of vocabulary and varied sentence "
-                "structures. You can include some common idioms and "
-                "colloquial expressions, but avoid highly technical language "
-                "or complex literary expressions."
-            )
-        elif self.proficiency_level == 'Advanced':
-            lang_requirement = (
-                "use sophisticated vocabulary, complex sentence structures, "
-                "idioms, colloquial expressions, and technical language "
-                "where appropriate."
-            )
-        else:
-            raise KeyError('Currently unsupported proficiency level!')
+        lang_requirement = language_requirement(self.proficiency_level)
 
         # Define the prompt for Conversation mode
         if self.learning_mode == 'Conversation':
@@ -165,7 +432,7 @@ class Chatbot:
                 f"the debate topic.\n5. Use ONLY {self.language}. Do not "
                 f"translate or use any other language.\n6. {lang_requirement}\n"
                 f"7. Limit each of your responses to no more than "
-                f"{argument_num_dict[self.proficiency_level]} sentences.\n"
+                f"{ARGUMENT_NUM_DICT[self.proficiency_level]} sentences.\n"
                 f"8. The entire debate should not exceed {exchange_counts} "
                 f"exchanges.\n\nRemember: You are helping language learners "
                 f"practice {self.language} at a {self.proficiency_level} level."
@@ -188,15 +455,74 @@ class Chatbot:
 
         return prompt
 
-    def generate_response(self, input_text):
+    def _specify_compact_message(self):
+        """
+        Specify the compact system message, with the same instructions as
+        _specify_system_message() within COMPACT_PROMPT_TOKENS.
+
+        Returns:
+            str: The compact system message for the chatbot.
+
+        Raises:
+            KeyError: If the proficiency level or learning mode is unsupported.
+        """
+        exchange_counts = (
+            EXCHANGE_COUNTS[self.session_length][self.learning_mode]
+        )
+        lang_requirement = compact_language_requirement(self.proficiency_level)
+        name, oppo_name = self.role['name'], self.oppo_role['name']
+
+        if self.learning_mode == 'Conversation':
+            prompt = (
+                f"Role-play in {self.language} for {self.proficiency_level} "
+                f"learners.\nYou: {name} {self.role['action']}\nPartner: "
+                f"{oppo_name} {self.oppo_role['action']}\nScenario: "
+                f"{self.scenario}\nRules: one short turn as {name} only, "
+                f"never {oppo_name}'s lines; only {self.language}, no "
+                f"translations; {lang_requirement}; natural for "
+                f"{self.language}-speaking cultures; at most "
+                f"{exchange_counts} exchanges in total."
+            )
+        elif self.learning_mode == 'Debate':
+            prompt = (
+                f"Debate in {self.language} for {self.proficiency_level} "
+                f"learners.\nYou: {name}\nTopic: {self.scenario}\nRules: one "
+                f"argument as {name} only, never your opponent's; only "
+                f"{self.language}, no translations; {lang_requirement}; at "
+                f"most {ARGUMENT_NUM_DICT[self.proficiency_level]} sentences "
+                f"per turn; at most {exchange_counts} exchanges in total."
+            )
+        else:
+            raise KeyError('Currently unsupported learning mode!')
+
+        if self.starter:
+            prompt += "\nYou speak first: open with a fitting statement or question."
+        else:
+            prompt += f"\nReply to {oppo_name}."
+        return prompt
+
+    def generate_response(self, input_text, max_tokens=None, stop=None,
+                          context=True, purpose='turn', n=1):
         """
         Generate a response based on the input text.
 
         Args:
-            input_text (str): The input text from the user.
+            input_text (str): The input text from the user, or None to respond
+              to the latest turn of the transcript.
+            max_tokens (int, optional): The maximum number of tokens to
+              generate. Defaults to no limit.
+            stop (list, optional): The sequences that end the generation.
+              Defaults to none.
+            context (bool, optional): Whether to include the most recent
+              turns of the transcript. Defaults to True.
+            purpose (str, optional): What the call is for, used to label its
+              metrics. Defaults to 'turn'.
+            n (int, optional): The number of variants to generate, see
+              complete(). Defaults to 1.
 
         Returns:
-            str: The generated response from the chatbot.
+            str: The generated response from the chatbot, or a list of n
+            responses if n > 1.
 
         Raises:
             ValueError: If the chatbot has not been instructed.
@@ -206,41 +532,307 @@ class Chatbot:
                 "Chatbot has not been instructed. "
                 "Call instruct() before generate_response()."
             )
-        messages = [
-            {"role": "system", "content": self.prompt},
-        ]
+        with timed(STAGE_LATENCY, 'context_assembly'):
+            messages = [
+                {"role": "system", "content": self.prompt},
+            ]
+            if context:
+                messages += self.transcript.view(self.role['name']).messages(
+                    MAX_CONTEXT_TOKENS)
+            if input_text is not None:
+                messages.append({"role": "user", "content": input_text})
+
+        return self.complete(messages, max_tokens=max_tokens, stop=stop,
+                             purpose=purpose, n=n)
+
+    def complete(self, messages, max_tokens=None, stop=None, purpose='turn',
+                 n=1):
+        """
+        Request a chat completion and record the token usage.
+
+        The statistics of the call are added to the current request, see
+        record_llm_call(): the purpose, the total time, the prompt, cached
+        prompt and completion tokens, and for streamed calls the time to
+        first token, the mean inter-token latency and the decode speed.
+
+        A call identical to one in flight, with the same messages, parameters
+        and server, waits for it and shares its completion, see coalesce.
 
-        max_tokens = 4096 - 500
-        context_tokens = 0
-        for mem in reversed(self.memory):
-            context_tokens += len(mem['text'].split())
-            if context_tokens > max_tokens:
-                break
-            messages.append({
-                "role": "user" if mem['role'] != self.role['name'] else "assistant",
-                "content": mem['text']
-            })
+        Several variants are sampled in one call with the n parameter, which
+        is never streamed. If the server rejects the parameter or returns
+        fewer choices, as llama.cpp servers without multiple completions do,
+        the missing variants are requested in parallel, so they run in the
+        server's parallel slots and reuse its cached prompt prefix. Variant
+        calls are never shared, as they have to differ.
 
-        messages.append({"role": "user", "content": input_text})
+        Args:
+            messages (list): The chat messages to send to the language model.
+            max_tokens (int, optional): The maximum number of tokens to
+              generate. Defaults to no limit.
+            stop (list, optional): The sequences that end the generation.
+              Defaults to none.
+            purpose (str, optional): What the call is for, used to label its
+              metrics. Defaults to 'turn'.
+            n (int, optional): The number of variants to generate. Defaults
+              to 1.
 
-        response = self.client.chat.completions.create(
+        Returns:
+            str: The generated completion, or a list of n completions if
+            n > 1.
+        """
+        if n == 1:
+            return self._request(messages, max_tokens, stop, purpose)[0]
+        variants = []
+        if self.variant_sampling == 'choices':
+            try:
+                variants = self._request(messages, max_tokens, stop, purpose, n,
+                                         coalesce=False)
+            except BadRequestError:
+                variants = []
+        missing = n - len(variants)
+        if missing > 0:
+            variants += run_in_parallel(
+                lambda _: self._request(messages, max_tokens, stop, purpose,
+                                        coalesce=False)[0],
+                range(missing))
+        return variants[:n]
+
+    def _request(self, messages, max_tokens, stop, purpose, n=1,
+                 coalesce=True):
+        """
+        Send one chat completion request and record its statistics.
+
+        A call sharing the completion of an identical call in flight is
+        recorded as coalesced, without tokens, as the LLM server only
+        processed the call it shares.
+
+        Args:
+            messages (list): The chat messages to send to the language model.
+            max_tokens (int): The maximum number of tokens to generate, or
+              None.
+            stop (list): The sequences that end the generation, or None.
+            purpose (str): What the call is for, used to label its metrics.
+            n (int, optional): The number of choices to ask for. Defaults
+              to 1.
+            coalesce (bool, optional): Whether the call may share the
+              completion of an identical call in flight, if the chatbot
+              coalesces calls. Defaults to True.
+
+        Returns:
+            list: The generated completions, one per returned choice.
+        """
+        params = {}
+        if max_tokens is not None:
+            params['max_tokens'] = max_tokens
+        if stop:
+            params['stop'] = stop
+        if n > 1:
+            params['n'] = n
+        start = time.perf_counter()
+        if coalesce and self.coalesce:
+            signature = (self.llm_server, self.stream,
+                         json.dumps([messages, params], sort_keys=True))
+            outcome, shared = IN_FLIGHT_COMPLETIONS.do(signature, lambda: self._send(
+                messages, stop, purpose, params, n))
+            contents, finish_reasons, usage, call = outcome
+        else:
+            contents, finish_reasons, usage, call = self._send(
+                messages, stop, purpose, params, n)
+            shared = False
+        call = {'purpose': purpose,
+                'total_ms': round((time.perf_counter() - start) * 1000, 1),
+                **call}
+        if shared:
+            LLM_COALESCED.labels(purpose).inc()
+            call = {key: value for key, value in call.items()
+                    if key in ('purpose', 'total_ms', 'streamed')}
+            call['coalesced'] = True
+        else:
+            self.usage['calls'] += 1
+            for key, counter in (('prompt_tokens', PROMPT_TOKENS),
+                                 ('completion_tokens', COMPLETION_TOKENS)):
+                tokens = getattr(usage, key, None)
+                if isinstance(tokens, int):
+                    self.usage[key] += tokens
+                    counter.labels(purpose).inc(tokens)
+                    call[key] = tokens
+            details = getattr(usage, 'prompt_tokens_details', None)
+            cached_tokens = getattr(details, 'cached_tokens', None)
+            if isinstance(cached_tokens, int):
+                call['cached_tokens'] = cached_tokens
+        record_llm_call(call)
+
+        # Servers that ignore the stop parameter still get cut at the first
+        # stop sequence, which is counted apart from a natural end of turn
+        cut_contents = []
+        for content, finish_reason in zip(contents, finish_reasons):
+            for sequence in stop or []:
+                if sequence in content:
+                    content = content.split(sequence, 1)[0]
+                    finish_reason = 'stop_sequence'
+            if isinstance(finish_reason, str):
+                self.finish_reasons[finish_reason] += 1
+            cut_contents.append(content)
+        return [content.replace("</s>", "").strip() for content in cut_contents]
+
+    def _send(self, messages, stop, purpose, params, n):
+        """
+        Send one chat completion request to the LLM server.
+
+        Args:
+            messages (list): The chat messages to send to the language model.
+            stop (list): The sequences that end the generation, or None.
+            purpose (str): What the call is for, used to label its metrics.
+            params (dict): The completion parameters.
+            n (int): The number of choices asked for.
+
+        Returns:
+            tuple: The contents and finish reasons of the returned choices,
+            the usage reported by the server or None, and the statistics of
+            the call.
+        """
+        with LLM_IN_FLIGHT.track_inprogress(), timed(LLM_LATENCY, purpose):
+            if self.stream and n == 1:
+                content, finish_reason, usage, call = self._stream_completion(
+                    messages, stop, purpose, params)
+                contents, finish_reasons = [content], [finish_reason]
+            else:
+                response = self.client.chat.completions.create(
+                    model="LLaMA_CPP",
+                    messages=messages,
+                    **params
+                )
+                choices = response.choices[:n] if n > 1 else [response.choices[0]]
+                contents = [choice.message.content for choice in choices]
+                finish_reasons = [server_finish_reason(choice, stop)
+                                  for choice in choices]
+                usage = getattr(response, 'usage', None)
+                call = {'streamed': False}
+                if n > 1:
+                    call['choices'] = len(contents)
+        return contents, finish_reasons, usage, call
+
+    def _stream_completion(self, messages, stop, purpose, params):
+        """
+        Request a streamed chat completion and time its tokens.
+
+        The inter-token latency is the mean gap between content chunks, which
+        llama.cpp servers send one token at a time. The stream is closed as
+        soon as a stop sequence shows up, for servers that ignore the stop
+        parameter.
+
+        Args:
+            messages (list): The chat messages to send to the language model.
+            stop (list): The sequences that end the generation, or None.
+            purpose (str): What the call is for, used to label its metrics.
+            params (dict): The other completion parameters.
+
+        Returns:
+            tuple: The content, the finish reason, the usage reported in the
+            last chunk or None, and the timing statistics of the call.
+        """
+        start = time.perf_counter()
+        stream = self.client.chat.completions.create(
             model="LLaMA_CPP",
-            messages=messages
+            messages=messages,
+            stream=True,
+            stream_options={'include_usage': True},
+            **params
         )
-        return response.choices[0].message.content.replace("</s>", "").strip()
+        content = ""
+        finish_reason = usage = None
+        token_times = []
+        longest_stop = max((len(sequence) for sequence in stop or []), default=0)
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, 'usage', None) or usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                finish_reason = server_finish_reason(choice, stop) or finish_reason
+                text = getattr(choice.delta, 'content', None)
+                if not text:
+                    continue
+                token_times.append(time.perf_counter())
+                content += text
+                tail = content[-(len(text) + longest_stop):]
+                if stop and any(sequence in tail for sequence in stop):
+                    finish_reason = 'stop_sequence'
+                    break
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
 
-    def step(self, input_text):
+        call = {'streamed': True, 'ttft_ms': None, 'itl_ms': None,
+                'decode_tokens_per_second': None,
+                'completion_chunks': len(token_times),
+                'usage_reported': usage is not None}
+        if token_times:
+            ttft = token_times[0] - start
+            LLM_TIME_TO_FIRST_TOKEN.labels(purpose).observe(ttft)
+            call['ttft_ms'] = round(ttft * 1000, 1)
+            histogram = LLM_INTER_TOKEN.labels(purpose)
+            for previous, current in zip(token_times, token_times[1:]):
+                histogram.observe(current - previous)
+            decode_time = token_times[-1] - token_times[0]
+            if decode_time > 0:
+                call['itl_ms'] = round(
+                    decode_time / (len(token_times) - 1) * 1000, 2)
+                # Prefer the token count of the server, as a chunk can carry
+                # more than one token
+                tokens = getattr(usage, 'completion_tokens', None)
+                if not isinstance(tokens, int):
+                    tokens = len(token_times)
+                call['decode_tokens_per_second'] = round(
+                    (tokens - 1) / decode_time, 1)
+        return content, finish_reason, usage, call
+
+    def _stop_sequences(self):
+        """
+        Specify the stop sequences of a conversation turn.
+
+        The model is stopped as soon as it starts writing its partner's line
+        or emits an end-of-turn marker.
+
+        Returns:
+            list: The stop sequences for the chatbot.
+        """
+        return [f"\n{self.oppo_role['name']}:"] + CHAT_MARKERS
+
+    def respond(self, input_text=None, n=1):
+        """
+        Generate the next turn of the chatbot without adding it to the
+        transcript.
+
+        Args:
+            input_text (str, optional): The input text from the user. Defaults
+              to responding to the latest turn of the transcript.
+            n (int, optional): The number of variants of the turn. Defaults
+              to 1.
+
+        Returns:
+            str: The turn, or a list of n variants if n > 1.
+        """
+        return self.generate_response(
+            input_text,
+            max_tokens=max_response_tokens(self.proficiency_level, self.language),
+            stop=self._stop_sequences(), n=n
+        )
+
+    def step(self, input_text=None):
         """
         Perform a conversation step with the chatbot.
 
         Args:
-            input_text (str): The input text from the user.
+            input_text (str, optional): The input text from the user. Defaults
+              to responding to the latest turn of the transcript.
 
         Returns:
             tuple: The response from the chatbot and its translation.
         """
-        response = self.generate_response(input_text)
-        self.memory.append({"role": self.role['name'], "text": response})
+        response = self.respond(input_text)
+        self.transcript.append(self.role['name'], response)
         translate = self.translate(response)
         return response, translate
 
@@ -261,7 +853,11 @@ class Chatbot:
                 f"Translate the following sentence from {self.language} "
                 f"to English: {message}"
             )
-            translation = self.generate_response(instruction)
+            translation = self.generate_response(
+                instruction,
+                max_tokens=max_response_tokens(self.proficiency_level),
+                stop=CHAT_MARKERS, context=False, purpose='translate'
+            )
         return translation
 
     def text_to_speech(self, message):
@@ -274,33 +870,43 @@ class Chatbot:
         Returns:
             BytesIO: The audio file of the speech.
         """
-        tts = gTTS(text=message, lang=AUDIO_SPEECH[self.language])
-        sound_file = BytesIO()
-        tts.write_to_fp(sound_file)
+        with timed(STAGE_LATENCY, 'tts'):
+            tts = gTTS(text=message, lang=AUDIO_SPEECH[self.language])
+            sound_file = BytesIO()
+            tts.write_to_fp(sound_file)
         return sound_file
 
-    def _reset_conversation_history(self):
-        """Reset the conversation history."""
-        self.memory = []
-
 
 class DualChatbot:
     """
     A class to represent a dual chatbot system for role-playing conversations.
 
+    The state of a session can be exported with to_state() and rebuilt with
+    from_state(), so any backend worker can serve it.
+
     Attributes:
         engine (str): The type of engine to use for the chatbots.
         proficiency_level (str): The proficiency level of the language learner.
         language (str): The language of the conversation.
         chatbots (dict): The dictionary containing the chatbots for each role.
         session_length (str): The length of the session ('Short' or 'Long').
-        conversation_history (list): The conversation history.
+        prompt_profile (str): The system prompt profile of both chatbots.
+        transcript (Transcript): The conversation history shared by both
+            chatbots.
         current_speaker (str): The current speaker ('role1' or 'role2').
+        end_reason (str): Why the conversation came to a natural end
+            ('farewell', 'repetition' or 'empty'), or None while it is
+            ongoing.
+        last_exchange (tuple): The index of the latest exchange and its
+            responses and translations, served again to a retried request,
+            or None before the first exchange.
     """
 
+    generation_mode = 'Dialogue'
+
     def __init__(
         self, engine, role_dict, language, scenario, proficiency_level,
-        learning_mode, session_length, llm_server
+        learning_mode, session_length, llm_server, prompt_profile=None
     ):
         """
         Initialize the DualChatbot with specific conversation parameters.
@@ -317,13 +923,18 @@ class DualChatbot:
                 'Debate').
             session_length (str): The length of the session ('Short' or
                 'Long').
+            llm_server (str): The URL of the language model server.
+            prompt_profile (str, optional): The system prompt profile of both
+                chatbots, see PROMPT_PROFILES. Defaults to PROMPT_PROFILE.
         """
         self.engine = engine
         self.proficiency_level = proficiency_level
         self.language = language
         self.chatbots = role_dict
+        self.transcript = Transcript()
         for k in role_dict.keys():
-            self.chatbots[k].update({'chatbot': Chatbot(engine, llm_server)})
+            self.chatbots[k].update(
+                {'chatbot': Chatbot(engine, llm_server, self.transcript)})
 
         self.chatbots['role1']['chatbot'].instruct(
             role=self.chatbots['role1'],
@@ -331,7 +942,8 @@ class DualChatbot:
             language=language, scenario=scenario,
             session_length=session_length,
             proficiency_level=proficiency_level,
-            learning_mode=learning_mode, starter=True
+            learning_mode=learning_mode, starter=True,
+            prompt_profile=prompt_profile
         )
 
         self.chatbots['role2']['chatbot'].instruct(
@@ -340,12 +952,70 @@ class DualChatbot:
             language=language, scenario=scenario,
             session_length=session_length,
             proficiency_level=proficiency_level,
-            learning_mode=learning_mode, starter=False
+            learning_mode=learning_mode, starter=False,
+            prompt_profile=prompt_profile
         )
 
+        self.scenario = scenario
+        self.learning_mode = learning_mode
         self.session_length = session_length
-        self.conversation_history = []
+        self.prompt_profile = self.chatbots['role1']['chatbot'].prompt_profile
         self.current_speaker = 'role1'
+        self.end_reason = None
+        self.last_exchange = None
+
+    @property
+    def ended(self):
+        """
+        Whether the conversation has come to a natural end.
+
+        Returns:
+            bool: True once further exchanges would only produce filler.
+        """
+        return self.end_reason is not None
+
+    @property
+    def exchange_count(self):
+        """
+        The number of exchanges generated so far.
+
+        Returns:
+            int: The number of exchanges, two turns each.
+        """
+        return len(self.transcript) // 2
+
+    def _detect_end(self):
+        """Check whether the latest exchange ended the conversation."""
+        if self.end_reason is None:
+            self.end_reason = detect_conversation_end(
+                self.transcript.texts(), self.language)
+
+    @property
+    def usage(self):
+        """
+        Aggregate the token usage of both chatbots.
+
+        Returns:
+            dict: The number of LLM calls and the prompt and completion tokens.
+        """
+        usage = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        for role in ('role1', 'role2'):
+            for key, value in self.chatbots[role]['chatbot'].usage.items():
+                usage[key] += value
+        return usage
+
+    @property
+    def finish_reasons(self):
+        """
+        Aggregate the finish reasons reported to both chatbots.
+
+        Returns:
+            Counter: How often each finish reason was reported.
+        """
+        return (
+            self.chatbots['role1']['chatbot'].finish_reasons
+            + self.chatbots['role2']['chatbot'].finish_reasons
+        )
 
     def step(self):
         """
@@ -354,32 +1024,164 @@ class DualChatbot:
         Returns:
             tuple: The responses and translations from both chatbots.
         """
-        if not self.conversation_history:
-            input_text = "Start the conversation."
-        else:
-            input_text = self.conversation_history[-1]['text']
+        # Both chatbots read the partner's latest turn from the shared
+        # transcript, so only the opening turn needs an explicit input
+        input_text = OPENING_INPUT if not self.transcript else None
 
         current_chatbot = self.chatbots[self.current_speaker]['chatbot']
         response, translate = current_chatbot.step(input_text)
+        return self._reply(response, translate)
+
+    def _reply(self, response, translate):
+        """
+        Complete an exchange opened by the current speaker with the partner's
+        turn.
 
-        self.conversation_history.append({
-            "bot": self.chatbots[self.current_speaker]['name'],
-            "text": response
-        })
+        Args:
+            response (str): The turn of the current speaker, in the transcript.
+            translate (str): The translation of the turn.
 
+        Returns:
+            tuple: The responses and translations from both chatbots.
+        """
         self.current_speaker = 'role2' if self.current_speaker == 'role1' else 'role1'
 
         next_chatbot = self.chatbots[self.current_speaker]['chatbot']
-        response2, translate2 = next_chatbot.step(response)
-
-        self.conversation_history.append({
-            "bot": self.chatbots[self.current_speaker]['name'],
-            "text": response2
-        })
+        response2, translate2 = next_chatbot.step()
 
         self.current_speaker = 'role2' if self.current_speaker == 'role1' else 'role1'
+        self._detect_end()
+
+        exchange = (response, response2, translate, translate2)
+        self.last_exchange = (self.exchange_count - 1, exchange)
+        return exchange
+
+    def fork(self):
+        """
+        Branch the session into an independent copy.
+
+        The fork shares the configuration, the clients and system prompts of
+        the chatbots and the turns so far, see Transcript.fork(), and starts
+        with its own usage.
+
+        Returns:
+            DualChatbot: The fork.
+        """
+        fork = copy(self)
+        fork.transcript = self.transcript.fork()
+        fork.chatbots = {
+            role: {**entry, 'chatbot': entry['chatbot'].fork(fork.transcript)}
+            for role, entry in self.chatbots.items()
+        }
+        return fork
+
+    def variants(self, n):
+        """
+        Branch the session into n variants, each one exchange further.
+
+        The n turns opening the exchange are sampled in one completion, see
+        Chatbot.complete(), so the shared prompt is processed once; the forks
+        then get their replies in parallel.
+
+        Args:
+            n (int): The number of variants.
+
+        Returns:
+            list: (fork, exchange) pairs, the exchange as returned by step().
+        """
+        input_text = OPENING_INPUT if not self.transcript else None
+        speaker = self.chatbots[self.current_speaker]['chatbot']
+        responses = (speaker.respond(input_text, n=n) if n > 1
+                     else [speaker.respond(input_text)])
+
+        def branch(response):
+            fork = self.fork()
+            chatbot = fork.chatbots[fork.current_speaker]['chatbot']
+            fork.transcript.append(chatbot.role['name'], response)
+            return fork, fork._reply(response, chatbot.translate(response))
+
+        return run_in_parallel(branch, responses)
+
+    def serve_exchange(self, exchange):
+        """
+        Add an exchange generated beforehand to the conversation.
+
+        Args:
+            exchange (tuple): The responses and translations of both roles.
+
+        Returns:
+            tuple: The exchange.
+        """
+        exchange = tuple(exchange)
+        for role, text in (('role1', exchange[0]), ('role2', exchange[1])):
+            self.transcript.append(self.chatbots[role]['name'], text)
+        self._detect_end()
+        self.last_exchange = (self.exchange_count - 1, exchange)
+        return exchange
+
+    def to_state(self):
+        """
+        Export the configuration and transcript of the session.
 
-        return response, response2, translate, translate2
+        Speakers are stored as role indices, so the state stays compact.
+
+        Returns:
+            dict: A JSON-serializable representation of the session.
+        """
+        roles = [
+            {k: v for k, v in self.chatbots[role].items() if k != 'chatbot'}
+            for role in ('role1', 'role2')
+        ]
+        names = [role['name'] for role in roles]
+        return {
+            'mode': self.generation_mode,
+            'engine': self.engine,
+            'roles': roles,
+            'language': self.language,
+            'scenario': self.scenario,
+            'level': self.proficiency_level,
+            'learning_mode': self.learning_mode,
+            'session_length': self.session_length,
+            'profile': self.prompt_profile,
+            'turns': [
+                [names.index(turn.speaker) if turn.speaker in names
+                 else turn.speaker, turn.text]
+                for turn in self.transcript
+            ],
+            'speaker': self.current_speaker,
+            'end': self.end_reason,
+            'last': [self.last_exchange[0], list(self.last_exchange[1])]
+            if self.last_exchange is not None else None
+        }
+
+    @classmethod
+    def from_state(cls, state, llm_server):
+        """
+        Rebuild a session exported with to_state().
+
+        Args:
+            state (dict): The exported session.
+            llm_server (str): The URL of the language model server.
+
+        Returns:
+            DualChatbot: The rebuilt session.
+        """
+        roles = state['roles']
+        dual_chatbot = cls(
+            state['engine'], {'role1': dict(roles[0]), 'role2': dict(roles[1])},
+            state['language'], state['scenario'], state['level'],
+            state['learning_mode'], state['session_length'],
+            llm_server=llm_server, prompt_profile=state.get('profile')
+        )
+        for speaker, text in state['turns']:
+            name = roles[speaker]['name'] if isinstance(speaker, int) else speaker
+            dual_chatbot.transcript.append(name, text)
+        dual_chatbot.current_speaker = state['speaker']
+        dual_chatbot.end_reason = state['end']
+        if state.get('last') is not None:
+            index, exchange = state['last']
+            dual_chatbot.last_exchange = (index, tuple(exchange))
+        return dual_chatbot
 
     def summary(self):
         """
@@ -388,10 +1190,7 @@ class DualChatbot:
         Returns:
             str: The summary of the conversation.
         """
-        script = "\n".join(
-            f"{entry['bot']}: {entry['text']}"
-            for entry in self.conversation_history
-        )
+        script = self.transcript.script()
         instruction = (
             f"The following text is a simulated conversation in "
             f"{self.language}. The goal of this text is to aid "
@@ -408,5 +1207,287 @@ class DualChatbot:
             f"The conversation is: \n{script}"
         )
 
-        summary = self.chatbots['role1']['chatbot'].generate_response(instruction)
+        # The script is part of the instruction, so the transcript is not
+        # sent a second time as context
+        summary = self.chatbots['role1']['chatbot'].generate_response(
+            instruction, context=False, purpose='summary')
         return summary
+
+
+class ScriptChatbot(DualChatbot):
+    """
+    A dual chatbot system that writes the whole script in one completion.
+
+    Instead of four LLM calls per exchange, the entire dialogue is generated
+    with speaker tags in a single completion and translated in a second one.
+    The parsed exchanges are then served one at a time by step(), so the
+    class is a drop-in replacement for DualChatbot. Role separation is
+    weaker because one completion writes both parts; if the script runs out
+    before the session does, the remaining exchanges fall back to the
+    two-bot path.
+
+    Attributes:
+        exchanges (list): The pending (response1, response2, translate1,
+            translate2) tuples parsed from the generated script.
+    """
+
+    generation_mode = 'Script'
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initialize the ScriptChatbot with the same parameters as DualChatbot.
+        """
+        super().__init__(*args, **kwargs)
+        self.exchanges = None
+
+    def to_state(self):
+        """
+        Export the session, including the exchanges not served yet.
+
+        Returns:
+            dict: A JSON-serializable representation of the session.
+        """
+        state = super().to_state()
+        state['exchanges'] = self.exchanges
+        return state
+
+    @classmethod
+    def from_state(cls, state, llm_server):
+        """
+        Rebuild a session exported with to_state().
+
+        Args:
+            state (dict): The exported session.
+            llm_server (str): The URL of the language model server.
+
+        Returns:
+            ScriptChatbot: The rebuilt session.
+        """
+        script_chatbot = super().from_state(state, llm_server)
+        if state.get('exchanges') is not None:
+            script_chatbot.exchanges = [
+                tuple(exchange) for exchange in state['exchanges']
+            ]
+        return script_chatbot
+
+    def _specify_script_message(self):
+        """
+        Specify the system message for writing the whole script.
+
+        Returns:
+            str: The system message for the script writer.
+
+        Raises:
+            KeyError: If the proficiency level or learning mode is unsupported.
+        """
+        role1 = self.chatbots['role1']
+        role2 = self.chatbots['role2']
+        exchange_counts = EXCHANGE_COUNTS[self.session_length][self.learning_mode]
+        lang_requirement = language_requirement(self.proficiency_level)
+
+        if self.learning_mode == 'Conversation':
+            setting = (
+                f"You are writing a role-playing conversation script.\n"
+                f"Role 1: {role1['name']} {role1.get('action', '')}\n"
+                f"Role 2: {role2['name']} {role2.get('action', '')}\n"
+                f"Scenario: {self.scenario}\n"
+            )
+            length_requirement = (
+                "Keep each line concise and relevant to the conversation."
+            )
+        elif self.learning_mode == 'Debate':
+            setting = (
+                f"You are writing a debate script.\n"
+                f"Role 1: {role1['name']}\nRole 2: {role2['name']}\n"
+                f"Debate topic: {self.scenario}\n"
+            )
+            length_requirement = (
+                f"Limit each line to no more than "
+                f"{ARGUMENT_NUM_DICT[self.proficiency_level]} sentences."
+            )
+        else:
+            raise KeyError('Currently unsupported learning mode!')
+
+        return (
+            f"{setting}\nImportant instructions:\n"
+            f"1. Write exactly {exchange_counts} exchanges. Each exchange is "
+            f"one line by {role1['name']} followed by one line by "
+            f"{role2['name']}. {role1['name']} speaks first.\n"
+            f"2. Start every line with the speaker's name and a colon, e.g. "
+            f"\"{role1['name']}: ...\".\n"
+            f"3. Write nothing but the script: no titles, narration, stage "
+            f"directions or translations.\n"
+            f"4. {length_requirement}\n"
+            f"5. Use ONLY {self.language}. Do not translate or use any other "
+            f"language.\n6. {lang_requirement}\n"
+            f"7. Ensure the dialogue is natural and typical for this scenario "
+            f"in {self.language}-speaking cultures.\n\nRemember: You are "
+            f"helping language learners practice {self.language} at a "
+            f"{self.proficiency_level} level."
+        )
+
+    def _translate_turns(self, turns):
+        """
+        Translate all turns of the script in one completion.
+
+        Falls back to translating turn by turn if the translated script does
+        not have the same number of turns as the original.
+
+        Args:
+            turns (list): The (speaker, text) tuples to translate.
+
+        Returns:
+            list: The translations, one per turn.
+        """
+        writer = self.chatbots['role1']['chatbot']
+        if self.language == 'English':
+            return ['Translation: ' + text for _, text in turns]
+
+        speakers = [self.chatbots[k]['name'] for k in ('role1', 'role2')]
+        script = "\n".join(f"{speaker}: {text}" for speaker, text in turns)
+        instruction = (
+            f"Translate the following conversation from {self.language} to "
+            f"English. Keep the speaker names and write exactly one line per "
+            f"line of the original:\n{script}"
+        )
+        translated = parse_script(
+            writer.complete(
+                [{"role": "user", "content": instruction}],
+                max_tokens=len(turns) * max_response_tokens(self.proficiency_level),
+                stop=CHAT_MARKERS, purpose='translate'
+            ),
+            speakers
+        )
+        if [s for s, _ in translated] == [s for s, _ in turns]:
+            return [text for _, text in translated]
+        return [writer.translate(text) for _, text in turns]
+
+    def _write_scripts(self, n=1):
+        """
+        Write whole scripts in one completion.
+
+        Args:
+            n (int, optional): The number of variants of the script. Defaults
+              to 1.
+
+        Returns:
+            list: The n scripts, one "Name: text" line per turn.
+        """
+        writer = self.chatbots['role1']['chatbot']
+        exchange_counts = EXCHANGE_COUNTS[self.session_length][self.learning_mode]
+        scripts = writer.complete(
+            [
+                {"role": "system", "content": self._specify_script_message()},
+                {"role": "user", "content": "Write the script."}
+            ],
+            max_tokens=2 * exchange_counts * max_response_tokens(
+                self.proficiency_level, self.language),
+            stop=CHAT_MARKERS, purpose='script', n=n
+        )
+        return scripts if n > 1 else [scripts]
+
+    def _generate_script(self, script=None):
+        """
+        Generate, parse and translate the whole script.
+
+        Args:
+            script (str, optional): The script, if already written. Defaults
+              to writing it.
+
+        Returns:
+            list: The (response1, response2, translate1, translate2) tuples.
+        """
+        role1 = self.chatbots['role1']['name']
+        role2 = self.chatbots['role2']['name']
+        if script is None:
+            script = self._write_scripts()[0]
+
+        # Pair the turns into exchanges, dropping anything that does not fit
+        # the role1 -> role2 alternation
+        turns = parse_script(script, [role1, role2])
+        while turns and turns[0][0] != role1:
+            turns.pop(0)
+        turns = turns[:len(turns) - len(turns) % 2]
+
+        translations = self._translate_turns(turns) if turns else []
+        return [
+            (turns[i][1], turns[i + 1][1], translations[i], translations[i + 1])
+            for i in range(0, len(turns), 2)
+        ]
+
+    def step(self):
+        """
+        Serve the next exchange of the generated script.
+
+        Returns:
+            tuple: The responses and translations from both roles.
+        """
+        if self.exchanges is None:
+            self.exchanges = self._generate_script()
+        if not self.exchanges:
+            return super().step()
+
+        return self.serve_exchange(self.exchanges.pop(0))
+
+    def fork(self):
+        """
+        Branch the session into an independent copy, with its own pending
+        exchanges.
+
+        Returns:
+            ScriptChatbot: The fork.
+        """
+        fork = super().fork()
+        if self.exchanges is not None:
+            fork.exchanges = list(self.exchanges)
+        return fork
+
+    def variants(self, n):
+        """
+        Branch the session into n variants, each one exchange further.
+
+        Before the script is written, n whole scripts are written in one
+        completion and translated in parallel, one per fork. Once the script
+        has run out, the variants fall back to the two-bot path.
+
+        Args:
+            n (int): The number of variants.
+
+        Returns:
+            list: (fork, exchange) pairs, the exchange as returned by step().
+
+        Raises:
+            ValueError: If the script is written but not served yet, so every
+              variant would be the same.
+        """
+        if self.exchanges is None:
+            def branch(script):
+                fork = self.fork()
+                fork.exchanges = fork._generate_script(script)
+                return fork, fork.step()
+
+            return run_in_parallel(branch, self._write_scripts(n))
+        if self.exchanges:
+            raise ValueError("The script of the session is already written.")
+        return super().variants(n)
+
+
+# Define the chatbot class used for each generation mode
+GENERATION_MODES = {
+    DualChatbot.generation_mode: DualChatbot,
+    ScriptChatbot.generation_mode: ScriptChatbot
+}
+
+
+def load_dual_chatbot(state, llm_server):
+    """
+    Rebuild a session exported with to_state(), whatever its generation mode.
+
+    Args:
+        state (dict): The exported session.
+        llm_server (str): The URL of the language model server.
+
+    Returns:
+        DualChatbot: The rebuilt session.
+    """
+    return GENERATION_MODES[state['mode']].from_state(state, llm_server)
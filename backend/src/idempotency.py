@@ -0,0 +1,174 @@
+"""
+Module for idempotent turn requests.
+
+A client retrying a timed-out /generate_conversation request would otherwise
+advance the conversation a second time and pay for the LLM calls of another
+exchange. A request that names the exchange it asks for, by session id and
+exchange index, is served that exchange at most once:
+
+- a request for the next exchange generates it, holding a claim on it in the
+  session store so no other worker generates it at the same time;
+- a request for an exchange being generated in the same worker attaches to
+  the computation in flight, and one in another worker polls the session
+  store until the exchange is saved;
+- a request for the latest exchange gets it again from the session, which
+  keeps it with its translations.
+"""
+
+import asyncio
+import contextvars
+import time
+from functools import partial
+
+from .metrics import TURN_REQUESTS
+from .profiling import run_profiled
+
+# Define how long a claim on an exchange holds if its worker dies, and how
+# often a request waiting for another worker's exchange checks for it, in
+# seconds
+CLAIM_TTL = 300
+POLL_INTERVAL = 0.2
+
+
+class ExchangeConflict(Exception):
+    """
+    Raised when the requested exchange is neither the latest nor the next
+    one of the session, or is still being generated by another worker.
+    """
+
+
+def stored_exchange(dual_chatbot, index):
+    """
+    Find a requested exchange among those already served.
+
+    Args:
+        dual_chatbot (DualChatbot): The session.
+        index (int): The index of the requested exchange, from 0.
+
+    Returns:
+        tuple: The responses and translations of the exchange, or None if it
+        is the next exchange to generate.
+
+    Raises:
+        ExchangeConflict: If the exchange is neither the latest nor the next
+          one.
+    """
+    served = dual_chatbot.exchange_count
+    if index == served:
+        return None
+    last = dual_chatbot.last_exchange
+    if last is not None and last[0] == index:
+        return last[1]
+    raise ExchangeConflict(f"The session has {served} exchanges, so exchange "
+                           f"{index} is neither the latest nor the next one.")
+
+
+def serve_exchange_once(store, session_id, index, open_session, advance,
+                        claim_ttl=CLAIM_TTL, poll_interval=POLL_INTERVAL):
+    """
+    Serve an exchange of a session, generating it only if no worker has.
+
+    Args:
+        store (SessionStore): The session store, which also holds the claims.
+        session_id (str): The id of the session.
+        index (int): The index of the requested exchange, from 0.
+        open_session (callable): Loads the session, or creates it if it does
+          not exist, called without arguments.
+        advance (callable): Generates the next exchange of the session and
+          saves the session, called with the session.
+        claim_ttl (float, optional): How long the claim on the exchange
+          holds, and how long to wait for another worker's claim, in seconds.
+          Defaults to CLAIM_TTL.
+        poll_interval (float, optional): How often to check for the exchange
+          of another worker, in seconds. Defaults to POLL_INTERVAL.
+
+    Returns:
+        tuple: The session and the responses and translations of the
+        exchange.
+
+    Raises:
+        ExchangeConflict: If the exchange is neither the latest nor the next
+          one, or another worker is still generating it after claim_ttl.
+    """
+    key = f"{session_id}:{index}"
+    deadline = time.monotonic() + claim_ttl
+    claimed = False
+    try:
+        while True:
+            # The session is loaded again once claimed, as the exchange may
+            # have been saved in the meantime
+            dual_chatbot = open_session()
+            exchange = stored_exchange(dual_chatbot, index)
+            if exchange is not None:
+                TURN_REQUESTS.labels('stored').inc()
+                return dual_chatbot, exchange
+            if claimed:
+                TURN_REQUESTS.labels('generated').inc()
+                return dual_chatbot, advance(dual_chatbot)
+            claimed = store.claim(key, claim_ttl)
+            if not claimed:
+                if time.monotonic() > deadline:
+                    raise ExchangeConflict(
+                        f"Exchange {index} is still being generated.")
+                time.sleep(poll_interval)
+    finally:
+        if claimed:
+            store.release(key)
+
+
+class InFlight:
+    """
+    The computations in flight in the worker, shared by identical requests.
+    """
+
+    def __init__(self):
+        """Initialize the InFlight registry."""
+        self._futures = {}
+
+    def __len__(self):
+        return len(self._futures)
+
+    async def run(self, key, function):
+        """
+        Run a function in a thread, or wait for the run in flight under the
+        same key.
+
+        The run is shielded from the cancellation of its requests, e.g. when
+        a client disconnects, so it stays shared until the thread finishes.
+
+        Args:
+            key (tuple): The key of the computation.
+            function (callable): Called without arguments, in a copy of the
+              request's context, and profiled with the request.
+
+        Returns:
+            The result of the function, shared by all requests of the key.
+
+        Raises:
+            Exception: The exception of the function, raised to every request
+              of the key.
+        """
+        future = self._futures.get(key)
+        if future is not None:
+            TURN_REQUESTS.labels('attached').inc()
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().run_in_executor(
+            None, partial(contextvars.copy_context().run, run_profiled, function))
+        self._futures[key] = future
+        future.add_done_callback(partial(self._finish, key))
+        return await asyncio.shield(future)
+
+    def _finish(self, key, future):
+        """
+        Forget a finished run.
+
+        Args:
+            key (tuple): The key of the computation.
+            future (asyncio.Future): The result of the run.
+        """
+        if self._futures.get(key) is future:
+            del self._futures[key]
+        # Mark the exception as retrieved when every request was cancelled
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,133 @@
+"""
+Module for the pool of LLM servers shared by the backend's sessions.
+
+Conversation sessions stick to one server, picked by a hash of their id, so
+each turn extends a prompt the server may still have in its prompt cache.
+Work submitted to the pool, such as the sessions of a fan-out request, runs
+in background threads on the least busy server, or on the server of its
+session, with at most `concurrency` LLM calls per server at a time, matching
+the parallel slots of a llama.cpp server. Each server has its own threads,
+so work queued for a busy server never holds up the others.
+"""
+
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LLMPool:
+    """
+    A set of LLM servers, each running a bounded number of sessions at once.
+
+    Attributes:
+        servers (list): The URLs of the LLM servers.
+        concurrency (int): The sessions run at once per server.
+        in_flight (dict): The slots booked by running work per server.
+        pending (dict): The slots of the work submitted and not yet done per
+          server, running or queued.
+    """
+
+    def __init__(self, servers, concurrency=4):
+        """
+        Initialize the LLMPool.
+
+        Args:
+            servers (list): The URLs of the LLM servers.
+            concurrency (int, optional): The sessions run at once per server.
+              Defaults to 4.
+
+        Raises:
+            ValueError: If no server is given.
+        """
+        if not servers:
+            raise ValueError("The LLM pool needs at least one server.")
+        self.servers = list(servers)
+        self.concurrency = concurrency
+        self.in_flight = dict.fromkeys(self.servers, 0)
+        self.pending = dict.fromkeys(self.servers, 0)
+        self._slot_freed = threading.Condition()
+        self._executors = {
+            server: ThreadPoolExecutor(max_workers=concurrency,
+                                       thread_name_prefix=f'llm-pool-{index}')
+            for index, server in enumerate(self.servers)
+        }
+
+    def server_for(self, key):
+        """
+        Get the server of a session.
+
+        Args:
+            key (str): The id of the session.
+
+        Returns:
+            str: The URL of the server, always the same for a key.
+        """
+        return self.servers[zlib.crc32(key.encode('utf-8')) % len(self.servers)]
+
+    def _free(self, server, slots):
+        """
+        Check whether a server has enough free slots.
+
+        Args:
+            server (str): The URL of the server.
+            slots (int): The slots needed.
+
+        Returns:
+            bool: Whether the slots are free.
+        """
+        return self.in_flight[server] + slots <= self.concurrency
+
+    def _run(self, function, server, slots):
+        """
+        Run a function once its slots are free on its server.
+
+        The function runs on a thread of its server, which has as many
+        threads as slots; work booking several slots waits there for them,
+        holding up only the queue of its own server.
+
+        Args:
+            function (callable): Called with the URL of the server.
+            server (str): The URL of the server.
+            slots (int): The slots booked while the function runs.
+
+        Returns:
+            The result of the function.
+        """
+        with self._slot_freed:
+            self._slot_freed.wait_for(lambda: self._free(server, slots))
+            self.in_flight[server] += slots
+        try:
+            return function(server)
+        finally:
+            with self._slot_freed:
+                self.in_flight[server] -= slots
+                self.pending[server] -= slots
+                self._slot_freed.notify_all()
+
+    def submit(self, function, server=None, slots=1):
+        """
+        Run a function on a server of the pool once a slot is free.
+
+        Args:
+            function (callable): Called with the URL of the server.
+            server (str, optional): The server to run on, e.g. the server of
+              the session the function works on. Defaults to the server with
+              the least work pending.
+            slots (int, optional): The LLM calls the function sends at once,
+              booked on the server while it runs and capped at the
+              concurrency. Defaults to 1.
+
+        Returns:
+            concurrent.futures.Future: The result of the function.
+
+        Raises:
+            ValueError: If the server is not in the pool.
+        """
+        if server is not None and server not in self.in_flight:
+            raise ValueError(f"{server} is not in the LLM pool.")
+        slots = max(1, min(slots, self.concurrency))
+        with self._slot_freed:
+            if server is None:
+                server = min(self.servers, key=self.pending.__getitem__)
+            self.pending[server] += slots
+        return self._executors[server].submit(self._run, function, server, slots)
@@ -0,0 +1,274 @@
+"""
+Module for the Prometheus metrics of the backend.
+
+The metrics are prometheus_client metrics in the registry of the module,
+rendered in the Prometheus text exposition format by the /metrics endpoint.
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before the workers start: each worker then writes its metrics to
+files there and the /metrics endpoint of any worker aggregates those of all
+workers. Stages timed with timed() are also added to the breakdown of the
+request being served, which the backend returns as a Server-Timing header.
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess
+)
+
+# Define the default latency buckets, in seconds, from cheap in-process
+# stages up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+    120
+)
+
+# Define whether the workers share their metrics through files, see the
+# module docstring
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+# Define the content type of the /metrics endpoint
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Hold the timing breakdown and the LLM calls of the request being served
+_REQUEST_TIMINGS = contextvars.ContextVar('request_timings', default=None)
+_REQUEST_LLM_CALLS = contextvars.ContextVar('request_llm_calls', default=None)
+
+# Hold the gauges set from a callback when the metrics are scraped
+_SCRAPED_GAUGES = []
+
+
+def set_on_scrape(gauge, function):
+    """
+    Set a gauge from a callback each time the metrics are scraped.
+
+    Unlike Gauge.set_function(), this works in multiprocess mode, where the
+    worker serving the scrape writes the value for all workers.
+
+    Args:
+        gauge (Gauge): A gauge without labels.
+        function (callable): Returns the current value.
+    """
+    _SCRAPED_GAUGES.append((gauge, function))
+
+
+def render_metrics():
+    """
+    Render the metrics in the Prometheus text exposition format.
+
+    Returns:
+        bytes: The exposition text, aggregated over the workers in
+        multiprocess mode.
+    """
+    for gauge, function in _SCRAPED_GAUGES:
+        gauge.set(function())
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_worker_stopped():
+    """
+    Drop the live gauges of the current worker from the aggregated metrics,
+    when it shuts down in multiprocess mode.
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def start_request_timings():
+    """
+    Start collecting the timing breakdown of the current request.
+
+    Returns:
+        dict: The breakdown, filled in by timed() as (seconds, calls) per stage.
+    """
+    timings = {}
+    _REQUEST_TIMINGS.set(timings)
+    _REQUEST_LLM_CALLS.set([])
+    return timings
+
+
+def request_timings():
+    """
+    Get the timing breakdown of the current request.
+
+    Returns:
+        dict: The breakdown, or None outside of a request.
+    """
+    return _REQUEST_TIMINGS.get()
+
+
+def record_llm_call(call):
+    """
+    Add the statistics of an LLM call to the current request.
+
+    Args:
+        call (dict): The statistics of the call, see Chatbot.complete().
+    """
+    calls = _REQUEST_LLM_CALLS.get()
+    if calls is not None:
+        calls.append(call)
+
+
+def request_llm_calls():
+    """
+    Get the LLM calls of the current request.
+
+    Returns:
+        list: The statistics of the calls in order, or None outside of a
+        request.
+    """
+    return _REQUEST_LLM_CALLS.get()
+
+
+@contextmanager
+def timed(histogram, label):
+    """
+    Time a stage into a histogram and the breakdown of the current request.
+
+    Args:
+        histogram (Histogram): The histogram with a single label.
+        label (str): The stage name, used as the label value.
+
+    Yields:
+        None
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        histogram.labels(label).observe(duration)
+        timings = _REQUEST_TIMINGS.get()
+        if timings is not None:
+            total, calls = timings.get(label, (0.0, 0))
+            timings[label] = (total + duration, calls + 1)
+
+
+def format_server_timing(timings, total):
+    """
+    Format a timing breakdown as a Server-Timing header value.
+
+    Args:
+        timings (dict): The breakdown as (seconds, calls) per stage.
+        total (float): The end-to-end duration of the request, in seconds.
+
+    Returns:
+        str: The header value, with durations in milliseconds.
+    """
+    entries = [
+        f'{label};dur={seconds * 1000:.1f};desc="{calls} call(s)"'
+        for label, (seconds, calls) in timings.items()
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def timings_in_ms(timings):
+    """
+    Convert a timing breakdown for a JSON response.
+
+    Args:
+        timings (dict): The breakdown as (seconds, calls) per stage.
+
+    Returns:
+        dict: The breakdown as {'ms': milliseconds, 'calls': calls} per stage.
+    """
+    return {
+        label: {'ms': round(seconds * 1000, 1), 'calls': calls}
+        for label, (seconds, calls) in (timings or {}).items()
+    }
+
+
+REGISTRY = CollectorRegistry()
+
+STAGE_LATENCY = Histogram(
+    'parrot_stage_duration_seconds',
+    'Latency of backend stages (system_prompt, context_assembly, tts).',
+    labelnames=('stage',), registry=REGISTRY, buckets=DEFAULT_BUCKETS
+)
+LLM_LATENCY = Histogram(
+    'parrot_llm_request_duration_seconds',
+    'Latency of LLM calls by purpose (turn, translate, summary, script).',
+    labelnames=('purpose',), registry=REGISTRY, buckets=DEFAULT_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    'parrot_request_duration_seconds',
+    'End-to-end latency of backend endpoints.',
+    labelnames=('endpoint',), registry=REGISTRY, buckets=DEFAULT_BUCKETS
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    'parrot_llm_time_to_first_token_seconds',
+    'Time from sending a streamed LLM call to its first content token.',
+    labelnames=('purpose',), registry=REGISTRY, buckets=DEFAULT_BUCKETS
+)
+LLM_INTER_TOKEN = Histogram(
+    'parrot_llm_inter_token_seconds',
+    'Time between consecutive content chunks of streamed LLM calls.',
+    labelnames=('purpose',), registry=REGISTRY,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+PROMPT_TOKENS = Counter(
+    'parrot_llm_prompt_tokens_total',
+    'Prompt tokens reported by the LLM server.',
+    labelnames=('purpose',), registry=REGISTRY
+)
+COMPLETION_TOKENS = Counter(
+    'parrot_llm_completion_tokens_total',
+    'Completion tokens reported by the LLM server.',
+    labelnames=('purpose',), registry=REGISTRY
+)
+LLM_IN_FLIGHT = Gauge(
+    'parrot_llm_requests_in_flight',
+    'LLM calls currently waiting for the LLM server.',
+    registry=REGISTRY, multiprocess_mode='livesum'
+)
+ACTIVE_SESSIONS = Gauge(
+    'parrot_active_sessions',
+    'Conversation sessions in the session store.',
+    registry=REGISTRY, multiprocess_mode='mostrecent'
+)
+WARMUP_SECONDS = Gauge(
+    'parrot_warmup_seconds',
+    'Duration of the startup warm-up, 0 until it is done.',
+    registry=REGISTRY, multiprocess_mode='max'
+)
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    'parrot_semantic_cache_lookups_total',
+    'Semantic cache lookups by kind (opening, script) and result (hit, miss).',
+    labelnames=('kind', 'result'), registry=REGISTRY
+)
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    'parrot_semantic_cache_similarity',
+    'Similarity of the nearest cached session per lookup, by kind and result.',
+    labelnames=('kind', 'result'), registry=REGISTRY,
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.93, 0.96, 0.98, 0.99, 1)
+)
+SEMANTIC_CACHE_EVICTIONS = Counter(
+    'parrot_semantic_cache_evictions_total',
+    'Semantic cache entries removed, by reason (capacity, ttl).',
+    labelnames=('reason',), registry=REGISTRY
+)
+SEMANTIC_CACHE_ENTRIES = Gauge(
+    'parrot_semantic_cache_entries',
+    'Entries in the semantic cache of the worker.',
+    registry=REGISTRY, multiprocess_mode='livesum'
+)
+TURN_REQUESTS = Counter(
+    'parrot_turn_requests_total',
+    'Turn requests with an exchange index, by outcome (generated, stored, '
+    'attached, conflict).',
+    labelnames=('outcome',), registry=REGISTRY
+)
+LLM_COALESCED = Counter(
+    'parrot_llm_coalesced_total',
+    'LLM calls served by an identical call already in flight, by purpose.',
+    labelnames=('purpose',), registry=REGISTRY
+)
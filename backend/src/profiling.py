@@ -0,0 +1,174 @@
+"""
+Module for profiling backend requests on demand.
+
+cProfile only sees the thread it was enabled in, while the blocking work of a
+request, its session store and LLM calls, runs in worker threads. The
+profiler of a request is kept in its context, and the worker threads that
+run in a copy of the context profile themselves into the same profile, see
+run_profiled().
+"""
+
+import contextvars
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+from contextlib import contextmanager
+
+# Define the profiler of the request running in the current context, if the
+# request is profiled
+_request_profiler = contextvars.ContextVar('request_profiler', default=None)
+
+# Define whether the current thread is being profiled into a request profile
+_thread = threading.local()
+
+
+def run_profiled(function, *args):
+    """
+    Call a function, profiling the current thread while it runs if the request
+    of the current context is profiled.
+
+    Args:
+        function (callable): The function.
+        *args: The arguments of the function.
+
+    Returns:
+        The result of the function.
+    """
+    profiler = _request_profiler.get()
+    if profiler is None or getattr(_thread, 'profiling', False):
+        return function(*args)
+    thread_profile = cProfile.Profile()
+    try:
+        thread_profile.enable()
+    except ValueError:
+        # From Python 3.12 on one profiler sees every thread and no other
+        # profiler can be enabled while it runs
+        return function(*args)
+    _thread.profiling = True
+    try:
+        return function(*args)
+    finally:
+        thread_profile.disable()
+        _thread.profiling = False
+        profiler.collect(thread_profile)
+
+
+class RequestProfiler:
+    """
+    Profile the next N requests with cProfile and aggregate the results.
+
+    One request is profiled at a time, because cProfile profiles the event
+    loop thread it was enabled in, and the other requests running on it would
+    be mixed into the profile. The worker threads of the profiled request are
+    added to its profile, see run_profiled().
+
+    Attributes:
+        remaining (int): The number of requests still to profile.
+        profiled (int): The number of requests in the aggregated profile.
+    """
+
+    def __init__(self):
+        """Initialize the RequestProfiler with nothing to profile."""
+        self.remaining = 0
+        self.profiled = 0
+        self._stats = None
+        self._active = False
+        self._lock = threading.Lock()
+
+    def arm(self, requests):
+        """
+        Profile the next requests, discarding the previous profile.
+
+        Args:
+            requests (int): The number of requests to profile.
+        """
+        with self._lock:
+            self.remaining = requests
+            self.profiled = 0
+            self._stats = None
+
+    @contextmanager
+    def profile(self):
+        """
+        Profile the request running inside the context, if one is armed.
+
+        Yields:
+            None
+        """
+        with self._lock:
+            take = self.remaining > 0 and not self._active
+            if take:
+                self.remaining -= 1
+                self._active = True
+        if not take:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        token = _request_profiler.set(self)
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _request_profiler.reset(token)
+            self.collect(profiler)
+            with self._lock:
+                self.profiled += 1
+                self._active = False
+
+    def collect(self, profiler):
+        """
+        Add the statistics of a profiler to the aggregated profile.
+
+        Args:
+            profiler (cProfile.Profile): The disabled profiler.
+        """
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+
+    def status(self):
+        """
+        Describe the state of the profiler.
+
+        Returns:
+            dict: The requests still to profile and already profiled.
+        """
+        return {'remaining': self.remaining, 'profiled': self.profiled}
+
+    def dump(self):
+        """
+        Export the aggregated profile in the pstats file format.
+
+        Returns:
+            bytes: The profile, loadable with pstats.Stats or snakeviz, or
+            None if nothing has been profiled.
+        """
+        with self._lock:
+            if self._stats is None:
+                return None
+            return marshal.dumps(self._stats.stats)
+
+    def report(self, limit=40):
+        """
+        Render the aggregated profile as text.
+
+        Args:
+            limit (int, optional): The number of functions to list, sorted by
+              cumulative time. Defaults to 40.
+
+        Returns:
+            str: The report, or None if nothing has been profiled.
+        """
+        with self._lock:
+            if self._stats is None:
+                return None
+            stream = io.StringIO()
+            self._stats.stream = stream
+            self._stats.sort_stats('cumulative').print_stats(limit)
+            return stream.getvalue()
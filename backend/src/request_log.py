@@ -0,0 +1,168 @@
+"""
+Module for the structured log of backend requests.
+
+Every sampled request is appended to a JSON Lines file as one record with its
+shape (the conversation settings, without the learner's free text), its
+session, the time spent per stage and the tokens of its LLM calls, and
+optionally its payload. Sessions are sampled as a whole, by a hash of their
+id, so the log holds complete conversations that can be replayed in order
+with benchmarks/replay.py.
+
+Each record is written with a single append to a file opened with O_APPEND,
+so the records of concurrent requests and of several uvicorn workers sharing
+the file do not interleave.
+"""
+
+import json
+import os
+import zlib
+
+# Define the request fields describing the shape of a conversation; the
+# exchange index keeps replayed turn requests idempotent
+SHAPE_FIELDS = (
+    'engine', 'language', 'proficiency_level', 'learning_mode',
+    'session_length', 'generation_mode', 'debug', 'exchange_index'
+)
+
+# Define the token counts of the LLM calls summed per request
+TOKEN_FIELDS = ('prompt_tokens', 'completion_tokens', 'cached_tokens')
+
+
+def sampled(session_id, sample_rate):
+    """
+    Decide whether the requests of a session are logged.
+
+    The decision only depends on the session id, so every request of a
+    session is logged or none is, in every worker.
+
+    Args:
+        session_id (str): The id of the session.
+        sample_rate (float): The fraction of sessions to log, from 0 to 1.
+
+    Returns:
+        bool: Whether the session is logged.
+    """
+    if sample_rate >= 1:
+        return True
+    return zlib.crc32(session_id.encode('utf-8')) / 2 ** 32 < sample_rate
+
+
+def build_record(start, endpoint, method, status, session_id, body, query,
+                 duration, timings, llm_calls, payloads=False):
+    """
+    Build the log record of a request.
+
+    Args:
+        start (float): The arrival time of the request, as a Unix timestamp.
+        endpoint (str): The path of the request.
+        method (str): The HTTP method.
+        status (int): The status code of the response.
+        session_id (str): The id of the session.
+        body (dict): The JSON body of the request, or None.
+        query (dict): The query parameters of the request.
+        duration (float): The time to serve the request, in seconds.
+        timings (dict): The time spent per stage, in milliseconds.
+        llm_calls (list): The statistics of the LLM calls of the request.
+        payloads (bool, optional): Whether to include the body and the query.
+          Defaults to False.
+
+    Returns:
+        dict: The record.
+    """
+    body = body if isinstance(body, dict) else {}
+    llm_calls = llm_calls or []
+    record = {
+        'ts': round(start, 6),
+        'endpoint': endpoint,
+        'method': method,
+        'status': status,
+        'session_id': session_id,
+        'shape': {field: body[field] for field in SHAPE_FIELDS
+                  if field in body},
+        'duration_ms': round(duration * 1000, 3),
+        'timings': timings or {},
+        'llm_calls': len(llm_calls),
+        'tokens': {field: sum(call.get(field) or 0 for call in llm_calls)
+                   for field in TOKEN_FIELDS}
+    }
+    if payloads:
+        record['payload'] = body
+        record['query'] = query
+    return record
+
+
+class RequestLog:
+    """
+    Append sampled request records to a JSON Lines file.
+
+    Attributes:
+        path (str): The log file.
+        sample_rate (float): The fraction of sessions logged.
+        payloads (bool): Whether records include the request payloads.
+        logged (int): The number of records written by this process.
+    """
+
+    def __init__(self, path, sample_rate=1.0, payloads=False):
+        """
+        Initialize the RequestLog, creating the file's directory if needed.
+
+        Args:
+            path (str): The log file.
+            sample_rate (float, optional): The fraction of sessions logged.
+              Defaults to 1.0.
+            payloads (bool, optional): Whether records include the request
+              payloads, which hold the learner's roles and scenario. Defaults
+              to False.
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.payloads = payloads
+        self.logged = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def sampled(self, session_id):
+        """
+        Decide whether the requests of a session are logged.
+
+        Args:
+            session_id (str): The id of the session.
+
+        Returns:
+            bool: Whether the session is logged.
+        """
+        return sampled(session_id, self.sample_rate)
+
+    def write(self, record):
+        """
+        Append a record to the log.
+
+        Args:
+            record (dict): The record, serializable to JSON.
+        """
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        os.write(self._fd, (line + '\n').encode('utf-8'))
+        self.logged += 1
+
+    def close(self):
+        """Close the log file."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def read_request_log(path):
+    """
+    Read the records of a request log.
+
+    Args:
+        path (str): The log file.
+
+    Returns:
+        list: The records, ordered by arrival time.
+    """
+    with open(path, encoding='utf-8') as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    return sorted(records, key=lambda record: record['ts'])
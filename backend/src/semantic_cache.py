@@ -0,0 +1,501 @@
+"""
+Module for the semantic cache of opening exchanges and scripts.
+
+Learners type many variants of the same scenario ("at a restaurant", "in a
+restaurant", "at the restaurant"), which an exact-match cache would all miss.
+New sessions are looked up by the similarity of their roles and of their
+scenario instead, among the cached sessions of the same language,
+proficiency level, learning mode, session length and generation mode. On a
+hit, a dialogue session is served the cached opening exchange and a script
+session the cached script, without any LLM call; later exchanges of a
+dialogue are generated as usual.
+
+Texts are embedded with feature hashing of their words and character
+n-grams by default, a model small enough to embed in microseconds without a
+download, so matches are lexical. Case, punctuation, articles and
+prepositions are ignored, so 'In a restaurant!' hits 'at a restaurant' and
+so does 'at the restaurant', while typos and plurals score 0.75 to 0.85 and
+miss at the default threshold, and synonyms such as 'at a diner' share no
+features at all. With sentence-transformers
+installed, a small sentence-embedding model matches synonyms and paraphrases
+too, see create_embedder(). Any callable mapping a text to a normalized
+vector can be used instead. The entries of a partition are rows of a NumPy
+matrix, so a lookup is a single matrix-vector product.
+
+The cache lives in the memory of each worker.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+import warnings
+import zlib
+
+import numpy as np
+
+from .metrics import (
+    SEMANTIC_CACHE_ENTRIES, SEMANTIC_CACHE_EVICTIONS, SEMANTIC_CACHE_LOOKUPS,
+    SEMANTIC_CACHE_SIMILARITY, STAGE_LATENCY, timed
+)
+
+# Define the eviction policies when the cache is full: the least recently
+# used or the least frequently used entry goes first
+EVICTION_POLICIES = ('lru', 'lfu')
+
+# Define the sentence-embedding model used when one is asked for without a
+# name, small and multilingual as learners type scenarios in any language
+DEFAULT_EMBEDDING_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+
+class HashingEmbedder:
+    """
+    Embed texts as normalized, signed feature-hashing vectors of their words
+    and character n-grams.
+
+    Words shorter than min_length, mostly articles and prepositions such as
+    'a', 'at', 'in', 'el' or 'à', are left out unless the text has no other
+    words, so 'in a restaurant' and 'at a restaurant' embed alike.
+
+    Attributes:
+        dim (int): The dimension of the vectors.
+        ngrams (tuple): The lengths of the character n-grams.
+        min_length (int): The length of the shortest words embedded.
+        threshold (float): The lowest similarity served as a hit by default,
+          which rewordings of a scenario reach and other scenarios do not.
+    """
+
+    threshold = 0.85
+
+    def __init__(self, dim=1024, ngrams=(2, 3), min_length=3):
+        """
+        Initialize the HashingEmbedder.
+
+        Args:
+            dim (int, optional): The dimension of the vectors. Defaults to
+              1024.
+            ngrams (tuple, optional): The lengths of the character n-grams.
+              Defaults to (2, 3).
+            min_length (int, optional): The length of the shortest words
+              embedded. Defaults to 3.
+        """
+        self.dim = dim
+        self.ngrams = ngrams
+        self.min_length = min_length
+
+    def features(self, text):
+        """
+        Extract the features of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list: The words and the character n-grams of every word, padded
+            with spaces so word boundaries count.
+        """
+        words = re.findall(r"\w+", unicodedata.normalize('NFKC', text).lower())
+        words = [word for word in words
+                 if len(word) >= self.min_length] or words
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f" {word} "
+            for n in self.ngrams:
+                features += [padded[i:i + n]
+                             for i in range(max(len(padded) - n + 1, 1))]
+        return features
+
+    def __call__(self, text):
+        """
+        Embed a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            np.ndarray: The normalized vector, (dim,), zero for an empty text.
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(text):
+            digest = zlib.crc32(feature.encode('utf-8'))
+            vector[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SentenceEmbedder:
+    """
+    Embed texts with a sentence-embedding model of sentence-transformers,
+    which matches synonyms and paraphrases that share no words.
+
+    Attributes:
+        model_name (str): The name or path of the model.
+        dim (int): The dimension of the vectors.
+        threshold (float): The lowest similarity served as a hit by default.
+    """
+
+    threshold = 0.8
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL):
+        """
+        Initialize the SentenceEmbedder, loading the model.
+
+        Args:
+            model_name (str, optional): The name or path of the model.
+              Defaults to DEFAULT_EMBEDDING_MODEL.
+
+        Raises:
+            ImportError: If sentence-transformers is not installed.
+            OSError: If the model cannot be loaded.
+        """
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def __call__(self, text):
+        """
+        Embed a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            np.ndarray: The normalized vector, (dim,).
+        """
+        return np.asarray(self.model.encode(text, normalize_embeddings=True),
+                          dtype=np.float32)
+
+
+def create_embedder(model_name=None):
+    """
+    Create the embedder of the cache.
+
+    Args:
+        model_name (str, optional): The sentence-embedding model, or 'default'
+          for DEFAULT_EMBEDDING_MODEL. Defaults to hashing.
+
+    Returns:
+        callable: A SentenceEmbedder, or a HashingEmbedder if no model was
+        asked for or the model is unavailable.
+    """
+    if model_name:
+        if model_name == 'default':
+            model_name = DEFAULT_EMBEDDING_MODEL
+        try:
+            return SentenceEmbedder(model_name)
+        except (ImportError, OSError) as e:
+            warnings.warn(f"Embedding model {model_name} unavailable, the "
+                          f"semantic cache falls back to hashing: {e}")
+    return HashingEmbedder()
+
+
+class VectorIndex:
+    """
+    The entries of one cache partition, with their vectors as the rows of a
+    matrix.
+
+    Attributes:
+        vectors (np.ndarray): The vectors of the fields of every entry,
+          (capacity, fields, dim); the first len(entries) rows are used.
+        entries (list): The entries, in the order of the rows.
+    """
+
+    def __init__(self, fields, dim, capacity=16):
+        """
+        Initialize an empty VectorIndex.
+
+        Args:
+            fields (int): The number of embedded fields per entry.
+            dim (int): The dimension of the vectors.
+            capacity (int, optional): The initial number of rows. Defaults to
+              16.
+        """
+        self.vectors = np.zeros((capacity, fields, dim), dtype=np.float32)
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, vectors, entry):
+        """
+        Add an entry, growing the matrix if it is full.
+
+        Args:
+            vectors (np.ndarray): The vectors of the entry's fields,
+              (fields, dim).
+            entry (dict): The entry.
+        """
+        if len(self.entries) == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors,
+                                           np.zeros_like(self.vectors)])
+        self.vectors[len(self.entries)] = vectors
+        self.entries.append(entry)
+
+    def remove(self, entry):
+        """
+        Remove an entry, moving the last row into its place.
+
+        Args:
+            entry (dict): The entry.
+        """
+        index = next(i for i, other in enumerate(self.entries)
+                     if other is entry)
+        last = len(self.entries) - 1
+        self.vectors[index] = self.vectors[last]
+        self.entries[index] = self.entries[last]
+        self.entries.pop()
+
+    def nearest(self, vectors):
+        """
+        Find the most similar entry.
+
+        The similarity of two entries is the lowest cosine similarity of
+        their fields, so every field has to match.
+
+        Args:
+            vectors (np.ndarray): The vectors of the fields, (fields, dim).
+
+        Returns:
+            tuple: The entry and its similarity, or (None, None) if the index
+            is empty.
+        """
+        if not self.entries:
+            return None, None
+        similarities = np.einsum('nfd,fd->nf', self.vectors[:len(self.entries)],
+                                 vectors).min(axis=1)
+        index = int(np.argmax(similarities))
+        return self.entries[index], float(similarities[index])
+
+
+class SemanticCache:
+    """
+    A bounded cache of values looked up by the similarity of texts.
+
+    Attributes:
+        threshold (float): The lowest similarity served as a hit.
+        max_entries (int): The entries kept over all partitions.
+        eviction (str): The eviction policy, see EVICTION_POLICIES.
+        ttl (float): The seconds an entry is served, or None for no expiry.
+        embed (callable): Maps a text to a normalized vector.
+        hits (int): The lookups served from the cache.
+        misses (int): The lookups not served from the cache.
+        evictions (int): The entries evicted or expired.
+    """
+
+    def __init__(self, threshold=None, max_entries=1000, eviction='lru',
+                 ttl=None, embed=None, clock=time.monotonic):
+        """
+        Initialize an empty SemanticCache.
+
+        Args:
+            threshold (float, optional): The lowest similarity served as a
+              hit. Defaults to the threshold of the embedder, else 0.85.
+            max_entries (int, optional): The entries kept over all
+              partitions. Defaults to 1000.
+            eviction (str, optional): The eviction policy. Defaults to 'lru'.
+            ttl (float, optional): The seconds an entry is served. Defaults to
+              no expiry.
+            embed (callable, optional): Maps a text to a normalized vector.
+              Defaults to a HashingEmbedder.
+            clock (callable, optional): Returns the current time, in seconds.
+              Defaults to time.monotonic.
+
+        Raises:
+            ValueError: If the eviction policy is unsupported.
+        """
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unsupported eviction policy: {eviction}")
+        self.embed = embed or HashingEmbedder()
+        self.threshold = threshold if threshold is not None \
+            else getattr(self.embed, 'threshold', 0.85)
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(index) for index in self._partitions.values())
+
+    def _vectors(self, texts):
+        """
+        Embed the fields of a key.
+
+        Args:
+            texts (tuple): The texts of the fields.
+
+        Returns:
+            np.ndarray: The vectors, (fields, dim).
+        """
+        return np.stack([self.embed(text) for text in texts])
+
+    def get(self, kind, partition, texts):
+        """
+        Look up the value of the most similar key.
+
+        Args:
+            kind (str): What is cached, e.g. 'opening' or 'script', used to
+              label the metrics.
+            partition (tuple): The values that must match exactly.
+            texts (tuple): The texts of the key, compared by similarity.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        vectors = self._vectors(texts)
+        with self._lock:
+            index = self._partitions.get((kind,) + tuple(partition))
+            entry, similarity = index.nearest(vectors) if index else (None, None)
+            while entry is not None and self._expired(entry):
+                self._evict(index, entry, 'ttl')
+                entry, similarity = index.nearest(vectors)
+            hit = similarity is not None and similarity >= self.threshold
+            if hit:
+                entry['hits'] += 1
+                entry['used'] = self.clock()
+                self.hits += 1
+            else:
+                self.misses += 1
+        result = 'hit' if hit else 'miss'
+        SEMANTIC_CACHE_LOOKUPS.labels(kind, result).inc()
+        if similarity is not None:
+            SEMANTIC_CACHE_SIMILARITY.labels(kind, result).observe(similarity)
+        return entry['value'] if hit else None
+
+    def put(self, kind, partition, texts, value):
+        """
+        Cache a value, evicting an entry if the cache is full.
+
+        Args:
+            kind (str): What is cached.
+            partition (tuple): The values that must match exactly.
+            texts (tuple): The texts of the key, compared by similarity.
+            value: The value to cache.
+        """
+        vectors = self._vectors(texts)
+        now = self.clock()
+        with self._lock:
+            while len(self) >= self.max_entries > 0:
+                self._evict_one()
+            index = self._partitions.setdefault(
+                (kind,) + tuple(partition),
+                VectorIndex(len(texts), vectors.shape[1]))
+            index.add(vectors, {'texts': tuple(texts), 'value': value,
+                                'created': now, 'used': now, 'hits': 0})
+
+    def _expired(self, entry):
+        """
+        Check whether an entry has outlived the TTL.
+
+        Args:
+            entry (dict): The entry.
+
+        Returns:
+            bool: Whether the entry must not be served anymore.
+        """
+        return self.ttl is not None and self.clock() - entry['created'] > self.ttl
+
+    def _evict_one(self):
+        """Evict an expired entry if there is one, else one by the policy."""
+        if self.eviction == 'lru':
+            def rank(entry):
+                return (not self._expired(entry), entry['used'])
+        else:
+            def rank(entry):
+                return (not self._expired(entry), entry['hits'], entry['used'])
+
+        index, entry = min(
+            ((index, entry) for index in self._partitions.values()
+             for entry in index.entries),
+            key=lambda pair: rank(pair[1]))
+        self._evict(index, entry, 'ttl' if self._expired(entry) else 'capacity')
+
+    def _evict(self, index, entry, reason):
+        """
+        Remove an entry.
+
+        Args:
+            index (VectorIndex): The partition of the entry.
+            entry (dict): The entry.
+            reason (str): 'capacity' or 'ttl', used to label the metrics.
+        """
+        index.remove(entry)
+        self.evictions += 1
+        SEMANTIC_CACHE_EVICTIONS.labels(reason).inc()
+
+    def stats(self):
+        """
+        Report the size and the hit rate of the cache.
+
+        Returns:
+            dict: The entries, hits, misses, hit rate and evictions.
+        """
+        lookups = self.hits + self.misses
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions}
+
+
+def session_key(dual_chatbot):
+    """
+    Get the cache key of a session.
+
+    Args:
+        dual_chatbot (DualChatbot): The session.
+
+    Returns:
+        tuple: The partition, the settings that must match exactly, and the
+        texts compared by similarity, the roles and the scenario.
+    """
+    partition = (dual_chatbot.language, dual_chatbot.proficiency_level,
+                 dual_chatbot.learning_mode, dual_chatbot.session_length,
+                 dual_chatbot.generation_mode)
+    roles = " / ".join(
+        " ".join(filter(None, (dual_chatbot.chatbots[key]['name'],
+                               dual_chatbot.chatbots[key].get('action'))))
+        for key in ('role1', 'role2'))
+    return partition, (roles, dual_chatbot.scenario)
+
+
+def cached_step(cache, dual_chatbot):
+    """
+    Perform a conversation step, serving the opening exchange of a dialogue
+    or the script of a script session from the cache when a similar session
+    was cached.
+
+    Args:
+        cache (SemanticCache): The cache.
+        dual_chatbot (DualChatbot): The session.
+
+    Returns:
+        tuple: The responses and translations from both chatbots.
+    """
+    script = dual_chatbot.generation_mode == 'Script'
+    started = dual_chatbot.exchanges is not None if script \
+        else len(dual_chatbot.transcript) > 0
+    if started:
+        return dual_chatbot.step()
+
+    kind = 'script' if script else 'opening'
+    partition, texts = session_key(dual_chatbot)
+    with timed(STAGE_LATENCY, 'semantic_cache'):
+        value = cache.get(kind, partition, texts)
+    if value is not None:
+        if script:
+            dual_chatbot.exchanges = [tuple(exchange) for exchange in value[1:]]
+        return dual_chatbot.serve_exchange(tuple(value[0]))
+
+    exchange = dual_chatbot.step()
+    # A script session has popped its first exchange, the rest is pending
+    value = [exchange] + list(dual_chatbot.exchanges or []) if script \
+        else [exchange]
+    with timed(STAGE_LATENCY, 'semantic_cache'):
+        cache.put(kind, partition, texts, value)
+    SEMANTIC_CACHE_ENTRIES.set(len(cache))
+    return exchange
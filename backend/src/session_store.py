@@ -0,0 +1,474 @@
+"""
+Module for storing conversation sessions outside of the backend process.
+
+Sessions are kept in one of three stores, selected by URL:
+
+- ``memory://`` keeps live DualChatbot objects in the process (one worker).
+- ``sqlite:////path/to/sessions.db`` keeps serialized sessions in a SQLite
+  database in WAL mode, shared by all workers on one host.
+- ``redis://host:port/db`` keeps serialized sessions in any server speaking
+  the Redis protocol, shared by workers on any host.
+"""
+
+import json
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from .chatbot import load_dual_chatbot
+
+# Define how long an idle session is kept, in seconds
+SESSION_TTL = 24 * 60 * 60
+
+
+def encode_state(state):
+    """
+    Serialize a session state compactly.
+
+    Args:
+        state (dict): The state exported by DualChatbot.to_state().
+
+    Returns:
+        bytes: The UTF-8 encoded JSON without insignificant whitespace.
+    """
+    return json.dumps(state, separators=(',', ':'),
+                      ensure_ascii=False).encode('utf-8')
+
+
+def decode_state(data):
+    """
+    Deserialize a session state.
+
+    Args:
+        data (bytes): The serialized state.
+
+    Returns:
+        dict: The state to pass to load_dual_chatbot().
+    """
+    return json.loads(data.decode('utf-8'))
+
+
+class SessionStore:
+    """
+    Base class for session stores.
+
+    Serializing stores only implement _get(), _set(), delete() and count();
+    load() and save() convert between DualChatbot objects and bytes. Every
+    store also holds claims, which let one worker at a time generate an
+    exchange of a session, see claim().
+
+    Attributes:
+        ttl (int): How long an idle session is kept, in seconds.
+    """
+
+    def __init__(self, ttl=SESSION_TTL):
+        """
+        Initialize the SessionStore.
+
+        Args:
+            ttl (int, optional): How long an idle session is kept, in seconds.
+              Defaults to SESSION_TTL.
+        """
+        self.ttl = ttl
+
+    def load(self, session_id, llm_server):
+        """
+        Load a session.
+
+        Args:
+            session_id (str): The session id.
+            llm_server (str): The URL of the language model server.
+
+        Returns:
+            DualChatbot: The session, or None if it does not exist.
+        """
+        data = self._get(session_id)
+        if data is None:
+            return None
+        return load_dual_chatbot(decode_state(data), llm_server)
+
+    def save(self, session_id, dual_chatbot):
+        """
+        Save a session.
+
+        Args:
+            session_id (str): The session id.
+            dual_chatbot (DualChatbot): The session to save.
+        """
+        self._set(session_id, encode_state(dual_chatbot.to_state()))
+
+    def delete(self, session_id):
+        """
+        Delete a session.
+
+        Args:
+            session_id (str): The session id.
+        """
+        raise NotImplementedError
+
+    def count(self):
+        """
+        Count the active sessions.
+
+        Returns:
+            int: The number of sessions that have not expired.
+        """
+        raise NotImplementedError
+
+    def claim(self, key, ttl):
+        """
+        Claim a key, e.g. an exchange being generated, unless it is held.
+
+        Args:
+            key (str): The key to claim.
+            ttl (float): How long the claim holds if it is not released, in
+              seconds.
+
+        Returns:
+            bool: Whether the key was claimed, False if another claim holds it.
+        """
+        raise NotImplementedError
+
+    def release(self, key):
+        """
+        Release a claim.
+
+        Args:
+            key (str): The claimed key.
+        """
+        raise NotImplementedError
+
+    def _get(self, session_id):
+        raise NotImplementedError
+
+    def _set(self, session_id, data):
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    A session store keeping live DualChatbot objects in the process.
+
+    Nothing is serialized, which makes it the fastest store, but sessions are
+    lost on restart and not visible to other workers.
+    """
+
+    def __init__(self, ttl=SESSION_TTL):
+        """
+        Initialize the InMemorySessionStore.
+
+        Args:
+            ttl (int, optional): How long an idle session is kept, in seconds.
+              Defaults to SESSION_TTL.
+        """
+        super().__init__(ttl)
+        self._sessions = OrderedDict()
+        self._claims = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        """Drop the sessions that have been idle for longer than the TTL."""
+        while self._sessions:
+            session_id, (saved_at, _) = next(iter(self._sessions.items()))
+            if now - saved_at < self.ttl:
+                break
+            del self._sessions[session_id]
+
+    def load(self, session_id, llm_server):
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._sessions.get(session_id)
+        return entry[1] if entry is not None else None
+
+    def save(self, session_id, dual_chatbot):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (time.monotonic(), dual_chatbot)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def count(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._sessions)
+
+    def claim(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if self._claims.get(key, now) > now:
+                return False
+            self._claims[key] = now + ttl
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._claims.pop(key, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    A session store backed by a SQLite database in WAL mode.
+
+    WAL mode lets the workers of one host read sessions while another worker
+    writes. Each thread uses its own connection.
+    """
+
+    def __init__(self, path, ttl=SESSION_TTL):
+        """
+        Initialize the SQLiteSessionStore and create its table.
+
+        Args:
+            path (str): The path of the database file.
+            ttl (int, optional): How long an idle session is kept, in seconds.
+              Defaults to SESSION_TTL.
+        """
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, state BLOB NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated_at "
+                "ON sessions (updated_at)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS claims ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        """
+        Get the connection of the current thread.
+
+        Returns:
+            sqlite3.Connection: The connection.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _get(self, session_id):
+        row = self._connection().execute(
+            "SELECT state FROM sessions WHERE id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    def _set(self, session_id, data):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, updated_at) "
+                "VALUES (?, ?, ?)",
+                (session_id, data, now)
+            )
+            connection.execute(
+                "DELETE FROM sessions WHERE updated_at <= ?", (now - self.ttl,)
+            )
+
+    def delete(self, session_id):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def count(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE updated_at > ?",
+            (time.time() - self.ttl,)
+        ).fetchone()[0]
+
+    def claim(self, key, ttl):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM claims WHERE key = ? AND expires_at <= ?",
+                (key, now)
+            )
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO claims (key, expires_at) VALUES (?, ?)",
+                (key, now + ttl)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM claims WHERE key = ?", (key,))
+
+
+class RedisSessionStore(SessionStore):
+    """
+    A session store backed by a server speaking the Redis protocol (RESP).
+
+    Only GET, SET with EX and NX, DEL and SCAN are used, so Redis, Valkey,
+    KeyDB or a local stand-in all work. Expiry is left to the server.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, ttl=SESSION_TTL,
+                 prefix='parrot-ai:session:', claim_prefix='parrot-ai:claim:'):
+        """
+        Initialize the RedisSessionStore.
+
+        Args:
+            host (str, optional): The server host. Defaults to 'localhost'.
+            port (int, optional): The server port. Defaults to 6379.
+            db (int, optional): The database number. Defaults to 0.
+            ttl (int, optional): How long an idle session is kept, in seconds.
+              Defaults to SESSION_TTL.
+            prefix (str, optional): The prefix of the session keys.
+            claim_prefix (str, optional): The prefix of the claim keys.
+        """
+        super().__init__(ttl)
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.claim_prefix = claim_prefix
+        self._local = threading.local()
+
+    def _connect(self):
+        """
+        Open a connection for the current thread.
+
+        Returns:
+            tuple: The socket and its buffered reader.
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=30)
+        reader = sock.makefile('rb')
+        self._local.connection = (sock, reader)
+        if self.db:
+            self._command('SELECT', self.db)
+        return self._local.connection
+
+    def _command(self, *args):
+        """
+        Send a command and read its reply.
+
+        Args:
+            *args: The command name and arguments.
+
+        Returns:
+            The decoded reply.
+
+        Raises:
+            RuntimeError: If the server replies with an error.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+        sock, reader = connection
+
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        try:
+            sock.sendall(b''.join(parts))
+            return self._read_reply(reader)
+        except OSError:
+            self._local.connection = None
+            sock.close()
+            raise
+
+    def _read_reply(self, reader):
+        """
+        Read one RESP reply.
+
+        Args:
+            reader (io.BufferedReader): The reader of the connection.
+
+        Returns:
+            The decoded reply.
+
+        Raises:
+            RuntimeError: If the server replies with an error.
+            ConnectionError: If the server closed the connection.
+        """
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Session store closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise RuntimeError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(length)]
+        raise RuntimeError(f"Unexpected reply from session store: {line!r}")
+
+    def _get(self, session_id):
+        return self._command('GET', self.prefix + session_id)
+
+    def _set(self, session_id, data):
+        self._command('SET', self.prefix + session_id, data, 'EX', self.ttl)
+
+    def delete(self, session_id):
+        self._command('DEL', self.prefix + session_id)
+
+    def count(self):
+        cursor, total = b'0', 0
+        while True:
+            cursor, keys = self._command(
+                'SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 1000)
+            total += len(keys)
+            if cursor == b'0':
+                return total
+
+    def claim(self, key, ttl):
+        return self._command('SET', self.claim_prefix + key, 1, 'NX', 'EX',
+                             max(int(ttl), 1)) == 'OK'
+
+    def release(self, key):
+        self._command('DEL', self.claim_prefix + key)
+
+
+def create_session_store(url):
+    """
+    Create the session store configured by a URL.
+
+    Args:
+        url (str): 'memory://', 'sqlite:////path/to/sessions.db' or
+          'redis://host:port/db'.
+
+    Returns:
+        SessionStore: The session store.
+
+    Raises:
+        KeyError: If the URL scheme is unsupported.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'memory':
+        return InMemorySessionStore()
+    if parsed.scheme == 'sqlite':
+        # Like SQLAlchemy, sqlite:///sessions.db is relative and
+        # sqlite:////data/sessions.db is absolute
+        return SQLiteSessionStore(parsed.path[1:])
+    if parsed.scheme == 'redis':
+        return RedisSessionStore(
+            host=parsed.hostname or 'localhost',
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip('/') or 0)
+        )
+    raise KeyError('Currently unsupported session store!')
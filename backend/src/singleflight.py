@@ -0,0 +1,75 @@
+"""
+Module for coalescing identical calls in flight.
+
+Under load many identical LLM calls are in flight at once: the opening turn
+of the default scenario for every learner starting a session, or the same
+summary requested twice by a double click. The first caller of a key runs
+the call; callers of the same key arriving before it returns wait for it and
+share its result instead of sending the call again. A call is only shared
+while it is in flight, nothing is kept once it returns.
+"""
+
+import threading
+
+
+class _Call:
+    """A call in flight and its outcome, once done."""
+
+    def __init__(self):
+        """Initialize the _Call."""
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    The calls in flight across the threads of the worker, by key.
+    """
+
+    def __init__(self):
+        """Initialize the SingleFlight registry."""
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, function):
+        """
+        Run a function, or wait for the call in flight under the same key.
+
+        Args:
+            key (hashable): The key of the call.
+            function (callable): Called without arguments.
+
+        Returns:
+            tuple: The result of the function and whether it was shared from
+            another caller's call.
+
+        Raises:
+            Exception: The exception of the function, raised to every caller
+              of the key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
@@ -0,0 +1,148 @@
+"""
+Module for detecting the natural end of a generated conversation.
+"""
+
+import re
+import unicodedata
+
+# Define the farewell phrases that close a conversation in each language.
+# Phrases that are also used as greetings (e.g. "नमस्ते", "buenas noches")
+# are left out so an opening line is never taken for a goodbye.
+FAREWELL_PHRASES = {
+    'English': [
+        'goodbye', 'good bye', 'bye', 'see you', 'have a nice day',
+        'have a great day', 'take care', 'good night'
+    ],
+    'Hindi': [
+        'अलविदा', 'फिर मिलेंगे', 'शुभ रात्रि', 'आपका दिन शुभ हो', 'बाय'
+    ],
+    'German': [
+        'auf wiedersehen', 'tschüss', 'bis bald', 'bis später',
+        'schönen tag', "mach's gut", 'gute nacht'
+    ],
+    'Spanish': [
+        'adiós', 'adios', 'hasta luego', 'hasta pronto', 'hasta la vista',
+        'nos vemos', 'que tenga un buen día', 'que tengas un buen día'
+    ],
+    'French': [
+        'au revoir', 'à bientôt', 'bonne journée', 'bonne soirée',
+        'à plus tard', 'adieu'
+    ]
+}
+
+# Define the minimum number of exchanges before a conversation may end
+MIN_EXCHANGES = 2
+
+# Define the word overlap above which a turn counts as a repetition
+REPETITION_THRESHOLD = 0.8
+
+_FAREWELL_PATTERNS = {
+    language: re.compile(
+        r"(?<!\w)(" + "|".join(re.escape(phrase) for phrase in phrases)
+        + r")(?!\w)"
+    )
+    for language, phrases in FAREWELL_PHRASES.items()
+}
+
+
+def is_farewell(text, language):
+    """
+    Check whether a turn says goodbye.
+
+    Args:
+        text (str): The text of the turn.
+        language (str): The language of the conversation.
+
+    Returns:
+        bool: True if the turn contains a farewell phrase of the language.
+    """
+    pattern = _FAREWELL_PATTERNS.get(language, _FAREWELL_PATTERNS['English'])
+    return pattern.search(text.lower()) is not None
+
+
+def _words(text):
+    """
+    Split a text into its set of lowercase words.
+
+    Words are separated by whitespace and punctuation only, so the vowel
+    signs and viramas of scripts such as Devanagari, which are combining
+    marks rather than word characters, stay inside their words.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        set: The words of the text.
+    """
+    return set(''.join(
+        ' ' if unicodedata.category(char)[0] in 'PSZ' else char
+        for char in text.lower()
+    ).split())
+
+
+def is_empty(text):
+    """
+    Check whether a turn has no words, e.g. only punctuation.
+
+    Args:
+        text (str): The text of the turn.
+
+    Returns:
+        bool: True if the turn has no words.
+    """
+    return not _words(text)
+
+
+def is_repetition(text, previous_texts):
+    """
+    Check whether a turn mostly repeats an earlier turn.
+
+    Args:
+        text (str): The text of the turn.
+        previous_texts (list): The texts of the earlier turns.
+
+    Returns:
+        bool: True if the word overlap with an earlier turn reaches
+        REPETITION_THRESHOLD; an empty turn repeats nothing.
+    """
+    words = _words(text)
+    if not words:
+        return False
+    for previous in previous_texts:
+        previous_words = _words(previous)
+        overlap = len(words & previous_words) / len(words | previous_words)
+        if overlap >= REPETITION_THRESHOLD:
+            return True
+    return False
+
+
+def detect_conversation_end(texts, language):
+    """
+    Detect whether a conversation has come to a natural end.
+
+    The conversation ends when both turns of the latest exchange say goodbye,
+    when both of them repeat earlier turns, or when both of them are empty.
+    Nothing ends before MIN_EXCHANGES exchanges have taken place.
+
+    Args:
+        texts (list): The texts of all turns so far, in order.
+        language (str): The language of the conversation.
+
+    Returns:
+        str: 'farewell', 'repetition' or 'empty' if the conversation has
+        ended, otherwise None.
+    """
+    if len(texts) < 2 * MIN_EXCHANGES:
+        return None
+
+    last_exchange = texts[-2:]
+    if all(is_farewell(text, language) for text in last_exchange):
+        return 'farewell'
+
+    if all(is_empty(text) for text in last_exchange):
+        return 'empty'
+
+    earlier = texts[:-2]
+    if all(is_repetition(text, earlier) for text in last_exchange):
+        return 'repetition'
+    return None
@@ -0,0 +1,174 @@
+"""
+Module for the shared conversation transcript.
+"""
+
+import sys
+from bisect import bisect_left
+
+
+class Turn:
+    """
+    A single turn of the conversation.
+
+    Attributes:
+        speaker (str): The interned name of the speaker.
+        text (str): The text of the turn.
+        tokens (int): The approximate number of tokens of the text.
+    """
+
+    __slots__ = ('speaker', 'text', 'tokens')
+
+    def __init__(self, speaker, text):
+        """
+        Initialize the Turn.
+
+        Args:
+            speaker (str): The name of the speaker.
+            text (str): The text of the turn.
+        """
+        self.speaker = sys.intern(speaker)
+        self.text = text
+        self.tokens = len(text.split())
+
+    def __repr__(self):
+        return f"Turn({self.speaker!r}, {self.text!r})"
+
+
+class Transcript:
+    """
+    An append-only transcript shared by all chatbots of a session.
+
+    Turns are stored once, with a running token count so the context window
+    that fits a token budget is found by bisection and taken as a slice.
+    """
+
+    __slots__ = ('_turns', '_offsets')
+
+    def __init__(self):
+        """Initialize an empty Transcript."""
+        self._turns = []
+        self._offsets = [0]
+
+    def __len__(self):
+        return len(self._turns)
+
+    def __iter__(self):
+        return iter(self._turns)
+
+    def __getitem__(self, index):
+        return self._turns[index]
+
+    def append(self, speaker, text):
+        """
+        Append a turn to the transcript.
+
+        Args:
+            speaker (str): The name of the speaker.
+            text (str): The text of the turn.
+
+        Returns:
+            Turn: The appended turn.
+        """
+        turn = Turn(speaker, text)
+        self._turns.append(turn)
+        self._offsets.append(self._offsets[-1] + turn.tokens)
+        return turn
+
+    def fork(self):
+        """
+        Branch the transcript, e.g. into one of several variants of a session.
+
+        The fork shares the Turn objects of the common prefix, so only the
+        references are copied; turns appended afterwards to either transcript
+        are not seen by the other.
+
+        Returns:
+            Transcript: The fork, with the same turns so far.
+        """
+        fork = Transcript()
+        fork._turns = self._turns[:]
+        fork._offsets = self._offsets[:]
+        return fork
+
+    def window_start(self, max_tokens):
+        """
+        Find the first turn of the most recent window within a token budget.
+
+        Args:
+            max_tokens (int): The token budget of the window.
+
+        Returns:
+            int: The index of the oldest turn that fits the budget.
+        """
+        return bisect_left(self._offsets, self._offsets[-1] - max_tokens)
+
+    def texts(self):
+        """
+        List the texts of all turns.
+
+        Returns:
+            list: The texts, in order.
+        """
+        return [turn.text for turn in self._turns]
+
+    def script(self):
+        """
+        Render the transcript as a script.
+
+        Returns:
+            str: One "speaker: text" line per turn.
+        """
+        return "\n".join(f"{turn.speaker}: {turn.text}" for turn in self._turns)
+
+    def view(self, speaker):
+        """
+        Create a view of the transcript from the perspective of a speaker.
+
+        Args:
+            speaker (str): The name of the speaker.
+
+        Returns:
+            TranscriptView: The role-relative view.
+        """
+        return TranscriptView(self, speaker)
+
+
+class TranscriptView:
+    """
+    A role-relative view of a Transcript.
+
+    The speaker's own turns are presented as assistant messages and every
+    other turn as user messages, without copying the transcript.
+    """
+
+    __slots__ = ('transcript', 'speaker')
+
+    def __init__(self, transcript, speaker):
+        """
+        Initialize the TranscriptView.
+
+        Args:
+            transcript (Transcript): The transcript to view.
+            speaker (str): The name of the speaker the view belongs to.
+        """
+        self.transcript = transcript
+        self.speaker = sys.intern(speaker)
+
+    def messages(self, max_tokens):
+        """
+        Build the chat messages of the most recent turns within a budget.
+
+        Args:
+            max_tokens (int): The token budget of the context.
+
+        Returns:
+            list: The chat messages, oldest first.
+        """
+        start = self.transcript.window_start(max_tokens)
+        return [
+            {
+                "role": "assistant" if turn.speaker == self.speaker else "user",
+                "content": turn.text
+            }
+            for turn in self.transcript[start:]
+        ]
@@ -0,0 +1,373 @@
+"""
+Module for warming up the backend before it takes traffic.
+
+The first conversation after a deploy would otherwise pay for loading the
+model into the LLM server, opening connections and prefilling the system
+prompt. The warm-up first waits until every LLM server answers a completion,
+then primes the server's prompt cache with the system prompts of the common
+sessions with the default roles and scenario of the frontend, starting from
+its default language, proficiency level and learning mode. Each priming call
+generates a single token. A llama.cpp server keeps one prompt per parallel
+slot, so only as many system prompts as the server has slots are primed;
+more would evict each other.
+
+With several uvicorn workers, the workers take turns on a lock file per LLM
+server in a shared directory, and only the first one primes the server; the
+others find it warmed up and report ready too.
+
+The backend reports itself ready once the warm-up is done, see /ready.
+"""
+
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows, where every worker warms up on its own
+    fcntl = None
+
+from .chatbot import ARGUMENT_NUM_DICT, AUDIO_SPEECH, OPENING_INPUT, DualChatbot
+from .metrics import WARMUP_SECONDS
+
+# Define the warm-up modes: 'prompts' connects and primes the system
+# prompts, 'connect' only waits for the LLM servers and 'off' skips the
+# warm-up
+WARMUP_MODES = ('prompts', 'connect', 'off')
+
+# Define the roles and scenario of the primed sessions per learning mode,
+# the defaults of the frontend
+WARMUP_SESSIONS = {
+    'Conversation': ({'role1': {'name': 'Customer', 'action': 'ordering food'},
+                      'role2': {'name': 'Waitstaff',
+                                'action': 'taking the order'}},
+                     'at a restaurant'),
+    'Debate': ({'role1': {'name': 'Proponent'}, 'role2': {'name': 'Opponent'}},
+               'Climate change')
+}
+
+
+def warmup_chatbots(engine, llm_server, languages=tuple(AUDIO_SPEECH),
+                    proficiency_levels=tuple(ARGUMENT_NUM_DICT),
+                    learning_modes=tuple(WARMUP_SESSIONS),
+                    session_length='Short'):
+    """
+    Instruct the chatbots of the common sessions.
+
+    Args:
+        engine (str): The type of engine to use for the chatbots.
+        llm_server (str): The URL of the language model server.
+        languages (tuple, optional): The languages. Defaults to all.
+        proficiency_levels (tuple, optional): The levels. Defaults to all.
+        learning_modes (tuple, optional): The modes. Defaults to all.
+        session_length (str, optional): The session length. Defaults to
+          'Short'.
+
+    Returns:
+        list: (chatbot, input_text) pairs, the starting chatbot with the
+        opening input and its partner with none, in the order of the
+        languages, levels and modes, so the defaults of the frontend come
+        first.
+    """
+    chatbots = []
+    for learning_mode in learning_modes:
+        roles, scenario = WARMUP_SESSIONS[learning_mode]
+        for language in languages:
+            for proficiency_level in proficiency_levels:
+                session = DualChatbot(
+                    engine, {key: dict(role) for key, role in roles.items()},
+                    language, scenario, proficiency_level, learning_mode,
+                    session_length, llm_server=llm_server
+                )
+                chatbots.append((session.chatbots['role1']['chatbot'],
+                                 OPENING_INPUT))
+                chatbots.append((session.chatbots['role2']['chatbot'], None))
+    return chatbots
+
+
+def prime(chatbot, input_text):
+    """
+    Send the system prompt of a chatbot, generating a single token.
+
+    Args:
+        chatbot (Chatbot): The instructed chatbot.
+        input_text (str): The input following the system prompt, or None.
+    """
+    chatbot.generate_response(input_text, max_tokens=1, context=False,
+                              purpose='warmup')
+
+
+class ServerLock:
+    """
+    A lock file shared by the workers for one LLM server, which records that
+    the server was warmed up.
+
+    Attributes:
+        path (str): The path of the lock file.
+    """
+
+    def __init__(self, directory, server):
+        """
+        Initialize the ServerLock without taking it.
+
+        Args:
+            directory (str): The directory shared by the workers.
+            server (str): The URL of the LLM server.
+        """
+        self.path = os.path.join(
+            directory, f"warmup-{zlib.crc32(server.encode('utf-8')):08x}.lock")
+        self._file = None
+
+    def acquire(self, stop, interval=0.1):
+        """
+        Take the lock, waiting while another worker holds it.
+
+        Args:
+            stop (threading.Event): Set to give up waiting.
+            interval (float, optional): The wait between attempts, in
+              seconds. Defaults to 0.1.
+
+        Returns:
+            bool: Whether the lock was taken, False if stopped before.
+        """
+        self._file = open(self.path, 'a+')
+        while True:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if stop.wait(interval):
+                    self.release()
+                    return False
+
+    def release(self):
+        """Release the lock."""
+        self._file.close()
+        self._file = None
+
+    @property
+    def warmed(self):
+        """
+        Whether a worker warmed up the server.
+
+        Returns:
+            bool: True once mark_warmed() was called by any worker.
+        """
+        self._file.seek(0)
+        return self._file.read() == 'warmed'
+
+    def mark_warmed(self):
+        """Record that the server was warmed up."""
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write('warmed')
+        self._file.flush()
+
+
+class Warmup:
+    """
+    Warm up the LLM servers in a background thread and track the progress.
+
+    Attributes:
+        llm_servers (list): The URLs of the LLM servers.
+        mode (str): The warm-up mode, see WARMUP_MODES.
+        state (str): 'pending', 'connecting', 'priming' or 'ready'.
+        prompts (int): The number of system prompts to prime.
+        primed (int): The number of system prompts primed.
+        failed (int): The number of priming calls that failed.
+        shared (int): The number of LLM servers another worker warmed up.
+        seconds (float): The duration of the warm-up, once it is done.
+        error (str): The last error of an LLM call, if any.
+    """
+
+    def __init__(self, llm_servers, engine='OpenAI', mode='prompts', slots=4,
+                 lock_dir=None, retry_interval=1.0, max_retry_interval=10.0):
+        """
+        Initialize the Warmup without starting it.
+
+        Args:
+            llm_servers (list): The URLs of the LLM servers.
+            engine (str, optional): The type of engine to use for the
+              chatbots. Defaults to 'OpenAI'.
+            mode (str, optional): The warm-up mode, see WARMUP_MODES.
+              Defaults to 'prompts'.
+            slots (int, optional): The parallel slots of each LLM server,
+              the system prompts primed per server, all at once. Defaults
+              to 4.
+            lock_dir (str, optional): The directory of the lock files shared
+              by the workers, emptied before they start. Defaults to every
+              worker warming up on its own.
+            retry_interval (float, optional): The first wait before
+              reconnecting to an LLM server that does not answer, doubled up
+              to max_retry_interval, in seconds. Defaults to 1.0.
+            max_retry_interval (float, optional): The longest wait before
+              reconnecting, in seconds. Defaults to 10.0.
+
+        Raises:
+            ValueError: If the mode is unsupported.
+        """
+        if mode not in WARMUP_MODES:
+            raise ValueError(f"Unsupported warm-up mode: {mode}")
+        self.llm_servers = list(llm_servers)
+        self.engine = engine
+        self.mode = mode
+        self.slots = slots
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.state = 'pending'
+        self.prompts = 0
+        self.primed = 0
+        self.failed = 0
+        self.shared = 0
+        self.seconds = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        """
+        Whether the warm-up is done.
+
+        Returns:
+            bool: True once the backend can take traffic.
+        """
+        return self.state == 'ready'
+
+    def start(self):
+        """
+        Run the warm-up in a background thread.
+
+        Returns:
+            Warmup: The warm-up itself.
+        """
+        self._thread = threading.Thread(target=self.run, name='warmup',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop waiting for the LLM servers, e.g. on shutdown."""
+        self._stop.set()
+
+    def run(self):
+        """Connect to the LLM servers and prime the system prompts."""
+        start = time.perf_counter()
+        if self.mode != 'off':
+            chatbots = {server: warmup_chatbots(self.engine, server)[
+                :1 if self.mode == 'connect' else self.slots]
+                for server in self.llm_servers}
+            self.prompts = sum(map(len, chatbots.values()))
+            for server in self.llm_servers:
+                if not self._warm_up(server, chatbots[server]):
+                    return
+        self.seconds = time.perf_counter() - start
+        WARMUP_SECONDS.set(self.seconds)
+        self.state = 'ready'
+
+    def _warm_up(self, server, chatbots):
+        """
+        Warm up an LLM server, unless another worker did.
+
+        Args:
+            server (str): The URL of the LLM server.
+            chatbots (list): The (chatbot, input_text) pairs of the server.
+
+        Returns:
+            bool: Whether the server was warmed up, False if stopped before.
+        """
+        lock = None
+        if self.lock_dir is not None:
+            lock = ServerLock(self.lock_dir, server)
+            if not lock.acquire(self._stop):
+                return False
+        try:
+            if lock is not None and lock.warmed:
+                with self._lock:
+                    self.prompts -= len(chatbots)
+                    self.shared += 1
+                return True
+            self.state = 'connecting'
+            if not self._connect(*chatbots[0]):
+                return False
+            self.state = 'priming'
+            self._prime_all(chatbots[1:])
+            if lock is not None:
+                lock.mark_warmed()
+            return True
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def _connect(self, chatbot, input_text):
+        """
+        Prime a first system prompt, retrying until the LLM server answers.
+
+        Args:
+            chatbot (Chatbot): The instructed chatbot.
+            input_text (str): The input following the system prompt, or None.
+
+        Returns:
+            bool: Whether the server answered, False if stopped before.
+        """
+        interval = self.retry_interval
+        while not self._stop.is_set():
+            try:
+                prime(chatbot, input_text)
+            except Exception as e:
+                self.error = str(e)
+            else:
+                with self._lock:
+                    self.primed += 1
+                return True
+            self._stop.wait(interval)
+            interval = min(interval * 2, self.max_retry_interval)
+        return False
+
+    def _prime_all(self, chatbots):
+        """
+        Prime the system prompts of an LLM server, one per slot at once.
+
+        Args:
+            chatbots (list): (chatbot, input_text) pairs.
+        """
+        with ThreadPoolExecutor(max_workers=max(self.slots, 1)) as executor:
+            for _ in executor.map(lambda pair: self._prime(*pair), chatbots):
+                pass
+
+    def _prime(self, chatbot, input_text):
+        """
+        Prime a system prompt and count the outcome; a failure does not hold
+        the warm-up back, as the server did answer before.
+
+        Args:
+            chatbot (Chatbot): The instructed chatbot.
+            input_text (str): The input following the system prompt, or None.
+        """
+        try:
+            prime(chatbot, input_text)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+                self.error = str(e)
+            return
+        with self._lock:
+            self.primed += 1
+
+    def status(self):
+        """
+        Report the progress of the warm-up.
+
+        Returns:
+            dict: The state, the prompts to prime, the primed and failed ones,
+            the servers warmed up by another worker, the duration and the
+            last error.
+        """
+        return {'ready': self.ready, 'state': self.state, 'mode': self.mode,
+                'prompts': self.prompts, 'primed': self.primed,
+                'failed': self.failed, 'shared': self.shared,
+                'seconds': self.seconds, 'error': self.error}
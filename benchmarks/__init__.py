@@ -0,0 +1,3 @@
+"""
+Benchmarks for Parrot-AI that run offline, against a fake LLM server.
+"""
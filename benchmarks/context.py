@@ -0,0 +1,288 @@
+"""
+Context-length scaling benchmark of the conversation turns.
+
+Sessions are seeded with synthetic histories of a controlled length in every
+supported language, then a few exchanges are generated on top of each with
+streamed LLM calls. For every turn the prompt size, the time to first token
+(the prefill) and the total time are recorded, so the growth of the prefill
+with the context, the cap of the context budget and the savings of the
+server's prompt cache show up per history length.
+
+The first turn after seeding is cold: the server has not seen the history.
+Later turns extend the previous prompt, so a prompt cache only has to
+prefill the new turns, until the history exceeds the context budget and the
+trimmed window starts to slide. Without --llm-server, a fake LLM server with
+a per-token prefill cost and a prompt cache is started locally:
+
+    python -m benchmarks.context --context-tokens 0,500,1000,2000,4000
+    python -m benchmarks.context --llm-server http://localhost:8080
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+
+from backend.src.chatbot import AUDIO_SPEECH, MAX_CONTEXT_TOKENS, DualChatbot
+from backend.src.metrics import request_llm_calls, start_request_timings
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import PAYLOAD, compare, load_results, save_results
+
+# Define the sentences the synthetic histories are built from, per language
+SENTENCES = {
+    'English': [
+        "Good evening, do you have a table for two by the window?",
+        "Of course, please follow me and have a look at the menu.",
+        "What would you recommend from the specials of the day?",
+        "The grilled fish with lemon and fresh vegetables is very popular.",
+        "Could we also have a bottle of sparkling water, please?",
+        "Certainly, I will bring it right away with some warm bread."
+    ],
+    'Hindi': [
+        "शुभ संध्या, क्या आपके पास खिड़की के पास दो लोगों की मेज़ है?",
+        "ज़रूर, कृपया मेरे साथ आइए और मेन्यू देख लीजिए।",
+        "आज के खास व्यंजनों में से आप क्या सुझाएंगे?",
+        "नींबू और ताज़ी सब्ज़ियों के साथ भुनी मछली बहुत पसंद की जाती है।",
+        "क्या हमें एक बोतल सोडा पानी भी मिल सकता है?",
+        "बिल्कुल, मैं अभी गरम रोटी के साथ ले आता हूँ।"
+    ],
+    'German': [
+        "Guten Abend, haben Sie einen Tisch für zwei am Fenster?",
+        "Natürlich, bitte folgen Sie mir und schauen Sie in die Karte.",
+        "Was würden Sie von den Tagesgerichten empfehlen?",
+        "Der gegrillte Fisch mit Zitrone und frischem Gemüse ist sehr beliebt.",
+        "Könnten wir bitte auch eine Flasche Sprudelwasser bekommen?",
+        "Selbstverständlich, ich bringe sie sofort mit etwas warmem Brot."
+    ],
+    'Spanish': [
+        "Buenas noches, ¿tienen una mesa para dos junto a la ventana?",
+        "Por supuesto, síganme por favor y echen un vistazo a la carta.",
+        "¿Qué nos recomienda de los platos del día?",
+        "El pescado a la plancha con limón y verduras frescas es muy popular.",
+        "¿Podría traernos también una botella de agua con gas, por favor?",
+        "Claro, se la traigo enseguida con un poco de pan caliente."
+    ],
+    'French': [
+        "Bonsoir, avez-vous une table pour deux près de la fenêtre ?",
+        "Bien sûr, suivez-moi et jetez un coup d'œil au menu.",
+        "Que nous conseillez-vous parmi les plats du jour ?",
+        "Le poisson grillé au citron et aux légumes frais est très apprécié.",
+        "Pourriez-vous aussi nous apporter une bouteille d'eau gazeuse ?",
+        "Certainement, je vous l'apporte tout de suite avec du pain chaud."
+    ]
+}
+
+
+def synthetic_history(language, tokens, speakers, rng):
+    """
+    Build a conversation history of about a given length.
+
+    Turns alternate between the speakers, ending with the second one so the
+    first speaks next, and hold one to three sentences each. Lengths are
+    counted the way the transcript counts them for its context budget.
+
+    Args:
+        language (str): The language of the sentences.
+        tokens (int): The length of the history, in transcript tokens.
+        speakers (tuple): The names of the two speakers.
+        rng (random.Random): The random generator of the sentences.
+
+    Returns:
+        list: The turns as (speaker, text) tuples.
+    """
+    turns, length = [], 0
+    while length < tokens or len(turns) % 2:
+        text = " ".join(rng.choices(SENTENCES[language], k=rng.randint(1, 3)))
+        turns.append((speakers[len(turns) % 2], text))
+        length += len(text.split())
+    return turns
+
+
+def seed_session(language, tokens, llm_server, seed=0):
+    """
+    Create a session of the benchmark payload with a synthetic history.
+
+    Args:
+        language (str): The language of the session.
+        tokens (int): The length of the history, in transcript tokens.
+        llm_server (str): The URL of the language model server.
+        seed (int, optional): The seed of the history. Defaults to 0.
+
+    Returns:
+        DualChatbot: The session, streaming its LLM calls.
+    """
+    role_dict = {key: dict(role) for key, role in PAYLOAD['role_dict'].items()}
+    session = DualChatbot(
+        PAYLOAD['engine'], role_dict, language, PAYLOAD['scenario'],
+        PAYLOAD['proficiency_level'], PAYLOAD['learning_mode'],
+        PAYLOAD['session_length'],
+        llm_server=llm_server
+    )
+    speakers = (role_dict['role1']['name'], role_dict['role2']['name'])
+    for speaker, text in synthetic_history(language, tokens, speakers,
+                                           random.Random(seed)):
+        session.transcript.append(speaker, text)
+    for key in ('role1', 'role2'):
+        session.chatbots[key]['chatbot'].stream = True
+    return session
+
+
+def run_case(language, tokens, llm_server, exchanges=3):
+    """
+    Generate exchanges on top of a seeded history and time its turns.
+
+    Args:
+        language (str): The language of the session.
+        tokens (int): The length of the seeded history, in transcript tokens.
+        llm_server (str): The URL of the language model server.
+        exchanges (int, optional): The exchanges to generate. Defaults to 3.
+
+    Returns:
+        dict: The timings of the conversation turns, in order, each with its
+        role and whether it is cold, and their summary. The first turn of
+        each role is cold, as each role has its own system prompt; the later
+        turns of a role are warm, extending its previous prompt.
+    """
+    # Seed each length differently, so a history is not the prefix of a
+    # longer one still in the server's prompt cache
+    session = seed_session(language, tokens, llm_server, seed=tokens)
+    start_request_timings()
+    for _ in range(exchanges):
+        session.step()
+    turns = [call for call in request_llm_calls() if call['purpose'] == 'turn']
+    # Each step has the first role speak, then the second
+    seen = set()
+    for index, turn in enumerate(turns):
+        turn['role'] = ('role1', 'role2')[index % 2]
+        turn['cold'] = turn['role'] not in seen
+        seen.add(turn['role'])
+    cold = [turn for turn in turns if turn['cold']]
+    warm = [turn for turn in turns if not turn['cold']]
+
+    def mean(calls, key):
+        values = [call[key] for call in calls if call.get(key) is not None]
+        return statistics.mean(values) if values else None
+
+    return {
+        'language': language,
+        'context_tokens': tokens,
+        'trimmed': tokens > MAX_CONTEXT_TOKENS,
+        'turns': turns,
+        'prompt_tokens': mean(turns, 'prompt_tokens'),
+        'cold_ttft_ms': mean(cold, 'ttft_ms'),
+        'warm_ttft_ms': mean(warm, 'ttft_ms'),
+        'cold_cached_tokens': mean(cold, 'cached_tokens'),
+        'warm_cached_tokens': mean(warm, 'cached_tokens'),
+        'total_ms': mean(turns, 'total_ms')
+    }
+
+
+def print_cases(cases):
+    """
+    Print the case summaries as a table.
+
+    Args:
+        cases (list): The case summaries.
+    """
+    def fmt(value):
+        return f"{value:9.0f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'language':<8} {'history':>8} {'prompt':>9} {'cold':>9} "
+          f"{'warm':>9} {'cached':>9} {'total':>9}  (tokens | TTFT ms | "
+          "cached tokens | ms per turn)")
+    for case in cases:
+        trimmed = '*' if case['trimmed'] else ' '
+        print(f"{case['language']:<8} {case['context_tokens']:>7}{trimmed} "
+              f"{fmt(case['prompt_tokens'])} {fmt(case['cold_ttft_ms'])} "
+              f"{fmt(case['warm_ttft_ms'])} {fmt(case['warm_cached_tokens'])} "
+              f"{fmt(case['total_ms'])}")
+    print(f"* history longer than the context budget of {MAX_CONTEXT_TOKENS} "
+          "tokens, trimmed")
+
+
+def baseline_metrics(results):
+    """
+    Select the metrics compared against a baseline.
+
+    Args:
+        results (dict): The benchmark results.
+
+    Returns:
+        dict: {name: (value, higher_is_better)}.
+    """
+    metrics = {}
+    for case in results['cases']:
+        prefix = f"{case['language']}.{case['context_tokens']}"
+        for key in ('cold_ttft_ms', 'warm_ttft_ms', 'total_ms'):
+            if case[key] is not None:
+                metrics[f"{prefix}.{key}"] = (case[key], False)
+    return metrics
+
+
+def main():
+    """Run the context-length scaling benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Context-length scaling benchmark of the turns.")
+    parser.add_argument('--llm-server', help='LLM server to measure; by '
+                                             'default a fake one is started')
+    parser.add_argument('--languages', default=','.join(AUDIO_SPEECH),
+                        help='comma-separated languages')
+    parser.add_argument('--context-tokens', default='0,250,500,1000,2000,4000',
+                        help='comma-separated history lengths')
+    parser.add_argument('--exchanges', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='time to first token of the fake LLM without '
+                             'a prompt')
+    parser.add_argument('--prefill-per-token', type=float, default=0.0001,
+                        help='prefill time of the fake LLM per prompt token')
+    parser.add_argument('--tokens-per-second', type=float, default=500.0)
+    parser.add_argument('--prompt-cache-slots', type=int, default=4,
+                        help='prompt cache of the fake LLM; 0 disables it')
+    parser.add_argument('--output', default='benchmarks/results/context.json')
+    parser.add_argument('--baseline', help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args()
+
+    cases = []
+    with ExitStack() as stack:
+        llm_server = args.llm_server
+        if llm_server is None:
+            llm = FakeLLMServer(config=FakeLLMConfig(
+                latency=args.latency, prefill_per_token=args.prefill_per_token,
+                tokens_per_second=args.tokens_per_second, seed=0,
+                prompt_cache_slots=args.prompt_cache_slots
+            )).start()
+            stack.callback(llm.stop)
+            llm_server = llm.url
+        for language in args.languages.split(','):
+            for tokens in map(int, args.context_tokens.split(',')):
+                cases.append(run_case(language, tokens, llm_server,
+                                      exchanges=args.exchanges))
+                print(f"{language} {tokens} tokens: "
+                      f"{cases[-1]['total_ms'] or 0:.0f} ms per turn")
+
+    print_cases(cases)
+    results = {
+        'benchmark': 'context',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': vars(args),
+        'context_budget': MAX_CONTEXT_TOKENS,
+        'cases': cases
+    }
+    save_results(results, args.output)
+    if args.baseline:
+        comparisons = compare(baseline_metrics(results),
+                              baseline_metrics(load_results(args.baseline)),
+                              args.threshold)
+        for item in comparisons:
+            flag = 'REGRESSION' if item['regression'] else 'ok'
+            print(f"{item['metric']:<32} {item['baseline']:10.1f} -> "
+                  f"{item['current']:10.1f} ({item['change']:+.0%}) {flag}")
+        if any(item['regression'] for item in comparisons):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
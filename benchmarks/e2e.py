@@ -0,0 +1,304 @@
+"""
+End-to-end throughput benchmark of the backend against a fake LLM server.
+
+The benchmark starts the fake OpenAI-compatible server in-process and
+backend/app.py under uvicorn, then drives /generate_conversation with an
+increasing number of concurrent clients. Each client plays sessions of a
+few exchanges. For every concurrency level it reports the throughput, the
+client-side latency percentiles and the backend overhead, i.e. the time a
+request spends in the backend without waiting for the LLM, read from the
+Server-Timing header. The results are written as JSON and can be compared
+against a stored baseline:
+
+    python -m benchmarks.e2e --save-baseline benchmarks/baselines/e2e.json
+    python -m benchmarks.e2e --baseline benchmarks/baselines/e2e.json
+"""
+
+import argparse
+import platform
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import (
+    LLM_STAGES, PAYLOAD, compare, load_results, parse_server_timing,
+    run_backend, save_results, summarize
+)
+
+# Define the throughput gain below which a concurrency level is saturated
+SATURATION_GAIN = 0.1
+
+# Define the share of the linear throughput gain every concurrency level must
+# reach with --check-scaling; the fake LLM server answers any number of calls
+# at once, so only the backend can hold the throughput back
+MIN_SCALING = 0.3
+
+
+def run_client(backend_url, requests_per_client, exchanges_per_session,
+               payload):
+    """
+    Play sessions against the backend, one request at a time.
+
+    Args:
+        backend_url (str): The base URL of the backend.
+        requests_per_client (int): The number of exchanges to request.
+        exchanges_per_session (int): The exchanges per session before
+          starting a new one.
+        payload (dict): The conversation settings.
+
+    Returns:
+        list: One dict per request with the status, the client latency and
+        the server-side total and LLM time, all in milliseconds.
+    """
+    samples = []
+    session_id = None
+    with requests.Session() as http:
+        for index in range(requests_per_client):
+            if index % exchanges_per_session == 0:
+                if session_id is not None:
+                    http.post(f"{backend_url}/reset_conversation",
+                              params={'session_id': session_id})
+                session_id = uuid.uuid4().hex
+            start = time.perf_counter()
+            try:
+                response = http.post(f"{backend_url}/generate_conversation",
+                                     json={**payload, 'session_id': session_id},
+                                     timeout=300)
+                status = response.status_code
+                timings = parse_server_timing(
+                    response.headers.get('Server-Timing'))
+            except requests.exceptions.RequestException:
+                status, timings = None, {}
+            latency = (time.perf_counter() - start) * 1000
+            samples.append({
+                'status': status,
+                'latency': latency,
+                'server': timings.get('total'),
+                'llm': sum(timings.get(stage, 0.0) for stage in LLM_STAGES)
+            })
+        if session_id is not None:
+            http.post(f"{backend_url}/reset_conversation",
+                      params={'session_id': session_id})
+    return samples
+
+
+def run_level(backend_url, concurrency, requests_per_client,
+              exchanges_per_session, payload):
+    """
+    Run one concurrency level and summarize it.
+
+    Args:
+        backend_url (str): The base URL of the backend.
+        concurrency (int): The number of concurrent clients.
+        requests_per_client (int): The exchanges requested by each client.
+        exchanges_per_session (int): The exchanges per session.
+        payload (dict): The conversation settings.
+
+    Returns:
+        dict: The throughput, error rate and latency summaries in
+        milliseconds: client latency, server time, backend overhead and
+        queueing before the backend starts the request.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_client, backend_url, requests_per_client,
+                            exchanges_per_session, payload)
+            for _ in range(concurrency)
+        ]
+        samples = [sample for future in futures for sample in future.result()]
+    elapsed = time.perf_counter() - start
+
+    ok = [sample for sample in samples if sample['status'] == 200]
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'error_rate': (len(samples) - len(ok)) / len(samples),
+        'elapsed': elapsed,
+        'throughput': len(ok) / elapsed,
+        'latency': summarize([sample['latency'] for sample in ok]),
+        'server': summarize([sample['server'] for sample in ok]),
+        'overhead': summarize([sample['server'] - sample['llm']
+                               for sample in ok]),
+        'queueing': summarize([sample['latency'] - sample['server']
+                               for sample in ok])
+    }
+
+
+def find_saturation(levels):
+    """
+    Find the concurrency level at which the throughput stops scaling.
+
+    Args:
+        levels (list): The level summaries, in increasing concurrency.
+
+    Returns:
+        int: The first concurrency whose throughput gains less than
+        SATURATION_GAIN over the best lower level, or None.
+    """
+    best = None
+    for level in levels:
+        if best is not None and level['throughput'] < best * (1 + SATURATION_GAIN):
+            return level['concurrency']
+        best = max(best or 0.0, level['throughput'])
+    return None
+
+
+def scaling_failures(levels, min_scaling=MIN_SCALING):
+    """
+    Find the concurrency levels whose throughput does not scale.
+
+    Args:
+        levels (list): The level summaries, in increasing concurrency.
+        min_scaling (float, optional): The share of the linear throughput
+          gain over the first level each level must reach. Defaults to
+          MIN_SCALING.
+
+    Returns:
+        list: The concurrencies whose throughput gains less than min_scaling
+        of the gain of linear scaling from the first level.
+    """
+    first = levels[0]
+    return [
+        level['concurrency'] for level in levels[1:]
+        if level['throughput'] / first['throughput'] - 1
+        < min_scaling * (level['concurrency'] / first['concurrency'] - 1)
+    ]
+
+
+def baseline_metrics(results):
+    """
+    Select the metrics compared against a baseline.
+
+    Args:
+        results (dict): The benchmark results.
+
+    Returns:
+        dict: {name: (value, higher_is_better)}.
+    """
+    metrics = {}
+    for level in results['levels']:
+        prefix = f"c{level['concurrency']}"
+        metrics[f"{prefix}.throughput"] = (level['throughput'], True)
+        metrics[f"{prefix}.latency.p95"] = (level['latency']['p95'], False)
+        metrics[f"{prefix}.overhead.p50"] = (level['overhead']['p50'], False)
+    return metrics
+
+
+def print_levels(levels):
+    """
+    Print the level summaries as a table.
+
+    Args:
+        levels (list): The level summaries.
+    """
+    def fmt(value):
+        return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'conc':>5} {'req/s':>8} {'err':>5} {'p50':>9} {'p95':>9} "
+          f"{'p99':>9} {'overhead p50':>13} {'queue p50':>10}  (ms)")
+    for level in levels:
+        latency = level['latency']
+        print(f"{level['concurrency']:>5} {level['throughput']:8.2f} "
+              f"{level['errors']:>5} {fmt(latency['p50'])} {fmt(latency['p95'])} "
+              f"{fmt(latency['p99'])} {fmt(level['overhead']['p50']):>13} "
+              f"{fmt(level['queueing']['p50']):>10}")
+
+
+def main():
+    """Run the benchmark and compare it against a baseline if requested."""
+    parser = argparse.ArgumentParser(
+        description="End-to-end throughput benchmark against a fake LLM server.")
+    parser.add_argument('--concurrency', default='1,2,4,8',
+                        help='comma-separated concurrency levels')
+    parser.add_argument('--requests-per-client', type=int, default=6)
+    parser.add_argument('--exchanges-per-session', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='uvicorn workers of the backend')
+    parser.add_argument('--generation-mode', default='Dialogue',
+                        choices=['Dialogue', 'Script'])
+    parser.add_argument('--language', default=PAYLOAD['language'])
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='median time to first token of the fake LLM')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--tokens-per-second', type=float, default=500.0)
+    parser.add_argument('--completion-tokens', type=int, default=24)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmarks/results/e2e.json')
+    parser.add_argument('--baseline', help='results to compare against')
+    parser.add_argument('--save-baseline', help='also write the results here')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='tolerated relative change against the baseline')
+    parser.add_argument('--check-scaling', action='store_true',
+                        help='fail if the throughput does not scale with the '
+                             'concurrency')
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency=args.latency, jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        failure_rate=args.failure_rate, seed=args.seed
+    )
+    payload = {**PAYLOAD, 'generation_mode': args.generation_mode,
+               'language': args.language}
+    llm = FakeLLMServer(config=config).start()
+    levels = []
+    try:
+        with run_backend(llm.url, workers=args.workers) as backend_url:
+            # Warm up the backend before measuring
+            run_client(backend_url, 1, 1, payload)
+            for concurrency in map(int, args.concurrency.split(',')):
+                levels.append(run_level(
+                    backend_url, concurrency, args.requests_per_client,
+                    args.exchanges_per_session, payload))
+                print(f"concurrency {concurrency}: "
+                      f"{levels[-1]['throughput']:.2f} req/s")
+    finally:
+        llm.stop()
+
+    results = {
+        'benchmark': 'e2e',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'processor': platform.processor()},
+        'config': vars(args),
+        'llm': llm.stats,
+        'levels': levels,
+        'saturation_concurrency': find_saturation(levels),
+        'scaling_failures': scaling_failures(levels),
+        'peak_throughput': max(level['throughput'] for level in levels)
+    }
+    print_levels(levels)
+    print(f"Peak throughput: {results['peak_throughput']:.2f} req/s, "
+          f"saturated at concurrency {results['saturation_concurrency']}")
+    save_results(results, args.output)
+    if args.save_baseline:
+        save_results(results, args.save_baseline)
+
+    failed = args.check_scaling and bool(results['scaling_failures'])
+    if failed:
+        print(f"Throughput does not scale at concurrency "
+              f"{', '.join(map(str, results['scaling_failures']))}")
+    if args.baseline:
+        comparisons = compare(baseline_metrics(results),
+                              baseline_metrics(load_results(args.baseline)),
+                              args.threshold)
+        for item in comparisons:
+            flag = 'REGRESSION' if item['regression'] else 'ok'
+            print(f"{item['metric']:<22} {item['baseline']:10.2f} -> "
+                  f"{item['current']:10.2f} ({item['change']:+.0%}) {flag}")
+        failed = failed or any(item['regression'] for item in comparisons)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,488 @@
+"""
+A fake OpenAI-compatible LLM server for offline benchmarks.
+
+The server answers POST /v1/chat/completions with generated text, after a
+configurable time to first token and at a configurable token rate, with
+optional jitter, streaming and random failures. The time to first token can
+grow with the prompt, and a prompt cache in the style of llama.cpp's slots
+skips the prefill of a prompt prefix it has seen before. Replies follow the shape
+the backend expects: plain turns, speaker-tagged scripts and translations
+that keep the speaker tags, cut at the first stop sequence of the request.
+
+Run it standalone with:
+
+    python -m benchmarks.fake_llm_server --port 8080 --tokens-per-second 40
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "hello table menu please water coffee soup bread order price bill card "
+    "today fresh special dessert thank you welcome recommend chicken rice "
+    "salad spicy sweet cold warm glass plate window quiet busy friend"
+).split()
+
+
+class FakeLLMConfig:
+    """
+    The timing, length and failure behavior of the fake LLM server.
+
+    Attributes:
+        latency (float): The median time to first token, in seconds.
+        jitter (float): The sigma of the lognormal factor applied to the
+            latency; 0 makes it constant.
+        prefill_per_token (float): Additional time to first token per prompt
+            token, in seconds.
+        tokens_per_second (float): The generation rate after the first token.
+        completion_tokens (int): The mean number of tokens of a turn.
+        failure_rate (float): The fraction of requests answered with HTTP 500.
+        seed (int): The seed of the random generator, or None.
+        prompt_cache_slots (int): The number of recent prompts kept in the
+            prompt cache; 0 disables it.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, prefill_per_token=0.0,
+                 tokens_per_second=200.0, completion_tokens=24,
+                 failure_rate=0.0, seed=None, prompt_cache_slots=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.prefill_per_token = prefill_per_token
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.prompt_cache_slots = prompt_cache_slots
+
+
+def count_prompt_tokens(messages):
+    """
+    Approximate the number of prompt tokens of a chat request.
+
+    Args:
+        messages (list): The chat messages.
+
+    Returns:
+        int: About 1.3 tokens per word plus 4 per message.
+    """
+    words = sum(len(str(m.get('content', '')).split()) for m in messages)
+    return int(words * 1.3) + 4 * len(messages)
+
+
+def prompt_words(messages):
+    """
+    Split a chat request into the words its prompt cache is matched on.
+
+    Args:
+        messages (list): The chat messages.
+
+    Returns:
+        tuple: A role marker followed by the words of each message.
+    """
+    words = []
+    for message in messages:
+        words.append(f"<|{message.get('role')}|>")
+        words.extend(str(message.get('content', '')).split())
+    return tuple(words)
+
+
+def common_prefix_length(first, second):
+    """
+    Count the leading items two sequences share.
+
+    Args:
+        first (tuple): The first sequence.
+        second (tuple): The second sequence.
+
+    Returns:
+        int: The length of the common prefix.
+    """
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return length
+
+
+def cut_at_stop(tokens, stop):
+    """
+    Cut the tokens of a completion at the first stop sequence, as servers that
+    honor the stop parameter do.
+
+    The stop sequence is left out of the completion and reported apart, as
+    the stop_reason of vLLM.
+
+    Args:
+        tokens (list): The tokens of the completion.
+        stop (str or list): The stop parameter of the request, or None.
+
+    Returns:
+        tuple: The tokens before the stop sequence, and the stop sequence or
+        None if none showed up.
+    """
+    if isinstance(stop, str):
+        stop = [stop]
+    text = ''.join(tokens)
+    found = [(text.find(sequence), sequence) for sequence in stop or []
+             if sequence and sequence in text]
+    if not found:
+        return tokens, None
+    end, sequence = min(found)
+    cut, length = [], 0
+    for token in tokens:
+        if length + len(token) > end:
+            if end > length:
+                cut.append(token[:end - length])
+            break
+        cut.append(token)
+        length += len(token)
+    return cut, sequence
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    A threaded HTTP server speaking the OpenAI chat completions API.
+
+    Attributes:
+        config (FakeLLMConfig): The behavior of the server.
+        stats (dict): The number of requests, failures, prompt tokens,
+            cached prompt tokens and completion tokens served so far.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), config=None):
+        """
+        Initialize the server and bind it.
+
+        Args:
+            address (tuple, optional): The host and port; port 0 picks a free
+              one. Defaults to ('127.0.0.1', 0).
+            config (FakeLLMConfig, optional): The behavior of the server.
+        """
+        super().__init__(address, FakeLLMHandler)
+        self.config = config or FakeLLMConfig()
+        self.random = random.Random(self.config.seed)
+        self.stats = {'requests': 0, 'failures': 0, 'prompt_tokens': 0,
+                      'cached_tokens': 0, 'completion_tokens': 0}
+        self.prompt_cache = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        The base URL of the server, as used for LLM_SERVER.
+
+        Returns:
+            str: The URL.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Serve in a background thread.
+
+        Returns:
+            FakeLLMServer: The server, for chaining.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self.shutdown()
+        self.server_close()
+
+    def record(self, **counts):
+        """
+        Add to the request statistics.
+
+        Args:
+            **counts: The increments per statistic.
+        """
+        with self._lock:
+            for key, value in counts.items():
+                self.stats[key] += value
+
+    def cached_prefix(self, words):
+        """
+        Look a prompt up in the prompt cache and keep it there.
+
+        A prompt continuing a cached one, sharing at least half of it,
+        takes over its slot and skips the prefill of the shared prefix.
+        Any other prompt replaces the least recently used slot, so a
+        translation does not evict the turn sharing its system message.
+
+        Args:
+            words (tuple): The prompt, see prompt_words().
+
+        Returns:
+            int: The number of leading words already in the cache.
+        """
+        slots = self.config.prompt_cache_slots
+        if not slots:
+            return 0
+        with self._lock:
+            best, best_length = None, 0
+            for index, cached in enumerate(self.prompt_cache):
+                length = common_prefix_length(words, cached)
+                if length > best_length and length * 2 >= len(cached):
+                    best, best_length = index, length
+            if best is not None:
+                del self.prompt_cache[best]
+            elif len(self.prompt_cache) >= slots:
+                self.prompt_cache.popleft()
+            self.prompt_cache.append(words)
+            return best_length
+
+    def sample(self, function, *args):
+        """
+        Draw from the shared random generator.
+
+        Args:
+            function (str): The name of the random.Random method.
+            *args: Its arguments.
+
+        Returns:
+            The drawn value.
+        """
+        with self._lock:
+            return getattr(self.random, function)(*args)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """The request handler of FakeLLMServer."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keep the benchmark output quiet."""
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the model list, the health check and the statistics."""
+        if self.path.startswith('/v1/models'):
+            self._send_json(200, {'object': 'list', 'data': [
+                {'id': 'LLaMA_CPP', 'object': 'model'}]})
+        elif self.path.startswith('/health'):
+            self._send_json(200, {'status': 'ok'})
+        elif self.path.startswith('/stats'):
+            self._send_json(200, self.server.stats)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Serve a chat completion or the tokenization of a text."""
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.startswith('/tokenize'):
+            # Answer like llama.cpp servers, at the rate of count_prompt_tokens()
+            count = int(len(str(request.get('content', '')).split()) * 1.3)
+            self._send_json(200, {'tokens': list(range(count))})
+            return
+        if not self.path.startswith('/v1/chat/completions'):
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        server = self.server
+        config = server.config
+        messages = request.get('messages', [])
+        prompt_tokens = count_prompt_tokens(messages)
+        words = prompt_words(messages)
+        cached_tokens = prompt_tokens * server.cached_prefix(words) // len(words) \
+            if words else 0
+        tokens = self._generate(messages, request.get('max_tokens'))
+        finish_reason = 'length' if request.get('max_tokens') and \
+            len(tokens) >= request['max_tokens'] else 'stop'
+        tokens, stop_reason = cut_at_stop(tokens, request.get('stop'))
+        if stop_reason is not None:
+            finish_reason = 'stop'
+
+        ttft = config.latency + (prompt_tokens - cached_tokens) * \
+            config.prefill_per_token
+        if config.jitter:
+            ttft *= server.sample('lognormvariate', 0, config.jitter)
+        failed = server.sample('random') < config.failure_rate
+        server.record(requests=1, failures=int(failed))
+
+        if failed:
+            time.sleep(ttft)
+            self._send_json(500, {'error': {'message': 'Injected failure'}})
+            return
+
+        server.record(prompt_tokens=prompt_tokens, cached_tokens=cached_tokens,
+                      completion_tokens=len(tokens))
+        usage = {'prompt_tokens': prompt_tokens,
+                 'completion_tokens': len(tokens),
+                 'total_tokens': prompt_tokens + len(tokens)}
+        if config.prompt_cache_slots:
+            usage['prompt_tokens_details'] = {'cached_tokens': cached_tokens}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        time.sleep(ttft)
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get(
+                'include_usage', False)
+            self._stream(completion_id, tokens, finish_reason, stop_reason,
+                         usage if include_usage else None)
+            return
+
+        time.sleep(max(len(tokens) - 1, 0) / config.tokens_per_second)
+        self._send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'LLaMA_CPP'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                'finish_reason': finish_reason,
+                'stop_reason': stop_reason
+            }],
+            'usage': usage
+        })
+
+    def _stream(self, completion_id, tokens, finish_reason, stop_reason, usage):
+        """
+        Send the completion as server-sent events, one token per chunk.
+
+        Args:
+            completion_id (str): The id of the completion.
+            tokens (list): The tokens to send.
+            finish_reason (str): The finish reason of the last chunk.
+            stop_reason (str): The stop sequence the completion was cut at,
+                or None.
+            usage (dict): The usage to send in a final chunk, or None.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def send(choices, extra=None):
+            chunk = {'id': completion_id, 'object': 'chat.completion.chunk',
+                     'created': int(time.time()), 'model': 'LLaMA_CPP',
+                     'choices': choices, **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        interval = 1 / self.server.config.tokens_per_second
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(interval)
+            send([{'index': 0, 'delta': {'content': token},
+                   'finish_reason': None}])
+        send([{'index': 0, 'delta': {}, 'finish_reason': finish_reason,
+               'stop_reason': stop_reason}])
+        if usage is not None:
+            send([], {'usage': usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _words(self, count):
+        return [self.server.sample('choice', WORDS) for _ in range(count)]
+
+    def _turn_length(self):
+        mean = self.server.config.completion_tokens
+        return max(1, int(self.server.sample('uniform', 0.5, 1.5) * mean))
+
+    def _generate(self, messages, max_tokens):
+        """
+        Generate the completion tokens for a request.
+
+        Scripts are detected by the script writer's system message and
+        translations of scripts by their speaker-tagged lines, so the
+        backend's parser finds the turns it expects.
+
+        Args:
+            messages (list): The chat messages.
+            max_tokens (int): The max_tokens of the request, or None.
+
+        Returns:
+            list: The tokens, each with its leading whitespace or newline.
+        """
+        system = next((str(m['content']) for m in messages
+                       if m.get('role') == 'system'), '')
+        last = str(messages[-1]['content']) if messages else ''
+        lines = []
+        roles = re.search(r"one line by (.+?) followed by one line by (.+?)\.",
+                          system)
+        exchanges = re.search(r"Write exactly (\d+) exchanges", system)
+        if roles and exchanges:
+            for _ in range(int(exchanges.group(1))):
+                for role in roles.groups():
+                    lines.append([f"{role}:"] + self._words(self._turn_length()))
+        elif "Keep the speaker names" in last:
+            for line in last.splitlines()[1:]:
+                speaker, _, text = line.partition(':')
+                lines.append([f"{speaker}:"] + self._words(len(text.split())))
+        else:
+            lines.append(self._words(self._turn_length()))
+
+        tokens = []
+        for line in lines:
+            for index, word in enumerate(line):
+                prefix = ('\n' if tokens else '') if index == 0 else ' '
+                tokens.append(prefix + word)
+        if max_tokens:
+            tokens = tokens[:max_tokens]
+        return tokens
+
+
+def main():
+    """Run the fake LLM server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='median time to first token, in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='lognormal sigma applied to the latency')
+    parser.add_argument('--prefill-per-token', type=float, default=0.0,
+                        help='extra time to first token per prompt token')
+    parser.add_argument('--tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--completion-tokens', type=int, default=24,
+                        help='mean number of tokens per turn')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--prompt-cache-slots', type=int, default=0,
+                        help='recent prompts whose prefix skips the prefill')
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency=args.latency, jitter=args.jitter,
+        prefill_per_token=args.prefill_per_token,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        failure_rate=args.failure_rate, seed=args.seed,
+        prompt_cache_slots=args.prompt_cache_slots
+    )
+    server = FakeLLMServer((args.host, args.port), config)
+    print(f"Fake LLM server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Shared helpers of the benchmarks: running the backend, summarizing latencies
+and comparing results against a stored baseline.
+"""
+
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'backend')
+
+# Define the payload of a benchmark session, as sent by the frontend
+PAYLOAD = {
+    "engine": "OpenAI",
+    "role_dict": {
+        "role1": {"name": "Customer", "action": "ordering food"},
+        "role2": {"name": "Waitstaff", "action": "taking the order"}
+    },
+    "language": "Spanish",
+    "scenario": "at a restaurant",
+    "proficiency_level": "Intermediate",
+    "learning_mode": "Conversation",
+    "session_length": "Short",
+    "generation_mode": "Dialogue"
+}
+
+# Define the stages of the Server-Timing header spent waiting for the LLM
+LLM_STAGES = ('turn', 'translate', 'summary', 'script')
+
+
+def free_port():
+    """
+    Find a free local TCP port.
+
+    Returns:
+        int: The port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=30, process=None):
+    """
+    Wait until a URL answers with HTTP 200.
+
+    Args:
+        url (str): The URL to poll.
+        timeout (float, optional): The time to wait, in seconds.
+        process (subprocess.Popen, optional): The server process, to fail fast
+          if it exits.
+
+    Raises:
+        RuntimeError: If the URL is not ready in time or the process exited.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} was not ready after {timeout} seconds")
+
+
+@contextmanager
+def run_backend(llm_server, workers=1, env=None):
+    """
+    Run backend/app.py under uvicorn against an LLM server, once it has
+    warmed up.
+
+    With more than one worker the sessions are kept in a temporary SQLite
+    store, so every worker can serve every session.
+
+    Args:
+        llm_server (str): The URL of the LLM server.
+        workers (int, optional): The number of uvicorn workers. Defaults to 1.
+        env (dict, optional): Additional environment variables.
+
+    Yields:
+        str: The base URL of the backend.
+    """
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        session_store = 'memory://' if workers == 1 else \
+            f"sqlite:///{os.path.join(tmp_dir, 'sessions.db')}"
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1',
+             '--port', str(port), '--workers', str(workers),
+             '--log-level', 'warning'],
+            cwd=BACKEND_DIR,
+            env={**os.environ, 'LLM_SERVER': llm_server,
+                 'SESSION_STORE': session_store, **(env or {})}
+        )
+        url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_ready(url + '/ready', timeout=60, process=process)
+            yield url
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def parse_server_timing(header):
+    """
+    Parse a Server-Timing header.
+
+    Args:
+        header (str): The header value.
+
+    Returns:
+        dict: The duration per stage, in milliseconds.
+    """
+    timings = {}
+    for entry in (header or '').split(','):
+        parts = entry.strip().split(';')
+        for part in parts[1:]:
+            if part.startswith('dur='):
+                timings[parts[0]] = float(part[4:])
+    return timings
+
+
+def percentile(sorted_values, q):
+    """
+    Compute a percentile with the nearest-rank method.
+
+    Args:
+        sorted_values (list): The values, sorted in increasing order.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, or None for no values.
+    """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(values):
+    """
+    Summarize a sample of latencies.
+
+    Args:
+        values (list): The latencies.
+
+    Returns:
+        dict: The count, mean, p50, p95, p99 and max.
+    """
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': values[-1] if values else None
+    }
+
+
+def save_results(results, path):
+    """
+    Write benchmark results as JSON, creating the directory if needed.
+
+    Args:
+        results (dict): The results.
+        path (str): The file to write.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def load_results(path):
+    """
+    Read benchmark results written by save_results().
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        dict: The results.
+    """
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare(current, baseline, threshold=0.1):
+    """
+    Compare metrics against a baseline.
+
+    Latency-like metrics regress when they grow, throughput-like metrics
+    when they shrink, by more than the threshold.
+
+    Args:
+        current (dict): The current metrics, as {name: (value, higher_is_better)}.
+        baseline (dict): The baseline metrics, in the same form.
+        threshold (float, optional): The tolerated relative change.
+          Defaults to 0.1.
+
+    Returns:
+        list: The comparisons as dicts with the metric name, both values, the
+        relative change and whether it is a regression.
+    """
+    comparisons = []
+    for name, (value, higher_is_better) in current.items():
+        if name not in baseline or value is None or not baseline[name][0]:
+            continue
+        reference = baseline[name][0]
+        change = (value - reference) / reference
+        regression = -change > threshold if higher_is_better else \
+            change > threshold
+        comparisons.append({'metric': name, 'baseline': reference,
+                            'current': value, 'change': change,
+                            'regression': regression})
+    return comparisons
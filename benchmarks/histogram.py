@@ -0,0 +1,144 @@
+"""
+Latency histogram with logarithmic buckets, in the style of HdrHistogram.
+"""
+
+import math
+
+# Define the sub-buckets per power of two; 128 keeps the relative error of a
+# recorded value below 1%
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = SUB_BUCKETS * 2
+
+
+def bucket_index(value):
+    """
+    Find the bucket of a value.
+
+    Values below LINEAR_LIMIT get a bucket each; larger values share
+    SUB_BUCKETS buckets per power of two.
+
+    Args:
+        value (int): The non-negative value.
+
+    Returns:
+        int: The bucket index.
+    """
+    if value < LINEAR_LIMIT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return LINEAR_LIMIT + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_bounds(index):
+    """
+    Get the range of values of a bucket.
+
+    Args:
+        index (int): The bucket index.
+
+    Returns:
+        tuple: The lowest and highest value of the bucket.
+    """
+    if index < LINEAR_LIMIT:
+        return index, index
+    shift = (index - LINEAR_LIMIT) // SUB_BUCKETS + 1
+    sub_bucket = (index - LINEAR_LIMIT) % SUB_BUCKETS + SUB_BUCKETS
+    return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies recorded in microseconds and read in
+    milliseconds.
+
+    Percentiles are reported as the highest value of their bucket, so they
+    never understate a latency by more than the bucket resolution.
+
+    Attributes:
+        counts (dict): The number of values per bucket index.
+        count (int): The number of recorded values.
+        total (float): The sum of the recorded values, in milliseconds.
+        min (float): The smallest recorded value, in milliseconds.
+        max (float): The largest recorded value, in milliseconds.
+    """
+
+    def __init__(self):
+        """Initialize an empty LatencyHistogram."""
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, milliseconds):
+        """
+        Record a latency.
+
+        Args:
+            milliseconds (float): The latency, in milliseconds.
+        """
+        index = bucket_index(max(int(milliseconds * 1000), 0))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += milliseconds
+        self.min = milliseconds if self.min is None else min(self.min, milliseconds)
+        self.max = milliseconds if self.max is None else max(self.max, milliseconds)
+
+    def merge(self, other):
+        """
+        Add the values of another histogram.
+
+        Args:
+            other (LatencyHistogram): The histogram to add.
+        """
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        """
+        Get the latency at a percentile.
+
+        Args:
+            q (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The latency in milliseconds, or None if the histogram is
+            empty.
+        """
+        if not self.count:
+            return None
+        rank = max(math.ceil(q / 100 * self.count), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_bounds(index)[1] / 1000, self.max)
+        return self.max
+
+    def summary(self, percentiles=(50, 90, 95, 99, 99.9)):
+        """
+        Summarize the histogram.
+
+        Args:
+            percentiles (tuple, optional): The percentiles to report.
+
+        Returns:
+            dict: The count, mean, min, max and percentiles in milliseconds,
+            keyed as 'p50', 'p99.9' etc.
+        """
+        summary = {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max
+        }
+        for q in percentiles:
+            summary[f"p{q:g}"] = self.percentile(q)
+        return summary
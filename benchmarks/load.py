@@ -0,0 +1,334 @@
+"""
+Open-loop load generator for the backend.
+
+Requests arrive as a Poisson process at a target rate, independently of
+how fast the backend answers, so queueing in the backend shows up in the
+latencies instead of slowing the generator down. Each request is an
+exchange of a virtual learner with its own session and a scenario drawn
+from a mix of languages, levels and modes.
+
+Latencies are measured from the time a request was scheduled to be sent,
+which corrects for coordinated omission; the latency from the time it was
+actually sent is reported alongside. Without --url, a fake LLM server and
+the backend are started locally:
+
+    python -m benchmarks.load --rps 1,2,4 --duration 30
+    python -m benchmarks.load --url http://localhost:8000 --rps 2
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack
+
+import httpx
+
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import (
+    PAYLOAD, compare, load_results, run_backend, save_results
+)
+from benchmarks.histogram import LatencyHistogram
+
+# Define the scenario mix of the virtual learners as (weight, settings)
+SCENARIO_MIX = [
+    (30, {'language': 'Spanish', 'proficiency_level': 'Beginner'}),
+    (20, {'language': 'French', 'proficiency_level': 'Intermediate'}),
+    (15, {'language': 'German', 'proficiency_level': 'Advanced'}),
+    (10, {'language': 'Hindi', 'proficiency_level': 'Beginner'}),
+    (10, {'language': 'English', 'proficiency_level': 'Intermediate'}),
+    (10, {'language': 'Spanish', 'proficiency_level': 'Intermediate',
+          'generation_mode': 'Script'}),
+    (5, {'language': 'French', 'proficiency_level': 'Advanced',
+         'learning_mode': 'Debate', 'scenario': 'Climate change',
+         'role_dict': {'role1': {'name': 'Proponent'},
+                       'role2': {'name': 'Opponent'}}}),
+]
+
+
+def poisson_arrivals(rng, rps, duration):
+    """
+    Generate the arrival times of a Poisson process.
+
+    Args:
+        rng (random.Random): The random generator of the arrivals.
+        rps (float): The mean arrival rate, in requests per second.
+        duration (float): The time to generate arrivals, in seconds.
+
+    Yields:
+        float: The time of each arrival from the start, in seconds.
+    """
+    offset = rng.expovariate(rps)
+    while offset < duration:
+        yield offset
+        offset += rng.expovariate(rps)
+
+
+class VirtualLearner:
+    """
+    A learner playing one session after another.
+
+    Attributes:
+        session_id (str): The id of the current session.
+        payload (dict): The conversation settings of the current session.
+        exchanges (int): The exchanges requested in the current session.
+    """
+
+    def __init__(self, rng):
+        """
+        Initialize the learner with a first session.
+
+        Args:
+            rng (random.Random): The random generator of the scenario mix.
+        """
+        self.rng = rng
+        self.new_session()
+
+    def new_session(self):
+        """Start a new session with a scenario drawn from the mix."""
+        weights, settings = zip(*SCENARIO_MIX)
+        self.session_id = uuid.uuid4().hex
+        self.payload = {**PAYLOAD, **self.rng.choices(settings, weights)[0],
+                        'session_id': self.session_id}
+        self.exchanges = 0
+
+
+class LoadRun:
+    """
+    One open-loop run at a fixed arrival rate.
+
+    Attributes:
+        corrected (LatencyHistogram): Latencies from the scheduled send time.
+        uncorrected (LatencyHistogram): Latencies from the actual send time.
+        errors (int): Failed or timed out measured requests.
+        sent (int): Requests sent, including the warm-up.
+        learners_added (int): Learners added because all were busy.
+        max_send_lag (float): The largest delay between the scheduled and the
+          actual send time, in milliseconds; a large lag means the generator
+          itself could not keep up.
+    """
+
+    def __init__(self, url, rps, duration, warmup=0.0, learners=100,
+                 exchanges_per_session=4, timeout=120.0, seed=None):
+        """
+        Initialize the run.
+
+        Args:
+            url (str): The base URL of the backend.
+            rps (float): The mean arrival rate, in requests per second.
+            duration (float): The time to generate arrivals, in seconds.
+            warmup (float, optional): The initial seconds not measured.
+            learners (int, optional): The initial number of virtual learners.
+            exchanges_per_session (int, optional): The exchanges before a
+              learner resets its session and starts a new one.
+            timeout (float, optional): The request timeout, in seconds.
+            seed (int, optional): The seed of the arrivals and scenarios.
+        """
+        self.url = url
+        self.rps = rps
+        self.duration = duration
+        self.warmup = warmup
+        self.exchanges_per_session = exchanges_per_session
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.idle = deque(VirtualLearner(self.rng) for _ in range(learners))
+        self.corrected = LatencyHistogram()
+        self.uncorrected = LatencyHistogram()
+        self.errors = 0
+        self.sent = 0
+        self.learners_added = 0
+        self.max_send_lag = 0.0
+
+    async def _exchange(self, client, learner, scheduled, measured):
+        """
+        Send one exchange of a learner and record its latency.
+
+        Args:
+            client (httpx.AsyncClient): The HTTP client.
+            learner (VirtualLearner): The learner.
+            scheduled (float): The scheduled send time, in loop time.
+            measured (bool): Whether the request is past the warm-up.
+        """
+        loop = asyncio.get_running_loop()
+        sent = loop.time()
+        self.max_send_lag = max(self.max_send_lag, (sent - scheduled) * 1000)
+        complete = False
+        try:
+            response = await client.post('/generate_conversation',
+                                         json=learner.payload)
+            ok = response.status_code == 200
+            complete = ok and response.json().get('complete', False)
+        except httpx.HTTPError:
+            ok = False
+        done = loop.time()
+        if measured:
+            if ok:
+                self.corrected.record((done - scheduled) * 1000)
+                self.uncorrected.record((done - sent) * 1000)
+            else:
+                self.errors += 1
+
+        learner.exchanges += 1
+        if complete or learner.exchanges >= self.exchanges_per_session:
+            try:
+                await client.post('/reset_conversation',
+                                  params={'session_id': learner.session_id})
+            except httpx.HTTPError:
+                pass
+            learner.new_session()
+        self.idle.append(learner)
+
+    async def run(self):
+        """
+        Generate the arrivals and wait for all responses.
+
+        Returns:
+            dict: The summary of the run.
+        """
+        loop = asyncio.get_running_loop()
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+        tasks = []
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout,
+                                     limits=limits) as client:
+            start = loop.time()
+            for offset in poisson_arrivals(self.rng, self.rps, self.duration):
+                delay = start + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.idle:
+                    learner = self.idle.popleft()
+                else:
+                    learner = VirtualLearner(self.rng)
+                    self.learners_added += 1
+                tasks.append(asyncio.ensure_future(self._exchange(
+                    client, learner, start + offset, offset >= self.warmup)))
+                self.sent += 1
+            await asyncio.gather(*tasks)
+            elapsed = loop.time() - start
+
+        measured = self.corrected.count + self.errors
+        return {
+            'target_rps': self.rps,
+            'sent': self.sent,
+            'measured': measured,
+            'errors': self.errors,
+            'error_rate': self.errors / measured if measured else None,
+            'throughput': self.corrected.count / max(elapsed - self.warmup, 1e-9),
+            'elapsed': elapsed,
+            'learners': len(self.idle),
+            'learners_added': self.learners_added,
+            'max_send_lag': self.max_send_lag,
+            'latency': self.corrected.summary(),
+            'latency_from_send': self.uncorrected.summary()
+        }
+
+
+def print_runs(runs):
+    """
+    Print the run summaries as a table.
+
+    Args:
+        runs (list): The run summaries.
+    """
+    def fmt(value):
+        return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'rps':>6} {'done/s':>7} {'err':>5} {'p50':>9} {'p90':>9} "
+          f"{'p99':>9} {'p99.9':>9} {'max':>9} | {'p50':>9} {'p99':>9}"
+          "  (ms, from scheduled | actual send)")
+    for run in runs:
+        latency, from_send = run['latency'], run['latency_from_send']
+        print(f"{run['target_rps']:6g} {run['throughput']:7.2f} "
+              f"{run['errors']:>5} {fmt(latency['p50'])} {fmt(latency['p90'])} "
+              f"{fmt(latency['p99'])} {fmt(latency['p99.9'])} "
+              f"{fmt(latency['max'])} | {fmt(from_send['p50'])} "
+              f"{fmt(from_send['p99'])}")
+
+
+def baseline_metrics(results):
+    """
+    Select the metrics compared against a baseline.
+
+    Args:
+        results (dict): The load test results.
+
+    Returns:
+        dict: {name: (value, higher_is_better)}.
+    """
+    metrics = {}
+    for run in results['runs']:
+        prefix = f"rps{run['target_rps']:g}"
+        metrics[f"{prefix}.throughput"] = (run['throughput'], True)
+        metrics[f"{prefix}.latency.p99"] = (run['latency']['p99'], False)
+    return metrics
+
+
+def main():
+    """Run the load test at every requested rate."""
+    parser = argparse.ArgumentParser(
+        description="Open-loop load generator for the backend.")
+    parser.add_argument('--url', help='backend to load; by default a fake LLM '
+                                      'server and the backend are started')
+    parser.add_argument('--rps', default='2',
+                        help='comma-separated arrival rates, in requests/s')
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--learners', type=int, default=1000)
+    parser.add_argument('--exchanges-per-session', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='uvicorn workers of the local backend')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='median time to first token of the fake LLM')
+    parser.add_argument('--jitter', type=float, default=0.3)
+    parser.add_argument('--tokens-per-second', type=float, default=500.0)
+    parser.add_argument('--output', default='benchmarks/results/load.json')
+    parser.add_argument('--baseline', help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args()
+
+    runs = []
+    with ExitStack() as stack:
+        url = args.url
+        if url is None:
+            llm = FakeLLMServer(config=FakeLLMConfig(
+                latency=args.latency, jitter=args.jitter,
+                tokens_per_second=args.tokens_per_second, seed=args.seed
+            )).start()
+            stack.callback(llm.stop)
+            url = stack.enter_context(run_backend(llm.url, workers=args.workers))
+        for rps in map(float, args.rps.split(',')):
+            load_run = LoadRun(url, rps, args.duration, warmup=args.warmup,
+                               learners=args.learners,
+                               exchanges_per_session=args.exchanges_per_session,
+                               timeout=args.timeout, seed=args.seed)
+            runs.append(asyncio.run(load_run.run()))
+            print(f"{rps:g} req/s: {runs[-1]['throughput']:.2f} done/s, "
+                  f"p99 {runs[-1]['latency']['p99'] or 0:.0f} ms")
+
+    print_runs(runs)
+    results = {
+        'benchmark': 'load',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': vars(args),
+        'runs': runs
+    }
+    save_results(results, args.output)
+    if args.baseline:
+        comparisons = compare(baseline_metrics(results),
+                              baseline_metrics(load_results(args.baseline)),
+                              args.threshold)
+        for item in comparisons:
+            flag = 'REGRESSION' if item['regression'] else 'ok'
+            print(f"{item['metric']:<24} {item['baseline']:10.2f} -> "
+                  f"{item['current']:10.2f} ({item['change']:+.0%}) {flag}")
+        if any(item['regression'] for item in comparisons):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""
+Micro-benchmarks of the hot paths of the backend, the frontend and the
+evaluation.
+
+Every benchmark times one function in-process, with the language model and
+Streamlit replaced by stand-ins, so only our own code is measured. Each run
+is appended to a local history file, and the compare command flags
+benchmarks whose fastest repetition got slower than in the previous run by
+more than a threshold:
+
+    python -m benchmarks.micro run
+    python -m benchmarks.micro compare --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+from benchmarks.harness import compare
+
+HISTORY_FILE = 'benchmarks/results/micro_history.jsonl'
+
+# Define the benchmarks, filled in by the benchmark decorator
+BENCHMARKS = {}
+
+ROLE_DICT = {
+    'role1': {'name': 'Customer', 'action': 'ordering food'},
+    'role2': {'name': 'Waitstaff', 'action': 'taking the order'}
+}
+SENTENCE = ("Me gustaría pedir la sopa del día y un vaso de agua fría, "
+            "por favor, y luego veremos el postre.")
+
+# Define a generated turn and a reference of a few hundred characters
+LONG_TURN = " ".join([SENTENCE] * 3)
+LONG_REFERENCE = LONG_TURN.replace('sopa', 'ensalada').replace('fría', 'caliente')
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark whose dependencies are not installed."""
+
+
+def benchmark(name):
+    """
+    Register a benchmark.
+
+    The decorated function is a context manager that sets up the benchmark
+    and yields the callable to time.
+
+    Args:
+        name (str): The name of the benchmark.
+
+    Returns:
+        callable: The decorator.
+    """
+    def register(function):
+        BENCHMARKS[name] = contextmanager(function)
+        return function
+    return register
+
+
+class StubCompletions:
+    """A chat completions stand-in answering instantly with a fixed reply."""
+
+    def __init__(self, content):
+        self.response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content),
+                                     finish_reason='stop')],
+            usage=SimpleNamespace(prompt_tokens=300, completion_tokens=30)
+        )
+
+    def create(self, **kwargs):
+        """
+        Answer a chat completion request.
+
+        Returns:
+            SimpleNamespace: The fixed response.
+        """
+        return self.response
+
+
+def make_dual_chatbot(turns=40):
+    """
+    Create a DualChatbot with a seeded transcript and a stub language model.
+
+    Args:
+        turns (int, optional): The number of turns to seed. Defaults to 40.
+
+    Returns:
+        DualChatbot: The session.
+    """
+    from backend.src.chatbot import DualChatbot
+
+    dual_chatbot = DualChatbot("OpenAI", ROLE_DICT, "Spanish", "at a restaurant",
+                               "Intermediate", "Conversation", "Long",
+                               llm_server="http://localhost:8080")
+    client = SimpleNamespace(chat=SimpleNamespace(
+        completions=StubCompletions(SENTENCE)))
+    for key in ('role1', 'role2'):
+        dual_chatbot.chatbots[key]['chatbot'].client = client
+    for index in range(turns):
+        speaker = ('Customer', 'Waitstaff')[index % 2]
+        dual_chatbot.transcript.append(speaker, SENTENCE)
+    return dual_chatbot
+
+
+@benchmark('chatbot.specify_system_message')
+def bench_system_message():
+    chatbot = make_dual_chatbot(turns=0).chatbots['role1']['chatbot']
+    yield chatbot._specify_system_message
+
+
+@benchmark('chatbot.generate_response')
+def bench_generate_response():
+    chatbot = make_dual_chatbot().chatbots['role1']['chatbot']
+    yield lambda: chatbot.generate_response(None)
+
+
+@benchmark('dual_chatbot.summary')
+def bench_summary():
+    yield make_dual_chatbot().summary
+
+
+@benchmark('frontend.show_messages')
+def bench_show_messages():
+    from frontend.src import utils
+
+    mesg_1 = {'role': 'Customer', 'content': SENTENCE,
+              'translation': SENTENCE, 'language': 'Spanish'}
+    mesg_2 = dict(mesg_1, role='Waitstaff')
+    # Mock Streamlit the way conftest.py does for the frontend tests
+    with mock.patch('streamlit.container'), mock.patch('streamlit.columns'), \
+            mock.patch.object(utils, 'message', lambda *args, **kwargs: None):
+        yield lambda: utils.show_messages(mesg_1, mesg_2, 0, 0, batch=True,
+                                          translation=True)
+
+
+@benchmark('evaluate.levenshtein_distance')
+def bench_levenshtein():
+    try:
+        from evaluate import levenshtein_distance
+    except ImportError as e:
+        raise SkipBenchmark(f"evaluate.py cannot be imported: {e}") from e
+    other = SENTENCE.replace('sopa', 'ensalada').replace('agua', 'vino')
+    yield lambda: levenshtein_distance(SENTENCE, other)
+
+
+@benchmark('evaluation.levenshtein_distance_dp')
+def bench_levenshtein_dp():
+    from evaluation.edit_distance import levenshtein_distance_dp
+
+    yield lambda: levenshtein_distance_dp(LONG_TURN, LONG_REFERENCE)
+
+
+@benchmark('evaluation.levenshtein_distance')
+def bench_levenshtein_bit_parallel():
+    from evaluation.edit_distance import levenshtein_distance
+
+    yield lambda: levenshtein_distance(LONG_TURN, LONG_REFERENCE)
+
+
+@benchmark('evaluation.levenshtein_distances')
+def bench_levenshtein_batch():
+    from evaluation.edit_distance import levenshtein_distances
+
+    pairs = [(SENTENCE * 2, LONG_REFERENCE[:200 + i]) for i in range(100)]
+    yield lambda: levenshtein_distances(pairs)
+
+
+def measure(function, repeat=5, min_time=0.1):
+    """
+    Time a function, calibrating the number of calls per repetition.
+
+    Args:
+        function (callable): The function to time, called without arguments.
+        repeat (int, optional): The number of repetitions. Defaults to 5.
+        min_time (float, optional): The minimum duration of a repetition, in
+          seconds. Defaults to 0.1.
+
+    Returns:
+        dict: The calls per repetition and the min and median time per call,
+        in microseconds.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    runs = sorted(t / number * 1e6 for t in timer.repeat(repeat, number))
+    return {'number': number, 'min_us': runs[0],
+            'median_us': runs[len(runs) // 2]}
+
+
+def git_revision():
+    """
+    Get the current git revision, if available.
+
+    Returns:
+        str: The short commit hash, or None.
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, repeat=5):
+    """
+    Run benchmarks.
+
+    Args:
+        names (list): The names of the benchmarks to run.
+        repeat (int, optional): The number of repetitions. Defaults to 5.
+
+    Returns:
+        dict: The timings per benchmark, and the reasons of skipped ones.
+    """
+    results, skipped = {}, {}
+    for name in names:
+        try:
+            with BENCHMARKS[name]() as function:
+                results[name] = measure(function, repeat=repeat)
+        except SkipBenchmark as e:
+            skipped[name] = str(e)
+            print(f"{name:<34} skipped: {e}")
+            continue
+        print(f"{name:<34} {results[name]['median_us']:12.2f} us "
+              f"(min {results[name]['min_us']:.2f}, "
+              f"{results[name]['number']} calls x {repeat})")
+    return {'results': results, 'skipped': skipped}
+
+
+def load_history(path):
+    """
+    Read the runs of the history file.
+
+    Args:
+        path (str): The history file.
+
+    Returns:
+        list: The runs, oldest first.
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def compare_runs(current, baseline, threshold):
+    """
+    Print the change of every benchmark between two runs.
+
+    Args:
+        current (dict): The newer run.
+        baseline (dict): The older run.
+        threshold (float): The tolerated relative slowdown.
+
+    Returns:
+        bool: Whether any benchmark regressed.
+    """
+    # Compare the fastest repetitions, which are the least affected by noise
+    def fastest(entry):
+        return {name: (result['min_us'], False)
+                for name, result in entry['results'].items()}
+
+    comparisons = compare(fastest(current), fastest(baseline), threshold)
+    print(f"Comparing {current.get('revision')} ({current['created']}) against "
+          f"{baseline.get('revision')} ({baseline['created']})")
+    for item in comparisons:
+        flag = 'REGRESSION' if item['regression'] else 'ok'
+        print(f"{item['metric']:<34} {item['baseline']:12.2f} -> "
+              f"{item['current']:12.2f} us ({item['change']:+.1%}) {flag}")
+    return any(item['regression'] for item in comparisons)
+
+
+def main():
+    """Run the benchmarks or compare the latest runs of the history."""
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks of the backend and frontend hot paths.")
+    parser.add_argument('--history', default=HISTORY_FILE)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run and record benchmarks')
+    run_parser.add_argument('-k', '--filter', default='',
+                            help='only run benchmarks containing this text')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    compare_parser = subparsers.add_parser(
+        'compare', help='compare the latest run against an earlier one')
+    compare_parser.add_argument('--against',
+                                help='git revision of the earlier run; '
+                                     'defaults to the previous run')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+    subparsers.add_parser('list', help='list the benchmarks')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print("\n".join(BENCHMARKS))
+    elif args.command == 'run':
+        names = [name for name in BENCHMARKS if args.filter in name]
+        entry = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': git_revision(),
+            'machine': {'python': platform.python_version(),
+                        'platform': platform.platform()},
+            **run(names, repeat=args.repeat)
+        }
+        if entry['results']:
+            os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+            with open(args.history, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry, sort_keys=True) + '\n')
+    else:
+        history = load_history(args.history)
+        if len(history) < 2:
+            sys.exit(f"Need at least two runs in {args.history} to compare.")
+        current = history[-1]
+        if args.against:
+            earlier = [entry for entry in history[:-1]
+                       if entry.get('revision') == args.against]
+            if not earlier:
+                sys.exit(f"No run of revision {args.against} in {args.history}.")
+            baseline = earlier[-1]
+        else:
+            baseline = history[-2]
+        if compare_runs(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
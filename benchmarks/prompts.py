@@ -0,0 +1,253 @@
+"""
+Prompt profile benchmark of the system prompts.
+
+The common sessions of the warm-up, in every language, proficiency level and
+learning mode with the default roles of the frontend, are run for a few
+exchanges with each system prompt profile. For every case the length of the
+system prompts, measured with the LLM server's tokenizer, the mean prompt
+tokens of its LLM calls and the time per exchange are reported, along with
+the signs of a profile losing instructions: turns cut off by max_tokens,
+empty turns and conversations ending early. Compact prompts longer than
+COMPACT_PROMPT_TOKENS are flagged, and fail the run with --check.
+
+Without --llm-server, a fake LLM server with a per-token prefill cost is
+started locally; it tokenizes by words, so run against a llama.cpp server to
+measure with the model's tokenizer:
+
+    python -m benchmarks.prompts --languages Spanish,Hindi
+    python -m benchmarks.prompts --llm-server http://localhost:8080 --check
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+
+import requests
+
+from backend.src.chatbot import (
+    ARGUMENT_NUM_DICT, AUDIO_SPEECH, COMPACT_PROMPT_TOKENS, PROMPT_PROFILES,
+    DualChatbot
+)
+from backend.src.metrics import request_llm_calls, start_request_timings
+from backend.src.warmup import WARMUP_SESSIONS
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import compare, load_results, save_results
+
+
+def count_tokens(llm_server, text):
+    """
+    Count the tokens of a text with the tokenizer of the LLM server.
+
+    Args:
+        llm_server (str): The URL of a llama.cpp compatible server.
+        text (str): The text to tokenize.
+
+    Returns:
+        int: The number of tokens.
+    """
+    response = requests.post(f"{llm_server}/tokenize", json={'content': text},
+                             timeout=30)
+    response.raise_for_status()
+    return len(response.json()['tokens'])
+
+
+def run_case(profile, language, proficiency_level, learning_mode, llm_server,
+             exchanges=2):
+    """
+    Generate a few exchanges of a common session with a prompt profile.
+
+    Args:
+        profile (str): The system prompt profile.
+        language (str): The language of the session.
+        proficiency_level (str): The proficiency level of the session.
+        learning_mode (str): The learning mode of the session.
+        llm_server (str): The URL of the language model server.
+        exchanges (int, optional): The exchanges to generate. Defaults to 2.
+
+    Returns:
+        dict: The case, the tokens of its longest system prompt, the mean
+        prompt tokens of its LLM calls, the mean time per exchange and the
+        quality signals.
+    """
+    roles, scenario = WARMUP_SESSIONS[learning_mode]
+    session = DualChatbot(
+        'OpenAI', {key: dict(role) for key, role in roles.items()}, language,
+        scenario, proficiency_level, learning_mode, 'Short',
+        llm_server=llm_server, prompt_profile=profile
+    )
+    system_tokens = max(count_tokens(llm_server, session.chatbots[key][
+        'chatbot'].prompt) for key in ('role1', 'role2'))
+
+    start_request_timings()
+    durations = []
+    while len(durations) < exchanges and not session.ended:
+        start = time.perf_counter()
+        session.step()
+        durations.append((time.perf_counter() - start) * 1000)
+    prompt_tokens = [call['prompt_tokens'] for call in request_llm_calls()
+                     if call.get('prompt_tokens') is not None]
+
+    return {
+        'profile': profile,
+        'language': language,
+        'proficiency_level': proficiency_level,
+        'learning_mode': learning_mode,
+        'system_tokens': system_tokens,
+        'over_budget': profile == 'compact' and
+        system_tokens > COMPACT_PROMPT_TOKENS,
+        'prompt_tokens': statistics.mean(prompt_tokens) if prompt_tokens else None,
+        'exchange_ms': statistics.mean(durations),
+        'exchanges': len(durations),
+        'length_stops': session.finish_reasons['length'],
+        'empty_turns': sum(1 for text in session.transcript.texts() if not text)
+    }
+
+
+def summarize_profiles(cases):
+    """
+    Aggregate the cases of every profile.
+
+    Args:
+        cases (list): The case results.
+
+    Returns:
+        dict: Per profile, the mean system prompt tokens, prompt tokens per
+        call and time per exchange, and the totals of the quality signals.
+    """
+    profiles = {}
+    for profile in dict.fromkeys(case['profile'] for case in cases):
+        own = [case for case in cases if case['profile'] == profile]
+        profiles[profile] = {
+            key: statistics.mean(case[key] for case in own
+                                 if case[key] is not None)
+            for key in ('system_tokens', 'prompt_tokens', 'exchange_ms')
+        }
+        profiles[profile].update({
+            key: sum(case[key] for case in own)
+            for key in ('exchanges', 'length_stops', 'empty_turns',
+                        'over_budget')
+        })
+    return profiles
+
+
+def print_cases(cases, profiles):
+    """
+    Print the cases and the profile summaries as tables.
+
+    Args:
+        cases (list): The case results.
+        profiles (dict): The profile summaries.
+    """
+    print(f"{'profile':<8} {'language':<8} {'level':<12} {'mode':<12} "
+          f"{'system':>6} {'prompt':>7} {'ms':>8} {'cut':>4} {'empty':>5}")
+    for case in cases:
+        flag = ' over budget' if case['over_budget'] else ''
+        print(f"{case['profile']:<8} {case['language']:<8} "
+              f"{case['proficiency_level']:<12} {case['learning_mode']:<12} "
+              f"{case['system_tokens']:>6} {case['prompt_tokens'] or 0:>7.0f} "
+              f"{case['exchange_ms']:>8.1f} {case['length_stops']:>4} "
+              f"{case['empty_turns']:>5}{flag}")
+    print()
+    for profile, summary in profiles.items():
+        print(f"{profile:<8} system {summary['system_tokens']:6.0f} tokens, "
+              f"{summary['prompt_tokens']:6.0f} prompt tokens per call, "
+              f"{summary['exchange_ms']:8.1f} ms per exchange, "
+              f"{summary['exchanges']} exchanges, "
+              f"{summary['length_stops']} cut off, "
+              f"{summary['empty_turns']} empty, "
+              f"{summary['over_budget']} over budget")
+
+
+def baseline_metrics(results):
+    """
+    Select the metrics compared against a baseline.
+
+    Args:
+        results (dict): The benchmark results.
+
+    Returns:
+        dict: {name: (value, higher_is_better)}.
+    """
+    return {
+        f"{profile}.{key}": (summary[key], False)
+        for profile, summary in results['profiles'].items()
+        for key in ('system_tokens', 'prompt_tokens', 'exchange_ms')
+    }
+
+
+def main():
+    """Run the prompt profile benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Prompt tokens and latency per system prompt profile.")
+    parser.add_argument('--llm-server', help='LLM server to measure; by '
+                                             'default a fake one is started')
+    parser.add_argument('--profiles', default=','.join(PROMPT_PROFILES),
+                        help='comma-separated prompt profiles')
+    parser.add_argument('--languages', default=','.join(AUDIO_SPEECH),
+                        help='comma-separated languages')
+    parser.add_argument('--levels', default=','.join(ARGUMENT_NUM_DICT),
+                        help='comma-separated proficiency levels')
+    parser.add_argument('--modes', default=','.join(WARMUP_SESSIONS),
+                        help='comma-separated learning modes')
+    parser.add_argument('--exchanges', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='time to first token of the fake LLM without '
+                             'a prompt')
+    parser.add_argument('--prefill-per-token', type=float, default=0.0001,
+                        help='prefill time of the fake LLM per prompt token')
+    parser.add_argument('--tokens-per-second', type=float, default=500.0)
+    parser.add_argument('--check', action='store_true',
+                        help='fail if a compact prompt is over its budget')
+    parser.add_argument('--output', default='benchmarks/results/prompts.json')
+    parser.add_argument('--baseline', help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args()
+
+    cases = []
+    with ExitStack() as stack:
+        llm_server = args.llm_server
+        if llm_server is None:
+            llm = FakeLLMServer(config=FakeLLMConfig(
+                latency=args.latency, prefill_per_token=args.prefill_per_token,
+                tokens_per_second=args.tokens_per_second, seed=0,
+                prompt_cache_slots=0
+            )).start()
+            stack.callback(llm.stop)
+            llm_server = llm.url
+        for profile in args.profiles.split(','):
+            for learning_mode in args.modes.split(','):
+                for language in args.languages.split(','):
+                    for level in args.levels.split(','):
+                        cases.append(run_case(profile, language, level,
+                                              learning_mode, llm_server,
+                                              exchanges=args.exchanges))
+
+    profiles = summarize_profiles(cases)
+    print_cases(cases, profiles)
+    results = {
+        'benchmark': 'prompts',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': vars(args),
+        'compact_budget': COMPACT_PROMPT_TOKENS,
+        'profiles': profiles,
+        'cases': cases
+    }
+    save_results(results, args.output)
+    failed = args.check and any(case['over_budget'] for case in cases)
+    if args.baseline:
+        comparisons = compare(baseline_metrics(results),
+                              baseline_metrics(load_results(args.baseline)),
+                              args.threshold)
+        for item in comparisons:
+            flag = 'REGRESSION' if item['regression'] else 'ok'
+            print(f"{item['metric']:<32} {item['baseline']:10.1f} -> "
+                  f"{item['current']:10.1f} ({item['change']:+.0%}) {flag}")
+        failed = failed or any(item['regression'] for item in comparisons)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
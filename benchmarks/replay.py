@@ -0,0 +1,283 @@
+"""
+Replay a request log of the backend as a regression benchmark.
+
+The records written by the backend with REQUEST_LOG set are sent again with
+their original inter-arrival times, divided by --speed, or all at once with
+--speed 0. The requests of a session are sent in their original order, each
+one after the previous one has been answered, so a session never races
+itself; sessions get fresh ids, so a replay never touches the sessions it was
+captured from. Records without a payload (REQUEST_LOG_PAYLOADS unset) are
+rebuilt from their shape and the benchmark payload.
+
+Latencies are measured from the scheduled send time, like the load test, and
+compared per endpoint with the latencies recorded in the log. Without --url,
+the backend is started locally against a fake LLM server, or against a real
+one with --llm-server:
+
+    python -m benchmarks.replay request_log.jsonl --speed 2
+    python -m benchmarks.replay request_log.jsonl --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+
+import httpx
+
+from backend.src.request_log import read_request_log
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import (
+    PAYLOAD, compare, load_results, run_backend, save_results
+)
+from benchmarks.histogram import LatencyHistogram
+
+# Define the endpoints that are replayed
+REPLAYED = ('/generate_conversation', '/generate_summary', '/reset_conversation')
+
+
+def replay_requests(records, speed=1.0, run_id=None):
+    """
+    Turn log records into the requests of a replay.
+
+    Args:
+        records (list): The log records, ordered by arrival time.
+        speed (float, optional): The factor dividing the original
+          inter-arrival times, or 0 to send every request at once. Defaults to
+          1.0.
+        run_id (str, optional): The prefix of the replayed session ids.
+          Defaults to a random one.
+
+    Returns:
+        OrderedDict: The requests per replayed session id, in order, as dicts
+        with the offset of their send time in seconds, the endpoint, the JSON
+        body, the query parameters and the original record.
+    """
+    run_id = run_id or uuid.uuid4().hex[:8]
+    records = [record for record in records if record['endpoint'] in REPLAYED]
+    sessions, names = OrderedDict(), {}
+    for record in records:
+        session_id = names.setdefault(record['session_id'],
+                                      f"replay-{run_id}-{len(names)}")
+        offset = (record['ts'] - records[0]['ts']) / speed if speed else 0.0
+        body, params = None, {}
+        if record['endpoint'] == '/reset_conversation':
+            params = {'session_id': session_id}
+        else:
+            body = dict(record.get('payload') or {**PAYLOAD, **record['shape']},
+                        session_id=session_id)
+        sessions.setdefault(session_id, []).append({
+            'offset': offset, 'endpoint': record['endpoint'], 'json': body,
+            'params': params, 'record': record
+        })
+    return sessions
+
+
+class Replay:
+    """
+    One replay of a request log.
+
+    Attributes:
+        corrected (dict): The LatencyHistogram of every endpoint, measured
+          from the scheduled send time.
+        uncorrected (dict): The LatencyHistogram of every endpoint, measured
+          from the actual send time.
+        original (dict): The LatencyHistogram of every endpoint, with the
+          latencies recorded in the log.
+        errors (dict): The failed requests per endpoint.
+        status_changes (dict): The requests per endpoint answered with another
+          status than in the log.
+    """
+
+    def __init__(self, url, sessions, timeout=120.0):
+        """
+        Initialize the replay.
+
+        Args:
+            url (str): The base URL of the backend.
+            sessions (OrderedDict): The requests per session, see
+              replay_requests().
+            timeout (float, optional): The request timeout, in seconds.
+        """
+        self.url = url
+        self.sessions = sessions
+        self.timeout = timeout
+        endpoints = {request['endpoint'] for requests in sessions.values()
+                     for request in requests}
+        self.corrected = {endpoint: LatencyHistogram() for endpoint in endpoints}
+        self.uncorrected = {endpoint: LatencyHistogram() for endpoint in endpoints}
+        self.original = {endpoint: LatencyHistogram() for endpoint in endpoints}
+        self.errors = dict.fromkeys(endpoints, 0)
+        self.status_changes = dict.fromkeys(endpoints, 0)
+
+    async def _session(self, client, start, requests):
+        """
+        Send the requests of a session in order.
+
+        Args:
+            client (httpx.AsyncClient): The HTTP client.
+            start (float): The start of the replay, in loop time.
+            requests (list): The requests of the session.
+        """
+        loop = asyncio.get_running_loop()
+        for request in requests:
+            endpoint, scheduled = request['endpoint'], start + request['offset']
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent = loop.time()
+            try:
+                response = await client.post(endpoint, json=request['json'],
+                                             params=request['params'])
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            done = loop.time()
+            self.original[endpoint].record(request['record']['duration_ms'])
+            if status != request['record']['status']:
+                self.status_changes[endpoint] += 1
+            if status is None or status >= 500:
+                self.errors[endpoint] += 1
+            else:
+                self.corrected[endpoint].record((done - scheduled) * 1000)
+                self.uncorrected[endpoint].record((done - sent) * 1000)
+
+    async def run(self):
+        """
+        Replay every session and wait for all responses.
+
+        Returns:
+            dict: The summary of the replay.
+        """
+        loop = asyncio.get_running_loop()
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout,
+                                     limits=limits) as client:
+            start = loop.time()
+            await asyncio.gather(*(self._session(client, start, requests)
+                                   for requests in self.sessions.values()))
+            elapsed = loop.time() - start
+
+        return {
+            'sessions': len(self.sessions),
+            'requests': sum(len(requests) for requests in self.sessions.values()),
+            'elapsed': elapsed,
+            'endpoints': {
+                endpoint: {
+                    'errors': self.errors[endpoint],
+                    'status_changes': self.status_changes[endpoint],
+                    'latency': self.corrected[endpoint].summary(),
+                    'latency_from_send': self.uncorrected[endpoint].summary(),
+                    'original': self.original[endpoint].summary()
+                }
+                for endpoint in sorted(self.corrected)
+            }
+        }
+
+
+def print_replay(results):
+    """
+    Print the replayed latencies next to the original ones.
+
+    Args:
+        results (dict): The summary of the replay.
+    """
+    def fmt(value):
+        return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'endpoint':<24} {'count':>6} {'err':>5} {'status':>6} {'p50':>9} "
+          f"{'p99':>9} | {'p50':>9} {'p99':>9}  (ms, replay | log)")
+    for endpoint, summary in results['endpoints'].items():
+        latency, original = summary['latency'], summary['original']
+        print(f"{endpoint:<24} {original['count']:>6} {summary['errors']:>5} "
+              f"{summary['status_changes']:>6} {fmt(latency['p50'])} "
+              f"{fmt(latency['p99'])} | {fmt(original['p50'])} "
+              f"{fmt(original['p99'])}")
+
+
+def baseline_metrics(results):
+    """
+    Select the metrics compared against a baseline.
+
+    Args:
+        results (dict): The replay results.
+
+    Returns:
+        dict: {name: (value, higher_is_better)}.
+    """
+    metrics = {}
+    for endpoint, summary in results['replay']['endpoints'].items():
+        for key in ('p50', 'p99'):
+            if summary['latency'][key] is not None:
+                metrics[f"{endpoint}.{key}"] = (summary['latency'][key], False)
+    return metrics
+
+
+def main():
+    """Replay a request log against the backend."""
+    parser = argparse.ArgumentParser(
+        description="Replay a request log of the backend.")
+    parser.add_argument('log', help='request log written with REQUEST_LOG')
+    parser.add_argument('--url', help='backend to replay against; by default '
+                                      'the backend is started locally')
+    parser.add_argument('--llm-server', help='LLM server of the local backend; '
+                                             'by default a fake one is started')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='time scale of the arrivals; 0 sends at once')
+    parser.add_argument('--limit', type=int,
+                        help='only replay the first records')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='uvicorn workers of the local backend')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='median time to first token of the fake LLM')
+    parser.add_argument('--jitter', type=float, default=0.3)
+    parser.add_argument('--tokens-per-second', type=float, default=500.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmarks/results/replay.json')
+    parser.add_argument('--baseline', help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args()
+
+    records = read_request_log(args.log)[:args.limit]
+    sessions = replay_requests(records, speed=args.speed)
+    with ExitStack() as stack:
+        url = args.url
+        if url is None:
+            llm_server = args.llm_server
+            if llm_server is None:
+                llm = FakeLLMServer(config=FakeLLMConfig(
+                    latency=args.latency, jitter=args.jitter,
+                    tokens_per_second=args.tokens_per_second, seed=args.seed
+                )).start()
+                stack.callback(llm.stop)
+                llm_server = llm.url
+            url = stack.enter_context(run_backend(llm_server,
+                                                  workers=args.workers))
+        replay = asyncio.run(Replay(url, sessions, timeout=args.timeout).run())
+
+    print_replay(replay)
+    results = {
+        'benchmark': 'replay',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': vars(args),
+        'replay': replay
+    }
+    save_results(results, args.output)
+    if args.baseline:
+        comparisons = compare(baseline_metrics(results),
+                              baseline_metrics(load_results(args.baseline)),
+                              args.threshold)
+        for item in comparisons:
+            flag = 'REGRESSION' if item['regression'] else 'ok'
+            print(f"{item['metric']:<32} {item['baseline']:10.1f} -> "
+                  f"{item['current']:10.1f} ({item['change']:+.0%}) {flag}")
+        if any(item['regression'] for item in comparisons):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
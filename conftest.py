@@ -5,6 +5,8 @@ as well as to define fixtures for mocking LLM and backend servers.
 
 import sys
 import os
+import re
+import importlib
 from unittest import mock
 import requests_mock
 import pytest
@@ -22,6 +24,10 @@ frontend_path = os.path.join(project_root, 'frontend')
 sys.path.insert(0, backend_path)
 sys.path.insert(0, frontend_path)
 
+# Define the URLs of the servers started by the benchmark tests, which the
+# session-wide mocked servers let through
+LOCAL_SERVERS = re.compile(r'^http://127\.0\.0\.1:\d+/')
+
 
 class SessionStateMock(dict):
     """
@@ -51,6 +57,7 @@ def mock_llm_server():
         # Mock Google Translate API
         m.post('https://translate.google.com/_/TranslateWebserverUi/data/batchexecute',
                text='')
+        m.register_uri(requests_mock.ANY, LOCAL_SERVERS, real_http=True)
         yield m
 
 
@@ -86,9 +93,46 @@ def mock_backend_server():
         })
         m.post('http://localhost:8000/reset_conversation', status_code=200)
         m.post('http://backend:8000/reset_conversation', status_code=200)
+        m.register_uri(requests_mock.ANY, LOCAL_SERVERS, real_http=True)
         yield m
 
 
+@pytest.fixture
+def backend_app(monkeypatch):
+    """
+    A pytest fixture to import the FastAPI backend as it runs in its container.
+
+    The backend imports its package as `src`, which the frontend also uses, so
+    the frontend modules are swapped out of sys.modules while the backend is
+    imported and restored afterwards. Patch the backend's language model
+    client as `src.chatbot.OpenAI`.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch object for modifying
+          environment variables.
+
+    Yields:
+        module: The backend `app` module, with a fresh in-process session store
+          and no warm-up.
+    """
+    monkeypatch.setenv("SESSION_STORE", "memory://")
+    monkeypatch.setenv("WARMUP", "off")
+
+    def swap_out():
+        return {name: sys.modules.pop(name) for name in list(sys.modules)
+                if name in ('app', 'src') or name.startswith('src.')}
+
+    # Only the backend's own modules are swapped, so third-party modules it
+    # imports for the first time, such as numpy, are not imported twice
+    frontend_modules = swap_out()
+    monkeypatch.syspath_prepend(backend_path)
+    try:
+        yield importlib.import_module('app')
+    finally:
+        swap_out()
+        sys.modules.update(frontend_modules)
+
+
 @pytest.fixture(autouse=True)
 def mock_streamlit(monkeypatch):
     """
@@ -107,7 +151,9 @@ def mock_streamlit(monkeypatch):
     # Ensure BACKEND_SERVER is set to the correct URL
     monkeypatch.setenv("BACKEND_SERVER", "http://localhost:8000")
 
-    with mock.patch('streamlit.container') as mock_container:
+    # Fragments only run inside a Streamlit script run, so run them directly
+    with mock.patch('streamlit.fragment', side_effect=lambda function: function), \
+            mock.patch('streamlit.container') as mock_container:
         with mock.patch('streamlit.columns') as mock_columns:
             mock_column = mock.MagicMock()
             mock_columns.return_value = [mock_column, mock_column, mock_column]
@@ -1,38 +1,102 @@
-""" Evaluation script for Parrot-AI conversational AI engine. """
+""" Evaluation script for Parrot-AI conversational AI engine.
+
+The evaluation runs in stages, each a subcommand that saves its results as
+JSON, so stages can be rerun on their own:
+
+    python evaluate.py latency   # latency, token timings and generation modes
+    python evaluate.py load      # concurrent load test
+    python evaluate.py quality   # similarity of the latency stage's outputs
+    python evaluate.py plots     # charts and EVALUATION_RESULTS.md
+    python evaluate.py           # all stages
+
+Heavy dependencies (torch, transformers, matplotlib, seaborn, the chatbot)
+are imported only by the stages that need them. The time to first token, the
+inter-token latency and the decode speed of every LLM call are reported by
+the backend in debug responses; start it with LLM_STREAM=1 so its LLM calls
+are streamed and timed per token.
+"""
 
+import argparse
+import json
 import time
 import os
+import uuid
 import concurrent.futures
 import statistics
 import logging
+from functools import lru_cache
 from typing import Dict, List, Tuple
 import requests
 from requests.exceptions import RequestException, Timeout
-from tqdm import tqdm
-import nltk
-import torch
-import torch.nn.functional as F
-from transformers import AutoTokenizer, AutoModel
-import matplotlib.pyplot as plt
-import seaborn as sns
-import platform
-import psutil
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from evaluation.edit_distance import levenshtein_distance
+
 logger = logging.getLogger(__name__)
 
 # Constants
 BACKEND_URL = "http://localhost:8000"
+LLM_SERVER = os.environ.get('LLM_SERVER', 'http://localhost:8080')
 FRONTEND_URL = "http://localhost:8501"
-TOKENIZER = AutoTokenizer.from_pretrained("distilbert-base-uncased")
-MODEL = AutoModel.from_pretrained("distilbert-base-uncased")
-
-# Download necessary NLTK data
-nltk.download('punkt', quiet=True)
+EMBEDDING_MODEL = "distilbert-base-uncased"
+EMBEDDING_CACHE = os.environ.get(
+    'EMBEDDING_CACHE', os.path.join('~', '.cache', 'parrot-ai', 'embeddings'))
+RESULTS_DIR = "evaluation_results"
+
+# Define the conversation history lengths, in transcript tokens, and the
+# languages of the context scaling analysis
+CONTEXT_TOKENS = [0, 500, 1000, 2000, 4000]
+LANGUAGES = ['English', 'Hindi', 'German', 'Spanish', 'French']
+
+# Define the charts of the per-call token timings as
+# (key, title, axis label, file name)
+TOKEN_TIMING_CHARTS = [
+    ("ttft_ms", "Time to First Token", "Time to first token (ms)", "ttft.png"),
+    ("itl_ms", "Inter-Token Latency", "Mean inter-token latency (ms)",
+     "inter_token_latency.png"),
+    ("decode_tokens_per_second", "Decode Speed", "Completion tokens/second",
+     "decode_speed.png")
+]
+STAGES = ('latency', 'load', 'quality', 'plots')
+
+TEST_CASES = [
+    {
+        "input": "Hello, how are you?",
+        "expected": "I'm doing well, thank you for asking. How can I assist you?"
+    },
+    {
+        "input": "Can you explain the concept of machine learning in simple terms?",
+        "expected": "Machine learning is a branch of artificial intelligence where "
+                    "computers learn from data and improve their performance on a "
+                    "task without being explicitly programmed."
+    },
+    {
+        "input": "What are some effective strategies for learning a new language?",
+        "expected": "Effective strategies for learning a new language include: "
+                    "1. Consistent practice, 2. Immersion in the language, "
+                    "3. Using language learning apps, "
+                    "4. Watching movies or TV shows in the target language, "
+                    "and 5. Finding a language exchange partner."
+    }
+]
+
+PAYLOAD = {
+    "engine": "OpenAI",
+    "role_dict": {
+        "role1": {"name": "User", "action": "asking questions"},
+        "role2": {"name": "Assistant", "action": "providing answers"}
+    },
+    "language": "English",
+    "scenario": "General conversation",
+    "proficiency_level": "Intermediate",
+    "learning_mode": "Conversation",
+    "session_length": "Short"
+}
+
+
+@lru_cache(maxsize=None)
+def get_scorer():
+    """Get the DistilBERT embedding scorer, importing it on first use."""
+    from evaluation.embeddings import EmbeddingScorer
+    return EmbeddingScorer(EMBEDDING_MODEL, cache_dir=EMBEDDING_CACHE)
 
 
 def check_backend_status() -> bool:
@@ -52,7 +116,7 @@ def measure_latency(endpoint: str, payload: Dict) -> Tuple[float, Dict]:
     """Measure the latency of a request to the specified endpoint."""
     try:
         start_time = time.time()
-        response = requests.post(f"{BACKEND_URL}/{endpoint}", json=payload, 
+        response = requests.post(f"{BACKEND_URL}/{endpoint}", json=payload,
                                  timeout=(5, 120))
         response.raise_for_status()
         end_time = time.time()
@@ -68,54 +132,37 @@ def measure_latency(endpoint: str, payload: Dict) -> Tuple[float, Dict]:
         return float('inf'), {}
 
 
-def count_tokens(text: str) -> int:
-    """Count the number of tokens in the given text using the BERT tokenizer."""
-    return len(TOKENIZER.encode(text))
+def session_payload(payload: Dict) -> Dict:
+    """Give a request a backend session of its own, so requests never advance
+    each other's conversation."""
+    return {**payload, "session_id": f"evaluate-{uuid.uuid4().hex}"}
+
+
+def token_timings(cases: List[Dict]) -> Dict[str, Dict[str, List[float]]]:
+    """Group the time to first token, inter-token latency and decode speed of
+    the streamed LLM calls of the test cases by purpose."""
+    timings = {"ttft_ms": {}, "itl_ms": {}, "decode_tokens_per_second": {}}
+    for case in cases:
+        for call in case.get("llm_calls") or []:
+            for key, by_purpose in timings.items():
+                if call.get(key) is not None:
+                    by_purpose.setdefault(call["purpose"], []).append(call[key])
+    return timings
 
 
 def calculate_cosine_similarity(text1: str, text2: str) -> float:
     """Calculate cosine similarity between two texts using BERT embeddings."""
-    # Tokenize and get embeddings
-    inputs1 = TOKENIZER(text1, return_tensors="pt", padding=True, truncation=True)
-    inputs2 = TOKENIZER(text2, return_tensors="pt", padding=True, truncation=True)
-    with torch.no_grad():
-        outputs1 = MODEL(**inputs1)
-        outputs2 = MODEL(**inputs2)
-    # Use mean pooling to get sentence embeddings
-    embedding1 = outputs1.last_hidden_state.mean(dim=1).squeeze()
-    embedding2 = outputs2.last_hidden_state.mean(dim=1).squeeze()
-    # Calculate cosine similarity
-    cosine_sim = F.cosine_similarity(embedding1.unsqueeze(0),
-                                     embedding2.unsqueeze(0), dim=1)
-    return cosine_sim.item()
-
-
-def levenshtein_distance(s1: str, s2: str) -> int:
-    """Compute the Levenshtein distance between two strings."""
-    if len(s1) < len(s2):
-        return levenshtein_distance(s2, s1)
-
-    if len(s2) == 0:
-        return len(s1)
-
-    previous_row = range(len(s2) + 1)
-    for i, c1 in enumerate(s1):
-        current_row = [i + 1]
-        for j, c2 in enumerate(s2):
-            insertions = previous_row[j + 1] + 1
-            deletions = current_row[j] + 1
-            substitutions = previous_row[j] + (c1 != c2)
-            current_row.append(min(insertions, deletions, substitutions))
-        previous_row = current_row
-
-    return previous_row[-1]
+    return float(get_scorer().pairwise_similarity([text2], [text1])[0])
 
 
 def load_test(endpoint: str, payload: Dict, num_requests: int) -> List[float]:
-    """Perform a load test on the specified endpoint."""
+    """Perform a load test on the specified endpoint, each request in a
+    session of its own."""
+    from tqdm import tqdm
+
     with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
         futures = [
-            executor.submit(measure_latency, endpoint, payload)
+            executor.submit(measure_latency, endpoint, session_payload(payload))
             for _ in range(num_requests)
         ]
         results = [
@@ -129,72 +176,146 @@ def load_test(endpoint: str, payload: Dict, num_requests: int) -> List[float]:
     return [r for r in results if r != float('inf')]  # Filter out timeout results
 
 
-def analyze_response_time_vs_length(endpoint: str,
-                                    payloads: List[Dict]) -> List[Tuple[int, float]]:
-    """Analyze response time vs input length."""
+def analyze_context_scaling(context_tokens: List[int],
+                            languages: List[str]) -> List[Dict]:
+    """Time the conversation turns of sessions seeded with histories of
+    growing length in every language, against the LLM server."""
+    from benchmarks.context import run_case
+
     results = []
-    for payload in tqdm(payloads, desc="Analyzing response time vs length"):
-        input_length = len(payload['input_text'].split())
-        latency, _ = measure_latency(endpoint, payload)
-        if latency != float('inf'):
-            results.append((input_length, latency))
-        time.sleep(1)  # Add a small delay to avoid overwhelming the server
+    for language in languages:
+        for tokens in context_tokens:
+            try:
+                case = run_case(language, tokens, LLM_SERVER)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Error timing %s with %d context tokens: %s",
+                             language, tokens, str(e))
+                continue
+            logger.info("%s with %d context tokens: %.0f prompt tokens, "
+                        "TTFT %s ms cold and %s ms warm", language, tokens,
+                        case["prompt_tokens"] or 0, case["cold_ttft_ms"],
+                        case["warm_ttft_ms"])
+            results.append(case)
     return results
 
 
-def visualize_results(latencies, output_speeds, similarity_scores, levenshtein_scores,
-                      response_time_vs_length):
+def compare_generation_modes(payload: Dict) -> Dict[str, Dict]:
+    """Compare a full session of the two-bot and single-completion script paths."""
+    from backend.src.chatbot import DualChatbot, ScriptChatbot, EXCHANGE_COUNTS
+
+    results = {}
+    for mode, chatbot_cls in (("Dialogue", DualChatbot), ("Script", ScriptChatbot)):
+        role_dict = {k: dict(v) for k, v in payload["role_dict"].items()}
+        try:
+            start_time = time.time()
+            chatbot = chatbot_cls(
+                payload["engine"], role_dict, payload["language"],
+                payload["scenario"], payload["proficiency_level"],
+                payload["learning_mode"], payload["session_length"],
+                llm_server=LLM_SERVER
+            )
+            exchanges = EXCHANGE_COUNTS[payload["session_length"]][
+                payload["learning_mode"]]
+            for _ in range(exchanges):
+                chatbot.step()
+            results[mode] = {"latency": time.time() - start_time, **chatbot.usage}
+            logger.info("%s generation mode finish reasons: %s", mode,
+                        dict(chatbot.finish_reasons))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Error comparing %s generation mode: %s", mode, str(e))
+    return results
+
+
+def plot_by_purpose(plt, sns, values_by_purpose: Dict[str, List[float]],
+                    title: str, xlabel: str, path: str):
+    """Plot the distribution of a per-call value for each call purpose."""
+    purposes = sorted(values_by_purpose)
+    plt.figure(figsize=(12, 8))
+    sns.boxplot(data=[values_by_purpose[purpose] for purpose in purposes],
+                orient='h')
+    plt.yticks(range(len(purposes)), purposes)
+    plt.title(title, fontsize=16)
+    plt.xlabel(xlabel, fontsize=12)
+    plt.ylabel('LLM call purpose', fontsize=12)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300)
+    plt.close()
+
+
+def visualize_results(latencies, timings, similarity_scores, levenshtein_scores,
+                      context_scaling):
     """Generate high-quality visualizations for the evaluation results."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     sns.set_style("whitegrid")
     sns.set_palette("deep")
-    
+
     # Ensure assets folder exists
     assets_folder = "assets"
     os.makedirs(assets_folder, exist_ok=True)
 
-    # Latency and Output Speed
-    if latencies and output_speeds:
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 8))
-        sns.histplot(latencies, ax=ax1, kde=True, color='blue')
-        ax1.set_title('Distribution of Latencies', fontsize=16)
-        ax1.set_xlabel('Latency (seconds)', fontsize=12)
-        ax1.set_ylabel('Frequency', fontsize=12)
-        
-        sns.histplot(output_speeds, ax=ax2, kde=True, color='green')
-        ax2.set_title('Distribution of Output Speeds', fontsize=16)
-        ax2.set_xlabel('Output Speed (tokens/second)', fontsize=12)
-        ax2.set_ylabel('Frequency', fontsize=12)
-        
-        plt.tight_layout()
-        plt.savefig(os.path.join(assets_folder, 'latency_output_speed.png'), dpi=300)
+    # Request latency
+    if latencies:
+        plt.figure(figsize=(12, 8))
+        sns.histplot(latencies, kde=True, color='blue')
+        plt.title('Distribution of Latencies', fontsize=16)
+        plt.xlabel('Latency (seconds)', fontsize=12)
+        plt.ylabel('Frequency', fontsize=12)
+        plt.savefig(os.path.join(assets_folder, 'latency.png'), dpi=300)
         plt.close()
     else:
-        logger.warning("Not enough data to plot latency and speed distributions.")
-    
-    # Response Time vs Input Length
-    if response_time_vs_length:
-        plt.figure(figsize=(12, 8))
-        x, y = zip(*response_time_vs_length)
-        sns.regplot(x=x, y=y, scatter_kws={'alpha':0.5}, line_kws={'color': 'red'})
-        plt.title('Response Time vs Input Length', fontsize=16)
-        plt.xlabel('Input Length (words)', fontsize=12)
-        plt.ylabel('Response Time (seconds)', fontsize=12)
-        plt.savefig(os.path.join(assets_folder, 'response_time_vs_length.png'), dpi=300)
+        logger.warning("Not enough data to plot the latency distribution.")
+
+    # Time to first token, inter-token latency and decode speed per LLM call
+    for key, title, xlabel, filename in TOKEN_TIMING_CHARTS:
+        if timings.get(key):
+            plot_by_purpose(plt, sns, timings[key], title, xlabel,
+                            os.path.join(assets_folder, filename))
+        else:
+            logger.warning("No streamed LLM calls to plot the %s.", title.lower())
+
+    # Prefill and total latency of the turns against the seeded context
+    if context_scaling:
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 8))
+        languages = sorted({case["language"] for case in context_scaling})
+        for language, color in zip(languages, sns.color_palette()):
+            cases = sorted((case for case in context_scaling
+                            if case["language"] == language),
+                           key=lambda case: case["context_tokens"])
+            x = [case["context_tokens"] for case in cases]
+            ax1.plot(x, [case["cold_ttft_ms"] for case in cases], '--o',
+                     color=color, label=f"{language} (cold)")
+            ax1.plot(x, [case["warm_ttft_ms"] for case in cases], '-o',
+                     color=color, label=f"{language} (warm)")
+            ax2.plot(x, [case["total_ms"] for case in cases], '-o',
+                     color=color, label=language)
+        ax1.set_title('Prefill (Time to First Token) vs Context Length',
+                      fontsize=16)
+        ax2.set_title('Turn Latency vs Context Length', fontsize=16)
+        for ax in (ax1, ax2):
+            ax.set_xlabel('Conversation history (tokens)', fontsize=12)
+            ax.set_ylabel('Milliseconds', fontsize=12)
+            ax.legend()
+        plt.tight_layout()
+        plt.savefig(os.path.join(assets_folder, 'context_scaling.png'), dpi=300)
         plt.close()
     else:
-        logger.warning("Not enough data to plot response time vs input length.")
-    
+        logger.warning("Not enough data to plot latency against context length.")
+
     # Similarity and Levenshtein scores
     if similarity_scores and levenshtein_scores:
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 8))
         sns.boxplot(y=similarity_scores, ax=ax1, color='purple')
         ax1.set_title('Distribution of Cosine Similarity Scores', fontsize=16)
         ax1.set_ylabel('Cosine Similarity', fontsize=12)
-        
+
         sns.boxplot(y=levenshtein_scores, ax=ax2, color='orange')
         ax2.set_title('Distribution of Levenshtein Distances', fontsize=16)
         ax2.set_ylabel('Levenshtein Distance', fontsize=12)
-        
+
         plt.tight_layout()
         plt.savefig(os.path.join(assets_folder, 'similarity_levenshtein.png'), dpi=300)
         plt.close()
@@ -204,6 +325,9 @@ def visualize_results(latencies, output_speeds, similarity_scores, levenshtein_s
 
 def get_hardware_info():
     """Get hardware information of the system."""
+    import platform
+    import psutil
+
     cpu_info = (
         f"CPU: {platform.processor()} "
         f"({psutil.cpu_count(logical=False)} cores, "
@@ -216,99 +340,123 @@ def get_hardware_info():
     return f"{cpu_info}\n{ram_info}\n{disk_info}\n{os_info}"
 
 
-def main():
-    """Main function for the evaluation script."""
-    logger.info("Starting evaluation of Parrot-AI...")
-
-    if not check_backend_status():
-        logger.error("Backend server is not accessible. Please ensure it's running.")
-        return
-
-    logger.info("Backend server is accessible. Proceeding with evaluation.")
-
-    test_cases = [
-        {
-            "input": "Hello, how are you?",
-            "expected": "I'm doing well, thank you for asking. How can I assist you?"
-        },
-        {
-            "input": "Can you explain the concept of machine learning in simple terms?",
-            "expected": "Machine learning is a branch of artificial intelligence where "
-                        "computers learn from data and improve their performance on a "
-                        "task without being explicitly programmed."
-        },
-        {
-            "input": "What are some effective strategies for learning a new language?",
-            "expected": "Effective strategies for learning a new language include: "
-                        "1. Consistent practice, 2. Immersion in the language, "
-                        "3. Using language learning apps, "
-                        "4. Watching movies or TV shows in the target language, "
-                        "and 5. Finding a language exchange partner."
-        }
-    ]
-
-    latencies = []
-    output_speeds = []
-    similarity_scores = []
-    levenshtein_scores = []
+def save_stage(results_dir: str, stage: str, results: Dict):
+    """Save the results of a stage as JSON."""
+    os.makedirs(results_dir, exist_ok=True)
+    with open(os.path.join(results_dir, f"{stage}.json"), "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_stage(results_dir: str, stage: str) -> Dict:
+    """Load the results of a stage, or None if it has not been run."""
+    try:
+        with open(os.path.join(results_dir, f"{stage}.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
 
-    for i, case in enumerate(test_cases):
+
+def run_latency(args) -> Dict:
+    """Measure the latency and the per-call token timings of the test cases,
+    the turn latency against the context length and both generation modes.
+
+    Each case opens a session of its own; the backend generates the opening
+    exchange from the conversation settings, the input only labels the case."""
+    cases = []
+    for i, case in enumerate(TEST_CASES):
         logger.info("Testing case %d: %s", i+1, case['input'][:50])
-        payload = {
-            "engine": "OpenAI",
-            "role_dict": {
-                "role1": {"name": "User", "action": "asking questions"},
-                "role2": {"name": "Assistant", "action": "providing answers"}
-            },
-            "language": "English",
-            "scenario": "General conversation",
-            "proficiency_level": "Intermediate",
-            "learning_mode": "Conversation",
-            "session_length": "Short",
-            "input_text": case["input"]
-        }
+        payload = session_payload({**PAYLOAD, "debug": True})
         latency, response = measure_latency("generate_conversation", payload)
 
         if isinstance(response, dict) and 'response1' in response:
             output = response['response1']
             logger.info("Case %d output: %s", i+1, output[:100])
-
+            llm_calls = response.get('llm_calls') or []
+            result = {**case, "output": output, "latency": None,
+                      "llm_calls": llm_calls}
             if latency != float('inf'):
-                latencies.append(latency)
-                output_speed = count_tokens(output) / latency if latency > 0 else 0
-                output_speeds.append(output_speed)
+                result["latency"] = latency
                 logger.info("Case %d latency: %.2f seconds", i+1, latency)
-                logger.info("Case %d output speed: %.2f tokens/second", i+1,
-                            output_speed)
-
-            similarity_score = calculate_cosine_similarity(case["expected"], output)
-            similarity_scores.append(similarity_score)
-            logger.info("Case %d cosine similarity score: %.2f", i+1, similarity_score)
-
-            levenshtein_score = levenshtein_distance(case["expected"], output)
-            levenshtein_scores.append(levenshtein_score)
-            logger.info("Case %d Levenshtein distance: %d", i+1, levenshtein_score)
+            for call in llm_calls:
+                if call.get("ttft_ms") is not None:
+                    logger.info("Case %d %s call: TTFT %.0f ms, %s tokens at "
+                                "%s tokens/second", i+1, call["purpose"],
+                                call["ttft_ms"], call.get("completion_tokens"),
+                                call.get("decode_tokens_per_second"))
+            if llm_calls and not any(call.get("streamed") for call in llm_calls):
+                logger.warning("The backend does not stream its LLM calls; "
+                               "start it with LLM_STREAM=1 to time tokens.")
+            cases.append(result)
         else:
             logger.error("Case %d failed: Unexpected response format", i+1)
             logger.error("Response: %s", response)
 
-        time.sleep(5)  # 5-second delay between requests
+        time.sleep(args.delay)  # Delay between requests
+
+    # Generation mode comparison
+    logger.info("Comparing Dialogue and Script generation modes...")
+    generation_modes = compare_generation_modes(PAYLOAD)
+
+    # Latency against the length of the conversation history
+    logger.info("Analyzing latency against context length...")
+    context_scaling = analyze_context_scaling(CONTEXT_TOKENS, LANGUAGES)
 
-    # Load testing
+    return {"cases": cases, "generation_modes": generation_modes,
+            "context_scaling": context_scaling}
+
+
+def run_load(args) -> Dict:
+    """Run the load test."""
     logger.info("Performing load test...")
-    load_test_results = load_test("generate_conversation", payload, 20)
+    return {"num_requests": args.requests,
+            "latencies": load_test("generate_conversation", PAYLOAD, args.requests)}
+
 
-    # Response time vs input length analysis
-    logger.info("Analyzing response time vs input length...")
-    response_time_vs_length_payloads = [
-        {**payload, "input_text": " ".join(["test"] * i)} for i in range(10, 110, 10)
-    ]
-    response_time_vs_length = (analyze_response_time_vs_length(
-        "generate_conversation", response_time_vs_length_payloads))
+def run_quality(args) -> Dict:
+    """Score the outputs of the latency stage against the expected outputs."""
+    latency_results = load_stage(args.results_dir, "latency")
+    if latency_results is None:
+        raise SystemExit("Run the latency stage first: python evaluate.py latency")
+    cases = latency_results["cases"]
+    outputs = [case["output"] for case in cases]
+    expected_outputs = [case["expected"] for case in cases]
+
+    levenshtein_scores = [levenshtein_distance(expected, output)
+                          for expected, output in zip(expected_outputs, outputs)]
+    for i, levenshtein_score in enumerate(levenshtein_scores):
+        logger.info("Case %d Levenshtein distance: %d", i+1, levenshtein_score)
+
+    similarity_scores = []
+    if not args.skip_embeddings:
+        # Score all outputs against their expected outputs in one batch
+        scores = get_scorer().pairwise_similarity(outputs, expected_outputs)
+        similarity_scores = [float(score) for score in scores]
+        for i, similarity_score in enumerate(similarity_scores):
+            logger.info("Case %d cosine similarity score: %.2f", i+1,
+                        similarity_score)
+    return {"levenshtein_scores": levenshtein_scores,
+            "similarity_scores": similarity_scores}
+
+
+def run_plots(args) -> Dict:
+    """Render the charts and EVALUATION_RESULTS.md from the saved results."""
+    latency_results = load_stage(args.results_dir, "latency") or {}
+    load_results = load_stage(args.results_dir, "load") or {}
+    quality_results = load_stage(args.results_dir, "quality") or {}
+
+    cases = latency_results.get("cases", [])
+    latencies = [case["latency"] for case in cases if case["latency"] is not None]
+    timings = token_timings(cases)
+    similarity_scores = quality_results.get("similarity_scores", [])
+    levenshtein_scores = quality_results.get("levenshtein_scores", [])
+    load_test_results = load_results.get("latencies", [])
+    generation_modes = latency_results.get("generation_modes", {})
 
     # Calculate and log results
     avg_latency = statistics.mean(latencies) if latencies else float('inf')
-    avg_output_speed = statistics.mean(output_speeds) if output_speeds else 0
+    avg_timings = {key: {purpose: statistics.mean(values)
+                         for purpose, values in by_purpose.items()}
+                   for key, by_purpose in timings.items()}
     avg_similarity = statistics.mean(similarity_scores) if similarity_scores else 0
     avg_levenshtein = statistics.mean(levenshtein_scores) if levenshtein_scores else 0
 
@@ -318,7 +466,11 @@ def main():
                       if len(load_test_results) >= 20 else None)
     logger.info("Average Latency: %.2f seconds", avg_latency)
 
-    logger.info("Average Output Speed: %.2f tokens/second", avg_output_speed)
+    for purpose, ttft in avg_timings["ttft_ms"].items():
+        logger.info("Average %s call: TTFT %.0f ms, inter-token latency %.1f ms, "
+                    "%.1f tokens/second", purpose, ttft,
+                    avg_timings["itl_ms"].get(purpose, 0),
+                    avg_timings["decode_tokens_per_second"].get(purpose, 0))
     logger.info("Average Cosine Similarity Score: %.2f", avg_similarity)
     logger.info("Average Levenshtein Distance: %.2f", avg_levenshtein)
     logger.info("Load Test - Average response time: %.2f seconds", load_test_avg)
@@ -329,9 +481,9 @@ def main():
         logger.warning("Not enough data to calculate 95th percentile response time")
 
     # Visualize results
-    visualize_results(latencies, output_speeds, similarity_scores, levenshtein_scores,
-                      response_time_vs_length)
-    
+    visualize_results(latencies, timings, similarity_scores, levenshtein_scores,
+                      latency_results.get("context_scaling", []))
+
     # Get hardware information
     hardware_info = get_hardware_info()
     logger.info("Hardware Information:\n%s", hardware_info)
@@ -344,11 +496,10 @@ Automated evaluation of Parrot-AI using sophisticated metrics and techniques.
 Here are the results:
 
 - **Average Latency**: {avg_latency:.2f} seconds
-- **Average Output Speed**: {avg_output_speed:.2f} tokens/second
 - **Average Cosine Similarity Score**: {avg_similarity:.2f}
 - **Average Levenshtein Distance**: {avg_levenshtein:.2f}
 
-**Load Test Results** (20 concurrent requests):
+**Load Test Results** ({load_results.get("num_requests", 0)} concurrent requests):
 - Average response time: {load_test_avg:.2f} seconds
 """
     if load_test_95th is not None:
@@ -356,18 +507,52 @@ Here are the results:
     else:
         markdown += "- 95th percentile response time: Not enough data\n"
 
+    if avg_timings["ttft_ms"]:
+        markdown += (
+            "\n**LLM Token Timings** (streamed calls, mean per purpose):\n\n"
+            "| Purpose | TTFT (ms) | Inter-token latency (ms) | Tokens/second |\n"
+            "|---------|-----------|--------------------------|---------------|\n"
+        )
+        for purpose, ttft in sorted(avg_timings["ttft_ms"].items()):
+            itl = avg_timings["itl_ms"].get(purpose)
+            speed = avg_timings["decode_tokens_per_second"].get(purpose)
+            markdown += (
+                f"| {purpose} | {ttft:.0f} | "
+                f"{'-' if itl is None else f'{itl:.1f}'} | "
+                f"{'-' if speed is None else f'{speed:.1f}'} |\n"
+            )
+
+    if generation_modes:
+        markdown += (
+            "\n**Generation Mode Comparison** (one full session):\n\n"
+            "| Mode | Latency (s) | LLM calls | Prompt tokens | Completion tokens |\n"
+            "|------|-------------|-----------|---------------|-------------------|\n"
+        )
+        for mode, result in generation_modes.items():
+            markdown += (
+                f"| {mode} | {result['latency']:.2f} | {result['calls']} | "
+                f"{result['prompt_tokens']} | {result['completion_tokens']} |\n"
+            )
+
     markdown += """
 These metrics demonstrate Parrot-AI's performance across various dimensions:
-- The latency and output speed indicate the system's responsiveness.
+- The latency and the time to first token indicate the system's responsiveness.
+- The inter-token latency and decode speed show how fast the model generates.
 - The cosine similarity score shows how well responses align with expected outputs.
 - The Levenshtein distance shows the degree of difference between responses.
 - Load test results demonstrate the system's ability to handle concurrent requests.
 
 For detailed visualizations of these results, please refer to the following images:
 
-![Latency and Output Speed Distribution](assets/latency_output_speed.png)
+![Latency Distribution](assets/latency.png)
+
+![Time to First Token](assets/ttft.png)
+
+![Inter-Token Latency](assets/inter_token_latency.png)
 
-![Response Time vs Input Length](assets/response_time_vs_length.png)
+![Decode Speed](assets/decode_speed.png)
+
+![Latency vs Context Length](assets/context_scaling.png)
 
 ![Similarity and Levenshtein Scores](assets/similarity_levenshtein.png)
 
@@ -380,6 +565,59 @@ For detailed visualizations of these results, please refer to the following imag
         f.write(markdown)
 
     logger.info("Evaluation complete. Results have been saved to EVALUATION_RESULTS.md")
+    return {"latency": avg_latency, "token_timings": avg_timings,
+            "similarity": avg_similarity, "levenshtein": avg_levenshtein,
+            "load_test_avg": load_test_avg, "load_test_95th": load_test_95th}
+
+
+STAGE_RUNNERS = {
+    'latency': run_latency,
+    'load': run_load,
+    'quality': run_quality,
+    'plots': run_plots
+}
+
+# Define the stages that send requests to the backend
+BACKEND_STAGES = ('latency', 'load')
+
+
+def parse_args(argv=None):
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        description="Evaluate Parrot-AI in stages; without a stage, run all.")
+    parser.add_argument('stage', nargs='?', choices=STAGES + ('all',),
+                        default='all', help="the stage to run")
+    parser.add_argument('--results-dir', default=RESULTS_DIR,
+                        help="directory of the JSON results of the stages")
+    parser.add_argument('--requests', type=int, default=20,
+                        help="requests of the load test")
+    parser.add_argument('--delay', type=float, default=5.0,
+                        help="seconds between the latency test cases")
+    parser.add_argument('--skip-embeddings', action='store_true',
+                        help="skip the cosine similarity, which needs torch and "
+                             "the DistilBERT model")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function for the evaluation script."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    args = parse_args(argv)
+    stages = STAGES if args.stage == 'all' else (args.stage,)
+    logger.info("Starting evaluation of Parrot-AI: %s", ", ".join(stages))
+
+    if any(stage in BACKEND_STAGES for stage in stages):
+        if not check_backend_status():
+            logger.error("Backend server is not accessible. "
+                         "Please ensure it's running.")
+            return
+        logger.info("Backend server is accessible. Proceeding with evaluation.")
+
+    for stage in stages:
+        save_stage(args.results_dir, stage, STAGE_RUNNERS[stage](args))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,3 @@
+"""
+Scoring functions for evaluating Parrot-AI's generated conversations.
+"""
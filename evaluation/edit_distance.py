@@ -0,0 +1,154 @@
+"""
+Module for computing Levenshtein distances quickly.
+
+The distance is computed with the bit-parallel algorithm of Myers, in the
+formulation of Hyyrö for edit distance. One Python integer holds the
+differences of a whole DP column, so a pair of strings takes one loop
+iteration per character of the shorter string instead of one per cell.
+"""
+
+from multiprocessing import Pool
+
+# Define the pairs per task sent to a worker process
+CHUNKSIZE = 256
+
+
+def pattern_masks(pattern):
+    """
+    Build the match masks of a pattern.
+
+    Args:
+        pattern (str): The pattern.
+
+    Returns:
+        dict: For every character, the bitmask of its positions in the pattern.
+    """
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def _distance(masks, length, text):
+    """
+    Compute the Levenshtein distance between a pattern and a text.
+
+    Args:
+        masks (dict): The match masks of the pattern, see pattern_masks().
+        length (int): The length of the pattern.
+        text (str): The text.
+
+    Returns:
+        int: The distance.
+    """
+    if not length:
+        return len(text)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    vp, vn = full, 0
+    distance = length
+    for char in text:
+        eq = masks.get(char, 0)
+        d0 = ((((eq & vp) + vp) ^ vp) | eq | vn) & full
+        hp = vn | (~(d0 | vp) & full)
+        hn = d0 & vp
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(d0 | hp) & full)
+        vn = hp & d0
+    return distance
+
+
+def levenshtein_distance(s1, s2):
+    """
+    Compute the Levenshtein distance between two strings.
+
+    Args:
+        s1 (str): The first string.
+        s2 (str): The second string.
+
+    Returns:
+        int: The minimum number of single-character insertions, deletions and
+        substitutions turning one string into the other.
+    """
+    # Iterate over the shorter string, the longer one fits in the bitmasks
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    return _distance(pattern_masks(s1), len(s1), s2)
+
+
+def levenshtein_distance_dp(s1, s2):
+    """
+    Compute the Levenshtein distance with the row-by-row dynamic program.
+
+    This is the original implementation of evaluate.py, kept as the
+    reference for tests and benchmarks.
+
+    Args:
+        s1 (str): The first string.
+        s2 (str): The second string.
+
+    Returns:
+        int: The distance.
+    """
+    if len(s1) < len(s2):
+        return levenshtein_distance_dp(s2, s1)
+
+    if len(s2) == 0:
+        return len(s1)
+
+    previous_row = range(len(s2) + 1)
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            insertions = previous_row[j + 1] + 1
+            deletions = current_row[j] + 1
+            substitutions = previous_row[j] + (c1 != c2)
+            current_row.append(min(insertions, deletions, substitutions))
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+def _distance_pair(pair):
+    return levenshtein_distance(*pair)
+
+
+def levenshtein_distances(pairs, processes=None):
+    """
+    Compute the Levenshtein distances of many pairs of strings.
+
+    Args:
+        pairs (iterable): The (s1, s2) pairs.
+        processes (int, optional): The number of worker processes; None or 1
+          computes the distances in this process.
+
+    Returns:
+        list: The distances, in the order of the pairs.
+    """
+    pairs = list(pairs)
+    if processes is None or processes <= 1 or len(pairs) < 2 * CHUNKSIZE:
+        return [levenshtein_distance(s1, s2) for s1, s2 in pairs]
+    with Pool(processes) as pool:
+        return pool.map(_distance_pair, pairs, chunksize=CHUNKSIZE)
+
+
+def levenshtein_to_many(reference, texts):
+    """
+    Compute the Levenshtein distances of one reference to many texts.
+
+    The match masks of the reference are built once for all texts.
+
+    Args:
+        reference (str): The reference string.
+        texts (iterable): The strings to compare against the reference.
+
+    Returns:
+        list: The distances, in the order of the texts.
+    """
+    masks, length = pattern_masks(reference), len(reference)
+    return [_distance(masks, length, text) for text in texts]
@@ -0,0 +1,217 @@
+"""
+Module for scoring the semantic similarity of texts with sentence embeddings.
+
+Texts are encoded in padded batches, one forward pass per batch, and the
+token embeddings are mean-pooled over the attention mask so padding does not
+dilute them. Embeddings are L2-normalized, so cosine similarities of many
+texts against many references are a single matrix product. Reference texts,
+which are the same on every run, are cached on disk keyed by the model and
+a hash of the text.
+
+torch and transformers are imported when the first text is encoded.
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+
+DEFAULT_MODEL = "distilbert-base-uncased"
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "parrot-ai", "embeddings")
+
+# Bump when the pooling changes, so cached embeddings are not reused
+POOLING_VERSION = "mean-masked-v1"
+
+
+def mean_pool(hidden_states, attention_mask):
+    """
+    Average token embeddings over the tokens that are not padding.
+
+    Args:
+        hidden_states (torch.Tensor): The token embeddings, (batch, tokens,
+          dim).
+        attention_mask (torch.Tensor): 1 for tokens and 0 for padding,
+          (batch, tokens).
+
+    Returns:
+        torch.Tensor: The sentence embeddings, (batch, dim).
+    """
+    mask = attention_mask.unsqueeze(-1).to(hidden_states.dtype)
+    return (hidden_states * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+
+class EmbeddingScorer:
+    """
+    Embed texts with a transformer model and compare them by cosine
+    similarity.
+
+    Attributes:
+        model_name (str): The Hugging Face model name.
+        cache_dir (str): The directory of the reference embedding cache, or
+          None to disable it.
+        batch_size (int): The texts encoded per forward pass.
+        max_length (int): The tokens per text, longer texts are truncated.
+        encoded (int): The number of texts encoded by the model so far.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, cache_dir=DEFAULT_CACHE_DIR,
+                 batch_size=32, max_length=512):
+        """
+        Initialize the EmbeddingScorer without loading the model.
+
+        Args:
+            model_name (str, optional): The Hugging Face model name. Defaults
+              to DEFAULT_MODEL.
+            cache_dir (str, optional): The directory of the reference
+              embedding cache, or None to disable it. Defaults to
+              DEFAULT_CACHE_DIR.
+            batch_size (int, optional): The texts per forward pass.
+              Defaults to 32.
+            max_length (int, optional): The tokens per text. Defaults to 512.
+        """
+        self.model_name = model_name
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.encoded = 0
+        self._tokenizer = None
+        self._model = None
+
+    @property
+    def tokenizer(self):
+        """
+        The tokenizer of the model, loaded on first use.
+
+        Returns:
+            transformers.PreTrainedTokenizer: The tokenizer.
+        """
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return self._tokenizer
+
+    @property
+    def model(self):
+        """
+        The model, loaded on first use in evaluation mode.
+
+        Returns:
+            transformers.PreTrainedModel: The model.
+        """
+        if self._model is None:
+            from transformers import AutoModel
+            self._model = AutoModel.from_pretrained(self.model_name)
+            self._model.eval()
+        return self._model
+
+    def _encode(self, texts):
+        """
+        Encode texts with the model, batch by batch.
+
+        Texts are sorted by length first, so each batch pads to a similar
+        length.
+
+        Args:
+            texts (list): The texts to encode.
+
+        Returns:
+            np.ndarray: The normalized embeddings, (len(texts), dim).
+        """
+        import torch
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        with torch.no_grad():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                inputs = self.tokenizer(
+                    [texts[i] for i in batch], padding=True, truncation=True,
+                    max_length=self.max_length, return_tensors="pt")
+                outputs = self.model(**inputs)
+                pooled = mean_pool(outputs.last_hidden_state,
+                                   inputs["attention_mask"])
+                pooled = torch.nn.functional.normalize(pooled, dim=1)
+                for i, vector in zip(batch, pooled.cpu().numpy()):
+                    embeddings[i] = vector
+        self.encoded += len(texts)
+        return np.stack(embeddings).astype(np.float32)
+
+    def _cache_path(self, text):
+        """
+        Get the cache file of a text's embedding.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str: The path of the .npy file.
+        """
+        key = hashlib.sha256(
+            f"{self.model_name}\0{self.max_length}\0{POOLING_VERSION}\0{text}"
+            .encode("utf-8")).hexdigest()
+        model_dir = re.sub(r"[^\w.-]", "_", self.model_name)
+        return os.path.join(self.cache_dir, model_dir, key[:2], f"{key}.npy")
+
+    def embed(self, texts, cache=False):
+        """
+        Embed texts.
+
+        Args:
+            texts (list): The texts to embed.
+            cache (bool, optional): Whether to read and write the on-disk
+              cache, meant for reference texts. Defaults to False.
+
+        Returns:
+            np.ndarray: The normalized embeddings, (len(texts), dim).
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if not cache or self.cache_dir is None:
+            return self._encode(texts)
+
+        embeddings = [None] * len(texts)
+        missing = {}
+        for i, text in enumerate(texts):
+            path = self._cache_path(text)
+            if os.path.exists(path):
+                embeddings[i] = np.load(path)
+            else:
+                missing.setdefault(text, []).append(i)
+        if missing:
+            new_texts = list(missing)
+            for text, vector in zip(new_texts, self._encode(new_texts)):
+                path = self._cache_path(text)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                np.save(path, vector)
+                for i in missing[text]:
+                    embeddings[i] = vector
+        return np.stack(embeddings)
+
+    def similarity_matrix(self, texts, references):
+        """
+        Compute the cosine similarity of every text to every reference.
+
+        Args:
+            texts (list): The generated texts.
+            references (list): The reference texts, embedded through the cache.
+
+        Returns:
+            np.ndarray: The similarities, (len(texts), len(references)).
+        """
+        return self.embed(texts) @ self.embed(references, cache=True).T
+
+    def pairwise_similarity(self, texts, references):
+        """
+        Compute the cosine similarity of each text to its own reference.
+
+        Args:
+            texts (list): The generated texts.
+            references (list): The reference texts, one per text.
+
+        Returns:
+            np.ndarray: The similarities, (len(texts),).
+        """
+        return np.einsum("ij,ij->i", self.embed(texts),
+                         self.embed(references, cache=True))
@@ -59,13 +59,9 @@ proficiency_level = st.sidebar.selectbox('Proficiency Level 🏆', PROFICIENCY_L
 # Initialize session states
 initialize_session_state()
 
-# Define the button layout at the beginning
-translate_col, original_col, audio_col = st.columns(3)
-
-# Create the conversation container
+# Create the conversation container, which starts with the toggle buttons
 conversation_container = st.container()
 
 # Set up the conversation with the provided settings
-setup_conversation(conversation_container, translate_col, original_col, audio_col,
-                   learning_mode, role_dict, language, scenario, proficiency_level,
-                   session_length, time_delay)
+setup_conversation(conversation_container, learning_mode, role_dict, language,
+                   scenario, proficiency_level, session_length, time_delay)
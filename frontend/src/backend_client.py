@@ -0,0 +1,166 @@
+""" This module contains the client of the backend server, with pooled
+connections and the pipelining of conversation exchanges. """
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Define the connect and read timeouts of backend requests, in seconds; an
+# exchange waits for up to four LLM calls
+TIMEOUT = (5, 300)
+
+# Define the number of pooled connections kept open to the backend, shared by
+# all sessions of the Streamlit server
+POOL_SIZE = 16
+
+# Define how often an idempotent exchange request is retried after a timeout
+# or a lost connection
+RETRIES = 2
+
+
+class BackendClient:
+    """
+    A client of the backend server reusing its connections.
+
+    Attributes:
+        base_url (str): The URL of the backend server.
+        session (requests.Session): The HTTP session holding the connection
+          pool.
+        timeout (tuple): The connect and read timeouts, in seconds.
+    """
+
+    def __init__(self, base_url, timeout=TIMEOUT, pool_size=POOL_SIZE):
+        """
+        Initialize the client.
+
+        Args:
+            base_url (str): The URL of the backend server.
+            timeout (tuple, optional): The connect and read timeouts, in
+              seconds. Defaults to TIMEOUT.
+            pool_size (int, optional): The connections kept open. Defaults to
+              POOL_SIZE.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, endpoint, **kwargs):
+        """
+        Send a POST request to the backend.
+
+        Args:
+            endpoint (str): The endpoint, e.g. 'generate_conversation'.
+            **kwargs: The arguments of requests.Session.post.
+
+        Returns:
+            requests.Response: The successful response.
+
+        Raises:
+            requests.RequestException: If the request fails or the backend
+              answers with an error status.
+        """
+        response = self.session.post(f"{self.base_url}/{endpoint}",
+                                     timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def generate_conversation(self, payload, retries=RETRIES):
+        """
+        Generate the next exchange of a conversation.
+
+        A request with an exchange_index is retried after a timeout or a lost
+        connection, as the backend then serves the same exchange again
+        instead of generating another one.
+
+        Args:
+            payload (dict): The conversation request.
+            retries (int, optional): The retries of an idempotent request.
+              Defaults to RETRIES.
+
+        Returns:
+            dict: The responses and translations of both chatbots.
+        """
+        attempts = retries + 1 if payload.get('exchange_index') is not None else 1
+        for attempt in range(attempts):
+            try:
+                return self.post('generate_conversation', json=payload).json()
+            except (requests.Timeout, requests.ConnectionError):
+                if attempt == attempts - 1:
+                    raise
+
+    def generate_summary(self, payload):
+        """
+        Generate the learning summary of a conversation.
+
+        Args:
+            payload (dict): The conversation request.
+
+        Returns:
+            str: The summary.
+        """
+        return self.post('generate_summary', json=payload).json()['summary']
+
+    def generate_fanout(self, payload):
+        """
+        Generate the same scenario in several languages at once.
+
+        Args:
+            payload (dict): The fan-out request, with the languages.
+
+        Yields:
+            dict: The session of each language, as soon as it is done.
+        """
+        response = self.post('generate_fanout', json=payload, stream=True)
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def reset_conversation(self, session_id):
+        """
+        Delete a conversation session on the backend.
+
+        Args:
+            session_id (str): The id of the session.
+        """
+        self.post('reset_conversation', params={"session_id": session_id})
+
+
+def prefetch(fetch, count, stop=None, initializer=None):
+    """
+    Fetch results one after another, each in the background while the
+    previous one is being used.
+
+    The next call starts when the previous result is handed out, so calls
+    never overlap each other, as the exchanges of a session must not, but
+    they overlap with whatever the caller does with each result. No further
+    call is made after a result of None or one matching stop.
+
+    Args:
+        fetch (callable): Returns the next result, called without arguments.
+        count (int): The maximum number of results.
+        stop (callable, optional): Returns True for a result after which no
+          more results are fetched.
+        initializer (callable, optional): Called in the background thread
+          before the first fetch, e.g. to attach the Streamlit script context.
+
+    Yields:
+        The results of fetch, in order.
+    """
+    if count <= 0:
+        return
+    with ThreadPoolExecutor(max_workers=1, initializer=initializer) as executor:
+        future = executor.submit(fetch)
+        for index in range(count):
+            result = future.result()
+            last = (index == count - 1 or result is None
+                    or (stop is not None and stop(result)))
+            if not last:
+                future = executor.submit(fetch)
+            yield result
+            if last:
+                return
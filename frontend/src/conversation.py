@@ -1,14 +1,22 @@
 """ This module contains the functions for generating and displaying a conversation
 between two chatbots. """
 
+import itertools
+import os
+import threading
+import uuid
 import streamlit as st
 import requests
-import os
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from src.backend_client import BackendClient, prefetch
 from src.utils import show_messages
 
 # Set the backend server URL from environment variable or default to localhost
 BACKEND_SERVER = os.environ.get('BACKEND_SERVER', 'http://localhost:8000')
 
+# Share one pooled client of the backend between all sessions
+backend_client = BackendClient(BACKEND_SERVER)
+
 # Define the maximum number of exchanges for different session lengths and
 # learning modes
 MAX_EXCHANGE_COUNTS = {
@@ -24,7 +32,8 @@ ENGINE = 'OpenAI'
 
 
 def generate_conversation(role_dict, language, scenario, proficiency_level,
-                          learning_mode, session_length):
+                          learning_mode, session_length, session_id=None,
+                          exchange_index=None):
     """
     Generates a conversation based on the provided parameters by sending a request to
       the backend server.
@@ -36,6 +45,9 @@ def generate_conversation(role_dict, language, scenario, proficiency_level,
         proficiency_level (str): Proficiency level of the language learner.
         learning_mode (str): Learning mode, either 'Conversation' or 'Debate'.
         session_length (str): Length of the session, either 'Short' or 'Long'.
+        session_id (str, optional): Id of the backend conversation session.
+        exchange_index (int, optional): Index of the requested exchange, which
+          lets a retried request get the same exchange.
 
     Returns:
         dict: JSON response containing the generated conversation.
@@ -45,25 +57,192 @@ def generate_conversation(role_dict, language, scenario, proficiency_level,
           backend server.
     """
     try:
-        response = requests.post(f"{BACKEND_SERVER}/generate_conversation", json={
+        return backend_client.generate_conversation({
             "engine": ENGINE,
             "role_dict": role_dict,
             "language": language,
             "scenario": scenario,
             "proficiency_level": proficiency_level,
             "learning_mode": learning_mode,
-            "session_length": session_length
+            "session_length": session_length,
+            "session_id": session_id,
+            "exchange_index": exchange_index
         })
-        response.raise_for_status()
-        return response.json()
     except requests.RequestException as e:
         st.error(f"Error communicating with backend server: {str(e)}")
         return None
 
 
-def setup_conversation(conversation_container, translate_col, original_col, audio_col,
-                       learning_mode, role_dict, language, scenario, proficiency_level,
-                       session_length, time_delay):
+def script_context_initializer():
+    """
+    Create a thread initializer that lets a background thread of the current
+      script run use Streamlit, e.g. to show an error.
+
+    Returns:
+        callable: The initializer, to run in the background thread.
+    """
+    ctx = get_script_run_ctx()
+    return lambda: add_script_run_ctx(threading.current_thread(), ctx)
+
+
+def generate_exchanges(learning_mode, role_dict, language, scenario,
+                       proficiency_level, session_length, time_delay):
+    """
+    Generates the exchanges of a new conversation and displays them as they arrive.
+
+    Args:
+        learning_mode (str): Learning mode, either 'Conversation' or 'Debate'.
+        role_dict (dict): Dictionary containing role information for the conversation.
+        language (str): Language of the conversation.
+        scenario (str): Scenario for the conversation.
+        proficiency_level (str): Proficiency level of the language learner.
+        session_length (str): Length of the session, either 'Short' or 'Long'.
+        time_delay (int): Time delay between messages.
+    """
+    session_id = st.session_state['session_id']
+
+    # Display the conversation or debate scenario
+    if learning_mode == 'Conversation':
+        st.write(
+            "#### The following conversation happens between\n"
+            f"{role_dict['role1']['name']} and "
+            f"{role_dict['role2']['name']} "
+            f"{scenario} 🎭"
+        )
+    else:
+        st.write(f"""#### Debate 💬: {scenario}""")
+
+    # Fetch each exchange in the background while the previous one is
+    # displayed; no exchange is requested once the bots have wrapped up.
+    # Each request names its exchange, so a retry does not advance the
+    # conversation again
+    indices = itertools.count()
+    exchanges = prefetch(
+        lambda: generate_conversation(role_dict, language, scenario,
+                                      proficiency_level, learning_mode,
+                                      session_length, session_id, next(indices)),
+        MAX_EXCHANGE_COUNTS[session_length][learning_mode],
+        stop=lambda result: result.get("complete", False),
+        initializer=script_context_initializer()
+    )
+    with st.spinner('Generating conversation...'):
+        for result in exchanges:
+            if result:
+                # Give every message an id, which keys its rendered block
+                # and its cached audio across reruns
+                exchange = len(st.session_state['bot1_mesg'])
+                mesg_1 = {"id": f"{session_id}-{exchange}-1",
+                          "role": role_dict['role1']['name'],
+                          "content": result["response1"],
+                          "translation": result["translate1"],
+                          "language": language}
+                mesg_2 = {"id": f"{session_id}-{exchange}-2",
+                          "role": role_dict['role2']['name'],
+                          "content": result["response2"],
+                          "translation": result["translate2"],
+                          "language": language}
+                new_count = show_messages(mesg_1, mesg_2,
+                                          st.session_state["message_counter"],
+                                          time_delay=time_delay, batch=False,
+                                          audio=False, translation=False)
+                st.session_state["message_counter"] = new_count
+
+                st.session_state.bot1_mesg.append(mesg_1)
+                st.session_state.bot2_mesg.append(mesg_2)
+
+
+def set_exchange_flag(flag, value):
+    """
+    Sets a display flag for the conversation and for each of its exchanges.
+
+    Args:
+        flag (str): The flag, either 'translate' or 'audio'.
+        value (bool): Whether to show the translations or the audio.
+    """
+    st.session_state[f'{flag}_flag'] = value
+    st.session_state['batch_flag'] = True
+    for mesg in st.session_state['bot1_mesg']:
+        st.session_state[f"{mesg['id']}-{flag}"] = value
+
+
+def exchange_view(index, time_delay):
+    """
+    Displays one exchange with its own translation and audio toggles.
+
+    The exchange runs as a fragment of its own: flipping one of its toggles
+      reruns only this exchange, so the cost of a toggle does not grow with
+      the length of the conversation. The toggles start from the flags of the
+      whole conversation.
+
+    Args:
+        index (int): The index of the exchange.
+        time_delay (int): Time delay between messages.
+    """
+    mesg_1 = st.session_state['bot1_mesg'][index]
+    mesg_2 = st.session_state['bot2_mesg'][index]
+    for flag in ('translate', 'audio'):
+        st.session_state.setdefault(f"{mesg_1['id']}-{flag}",
+                                    st.session_state[f'{flag}_flag'])
+    translation = st.toggle('English', key=f"{mesg_1['id']}-translate")
+    audio = st.toggle('Audio', key=f"{mesg_1['id']}-audio")
+    show_messages(mesg_1, mesg_2, 2 * index, time_delay=time_delay, batch=True,
+                  audio=audio, translation=translation)
+
+
+def conversation_view(learning_mode, role_dict, language, scenario,
+                      proficiency_level, session_length, time_delay):
+    """
+    Displays the conversation with its translation and audio buttons.
+
+    The view runs as a fragment: clicking a button reruns only the view, not
+      the whole app. Each exchange is a nested fragment with its own toggles,
+      see exchange_view(), and the messages keep the keys of their ids, so
+      only the translations or audio players that were toggled are added or
+      removed. Audio is synthesized once per message.
+
+    Args:
+        learning_mode (str): Learning mode, either 'Conversation' or 'Debate'.
+        role_dict (dict): Dictionary containing role information for the conversation.
+        language (str): Language of the conversation.
+        scenario (str): Scenario for the conversation.
+        proficiency_level (str): Proficiency level of the language learner.
+        session_length (str): Length of the session, either 'Short' or 'Long'.
+        time_delay (int): Time delay between messages.
+    """
+    # Display buttons for translating, showing original text, and playing audio
+    translate_col, original_col, audio_col = st.columns(3)
+    if translate_col.button('Translate to English'):
+        set_exchange_flag('translate', True)
+
+    if original_col.button('Show original'):
+        set_exchange_flag('translate', False)
+
+    if audio_col.button('Play audio'):
+        set_exchange_flag('audio', True)
+
+    # Generate the conversation on the run after 'Generate' was clicked, and
+    # display the history on every other run
+    if st.session_state["first_time_exec"]:
+        st.session_state['first_time_exec'] = False
+        generate_exchanges(learning_mode, role_dict, language, scenario,
+                           proficiency_level, session_length, time_delay)
+        return
+
+    if learning_mode == 'Conversation':
+        st.write(
+            f"#### {role_dict['role1']['name']} and "
+            f"{role_dict['role2']['name']} {scenario} 🎭"
+        )
+    else:
+        st.write(f"#### Debate 💬: {scenario}")
+    exchanges = len(st.session_state['bot1_mesg'])
+    for index in range(exchanges):
+        st.fragment(exchange_view)(index, time_delay)
+    st.session_state["message_counter"] = 2 * exchanges
+
+
+def setup_conversation(conversation_container, learning_mode, role_dict, language,
+                       scenario, proficiency_level, session_length, time_delay):
     """
     Sets up the conversation UI and handles the logic for generating and displaying the
       conversation.
@@ -71,9 +250,6 @@ def setup_conversation(conversation_container, translate_col, original_col, audi
     Args:
         conversation_container (streamlit.container): Streamlit container to display
           the conversation.
-        translate_col (streamlit.column): Streamlit column for the translate button.
-        original_col (streamlit.column): Streamlit column for the original text button.
-        audio_col (streamlit.column): Streamlit column for the audio play button.
         learning_mode (str): Learning mode, either 'Conversation' or 'Debate'.
         role_dict (dict): Dictionary containing role information for the conversation.
         language (str): Language of the conversation.
@@ -83,113 +259,44 @@ def setup_conversation(conversation_container, translate_col, original_col, audi
         time_delay (int): Time delay between messages.
     """
     if st.sidebar.button('Generate'):
-        # Reset the conversation on the backend
-        requests.post(f"{BACKEND_SERVER}/reset_conversation")
+        # Start a new conversation session on the backend
+        if 'session_id' in st.session_state:
+            try:
+                backend_client.reset_conversation(st.session_state['session_id'])
+            except requests.RequestException:
+                pass  # The session expires on the backend anyway
+        st.session_state['session_id'] = uuid.uuid4().hex
         st.session_state["first_time_exec"] = True
         st.session_state['bot1_mesg'] = []
         st.session_state['bot2_mesg'] = []
         st.session_state['message_counter'] = 0
-
-        with conversation_container:
-            # Display the conversation or debate scenario
-            if learning_mode == 'Conversation':
-                st.write(
-                    "#### The following conversation happens between\n"
-                    f"{role_dict['role1']['name']} and "
-                    f"{role_dict['role2']['name']} "
-                    f"{scenario} 🎭"
-                )
-            else:
-                st.write(f"""#### Debate 💬: {scenario}""")
-
-            st.session_state['dual_chatbots'] = True
-            # Generate and display the conversation
-            with st.spinner('Generating conversation...'):
-                for _ in range(MAX_EXCHANGE_COUNTS[session_length][learning_mode]):
-                    result = generate_conversation(role_dict, language, scenario,
-                                                   proficiency_level, learning_mode,
-                                                   session_length)
-                    if result:
-                        output1, output2, translate1, translate2 = (
-                            result["response1"],
-                            result["response2"],
-                            result["translate1"],
-                            result["translate2"]
-                        )
-                        mesg_1 = {"role": role_dict['role1']['name'],
-                                  "content": output1, "translation": translate1,
-                                  "language": language}
-                        mesg_2 = {"role": role_dict['role2']['name'],
-                                  "content": output2, "translation": translate2,
-                                  "language": language}
-                        new_count = show_messages(mesg_1, mesg_2,
-                                                  st.session_state["message_counter"],
-                                                  time_delay=time_delay, batch=False,
-                                                  audio=False, translation=False)
-                        st.session_state["message_counter"] = new_count
-
-                        st.session_state.bot1_mesg.append(mesg_1)
-                        st.session_state.bot2_mesg.append(mesg_2)
+        st.session_state['audio_cache'] = {}
+        st.session_state.pop('summary', None)
+        st.session_state['dual_chatbots'] = True
 
     if 'dual_chatbots' in st.session_state:
-        # Display buttons for translating, showing original text, and playing audio
-        if translate_col.button('Translate to English'):
-            st.session_state['translate_flag'] = True
-            st.session_state['batch_flag'] = True
-
-        if original_col.button('Show original'):
-            st.session_state['translate_flag'] = False
-            st.session_state['batch_flag'] = True
-
-        if audio_col.button('Play audio'):
-            st.session_state['audio_flag'] = True
-            st.session_state['batch_flag'] = True
-
-        # Use dictionary access instead of attribute access
-        mesg1_list = st.session_state['bot1_mesg']
-        mesg2_list = st.session_state['bot2_mesg']
-
-        # Display the conversation history
-        if st.session_state["first_time_exec"]:
-            st.session_state['first_time_exec'] = False
-        else:
-            with conversation_container:
-                if learning_mode == 'Conversation':
-                    st.write(
-                        f"#### {role_dict['role1']['name']} and "
-                        f"{role_dict['role2']['name']} {scenario} 🎭"
-                    )
-                else:
-                    st.write(f"#### Debate 💬: {scenario}")
-                for mesg_1, mesg_2 in zip(mesg1_list, mesg2_list):
-                    new_count = show_messages(
-                        mesg_1,
-                        mesg_2,
-                        st.session_state["message_counter"],
-                        time_delay=time_delay,
-                        batch=st.session_state['batch_flag'],
-                        audio=st.session_state['audio_flag'],
-                        translation=st.session_state['translate_flag']
-                    )
-                    st.session_state["message_counter"] = new_count
+        with conversation_container:
+            st.fragment(conversation_view)(
+                learning_mode, role_dict, language, scenario, proficiency_level,
+                session_length, time_delay)
 
         # Generate and display the learning summary
         summary_expander = st.expander('Key Learning Points')
         if "summary" not in st.session_state:
             with st.spinner('Generating summary...'):
-                response = requests.post(f"{BACKEND_SERVER}/generate_summary", json={
-                    "engine": ENGINE,
-                    "role_dict": role_dict,
-                    "language": language,
-                    "scenario": scenario,
-                    "proficiency_level": proficiency_level,
-                    "learning_mode": learning_mode,
-                    "session_length": session_length
-                })
-                if response.status_code == 200:
-                    summary = response.json()["summary"]
+                try:
+                    summary = backend_client.generate_summary({
+                        "engine": ENGINE,
+                        "role_dict": role_dict,
+                        "language": language,
+                        "scenario": scenario,
+                        "proficiency_level": proficiency_level,
+                        "learning_mode": learning_mode,
+                        "session_length": session_length,
+                        "session_id": st.session_state.get('session_id')
+                    })
                     st.session_state["summary"] = summary
-                else:
+                except requests.RequestException:
                     st.error("Failed to generate summary")
                     summary = "Failed to generate summary"
         else:
@@ -43,6 +43,9 @@ def initialize_session_state():
     if 'message_counter' not in st.session_state:
         st.session_state["message_counter"] = 0
 
+    if 'audio_cache' not in st.session_state:
+        st.session_state["audio_cache"] = {}
+
 
 def show_messages(mesg_1, mesg_2, message_counter,
                   time_delay, batch=False, audio=False,
@@ -62,10 +65,14 @@ def show_messages(mesg_1, mesg_2, message_counter,
         int: The updated message counter.
     """
     for i, mesg in enumerate([mesg_1, mesg_2]):
+        # Key the blocks of a message by its id, so they are not rebuilt when
+        # other blocks are toggled
+        mesg_id = mesg.get('id')
+
         # Show original exchange
         message(f"{mesg['content']}", is_user=i == 1, avatar_style="bottts",
                 seed=AVATAR_SEED[i],
-                key=message_counter)
+                key=mesg_id or str(message_counter))
         message_counter += 1
 
         # Mimic time interval between conversations
@@ -76,19 +83,35 @@ def show_messages(mesg_1, mesg_2, message_counter,
         if translation:
             message(f"{mesg['translation']}", is_user=i == 1, avatar_style="bottts",
                     seed=AVATAR_SEED[i],
-                    key=message_counter)
+                    key=f"{mesg_id}-translation" if mesg_id else str(message_counter))
             message_counter += 1
 
         # Append audio to the exchange if audio flag is set
         if audio:
-            tts = gTTS(text=mesg['content'], lang=AUDIO_SPEECH[mesg_1['language']])
-            sound_file = BytesIO()
-            tts.write_to_fp(sound_file)
-            st.audio(sound_file)
+            st.audio(message_audio(mesg), format="audio/mpeg")
 
     return message_counter
 
 
+def message_audio(mesg):
+    """
+    Get the speech of a message, synthesized once per message id and kept in
+    the session state across reruns.
+
+    Args:
+        mesg (dict): The message dictionary, with an 'id' unless it is new.
+
+    Returns:
+        bytes: The MP3 audio of the message.
+    """
+    cache = st.session_state.setdefault("audio_cache", {})
+    key = mesg.get('id') or (mesg['content'], mesg['language'])
+    if key not in cache:
+        cache[key] = text_to_speech(mesg['content'],
+                                    AUDIO_SPEECH[mesg['language']]).getvalue()
+    return cache[key]
+
+
 def text_to_speech(text, lang):
     """
     Convert the given text to speech using Google Text-to-Speech (gTTS).
@@ -0,0 +1,333 @@
+""" Tests for the FastAPI backend endpoints. """
+
+import json
+import marshal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from unittest import mock
+from fastapi.testclient import TestClient
+
+REQUEST = {
+    "engine": "OpenAI",
+    "role_dict": {
+        'role1': {'name': 'Customer', 'action': 'ordering food'},
+        'role2': {'name': 'Waitstaff', 'action': 'taking the order'}
+    },
+    "language": "Hindi",
+    "scenario": "at a restaurant",
+    "proficiency_level": "Beginner",
+    "learning_mode": "Conversation",
+    "session_length": "Short"
+}
+
+
+@pytest.fixture
+def client(backend_app):
+    """
+    Fixture for a test client of the backend with OpenAI mocked.
+
+    Args:
+        backend_app (fixture): The backend app module fixture.
+
+    Yields:
+        TestClient: The test client.
+    """
+    with mock.patch('src.chatbot.OpenAI') as mock_openai:
+        response = mock_openai.return_value.chat.completions.create.return_value
+        response.choices[0].message.content = "Mocked LLM response"
+        response.usage.prompt_tokens = 100
+        response.usage.completion_tokens = 20
+        with TestClient(backend_app.app) as test_client:
+            yield test_client
+
+
+def test_sessions_are_isolated(client):
+    """
+    Test that conversations with different session ids do not share state.
+
+    Args:
+        client (TestClient): The backend test client.
+    """
+    assert client.post("/generate_conversation",
+                       json={**REQUEST, "session_id": "a"}).status_code == 200
+    assert client.post("/generate_summary",
+                       json={**REQUEST, "session_id": "a"}).status_code == 200
+    response = client.post("/generate_summary", json={**REQUEST, "session_id": "b"})
+    assert response.status_code == 400
+    assert "No conversation" in response.json()["detail"]
+
+
+def test_metrics_endpoint(client):
+    """
+    Test that /metrics exposes stage and LLM latencies, token counters and
+    gauges after a conversation step.
+
+    Args:
+        client (TestClient): The backend test client.
+    """
+    client.post("/generate_conversation", json={**REQUEST, "session_id": "m"})
+    text = client.get("/metrics").text
+    assert 'parrot_stage_duration_seconds_count{stage="system_prompt"} 2' in text
+    assert 'parrot_llm_request_duration_seconds_count{purpose="turn"} 2' in text
+    assert 'parrot_llm_request_duration_seconds_count{purpose="translate"} 2' in text
+    assert 'parrot_llm_prompt_tokens_total{purpose="turn"} 200.0' in text
+    assert ('parrot_request_duration_seconds_count'
+            '{endpoint="/generate_conversation"} 1') in text
+    assert 'parrot_active_sessions 1.0' in text
+    assert 'parrot_llm_requests_in_flight 0.0' in text
+
+
+def test_server_timing_and_debug_timings(client):
+    """
+    Test that responses carry a Server-Timing breakdown and that debug
+    requests also get it in the body.
+
+    Args:
+        client (TestClient): The backend test client.
+    """
+    response = client.post("/generate_conversation",
+                           json={**REQUEST, "session_id": "t", "debug": True})
+    server_timing = response.headers["Server-Timing"]
+    assert 'turn;dur=' in server_timing and 'translate;dur=' in server_timing
+    assert 'total;dur=' in server_timing
+    assert response.json()["timings"]["turn"]["calls"] == 2
+    llm_calls = response.json()["llm_calls"]
+    assert [call["purpose"] for call in llm_calls] == [
+        "turn", "translate", "turn", "translate"]
+    assert llm_calls[0]["prompt_tokens"] == 100
+    assert llm_calls[0]["completion_tokens"] == 20
+
+    response = client.post("/generate_conversation",
+                           json={**REQUEST, "session_id": "t"})
+    assert response.json()["timings"] is None
+    assert response.json()["llm_calls"] is None
+
+
+def test_profiler_requires_admin_token(client, backend_app, monkeypatch):
+    """
+    Test that the profiler is only available with the admin token and returns
+    the aggregated profile of the armed requests, including the blocking
+    calls run in worker threads.
+
+    Args:
+        client (TestClient): The backend test client.
+        backend_app (fixture): The backend app module fixture.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    assert client.post("/admin/profile").status_code == 403
+    monkeypatch.setattr(backend_app, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert client.post("/admin/profile",
+                       headers={"X-Admin-Token": "secreT"}).status_code == 403
+    for requests in (0, 10**9):
+        assert client.post("/admin/profile", headers=headers,
+                           params={"requests": requests}).status_code == 400
+    assert client.post("/admin/profile", headers=headers,
+                       params={"requests": 1}).json() == {
+        'remaining': 1, 'profiled': 0}
+    assert client.get("/admin/profile", headers=headers).status_code == 404
+
+    client.post("/generate_conversation", json={**REQUEST, "session_id": "p"})
+    client.post("/generate_conversation", json={**REQUEST, "session_id": "p"})
+
+    response = client.get("/admin/profile", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].startswith("attachment")
+    functions = {name for _, _, name in marshal.loads(response.content)}
+    assert {'serve_exchange', '_send'} <= functions
+    report = client.get("/admin/profile", headers=headers,
+                        params={"text": True}).text
+    assert "generate_conversation" in report
+    assert backend_app.profiler.status() == {'remaining': 0, 'profiled': 1}
+
+
+def test_sampled_sessions_are_logged(client, backend_app, monkeypatch, tmp_path):
+    """
+    Test that the requests of sampled sessions are logged with their shape,
+    timings and tokens, and payloads only when enabled.
+
+    Args:
+        client (TestClient): The backend test client.
+        backend_app (fixture): The backend app module fixture.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+        tmp_path (Path): A temporary directory.
+    """
+    from src.request_log import RequestLog, read_request_log
+
+    path = str(tmp_path / "request_log.jsonl")
+    monkeypatch.setattr(backend_app, "request_log", RequestLog(path))
+    client.post("/generate_conversation",
+                json={**REQUEST, "session_id": "l", "exchange_index": 0})
+    client.post("/reset_conversation", params={"session_id": "l"})
+    client.get("/")
+
+    monkeypatch.setattr(backend_app, "request_log",
+                        RequestLog(path, sample_rate=0))
+    client.post("/generate_conversation", json={**REQUEST, "session_id": "m"})
+    monkeypatch.setattr(backend_app, "request_log",
+                        RequestLog(path, payloads=True))
+    client.post("/generate_summary", json={**REQUEST, "session_id": "l"})
+
+    conversation, reset, summary = read_request_log(path)
+    assert conversation["endpoint"] == "/generate_conversation"
+    assert conversation["status"] == 200 and conversation["session_id"] == "l"
+    assert conversation["shape"]["language"] == "Hindi"
+    assert conversation["shape"]["exchange_index"] == 0
+    assert conversation["timings"]["turn"]["calls"] == 2
+    assert conversation["llm_calls"] == 4
+    assert conversation["tokens"]["prompt_tokens"] == 400
+    assert "payload" not in conversation
+    assert reset["endpoint"] == "/reset_conversation"
+    assert reset["session_id"] == "l" and reset["shape"] == {}
+    assert summary["status"] == 400
+    assert summary["payload"]["role_dict"] == REQUEST["role_dict"]
+
+
+def test_ready_after_warmup(client, backend_app, monkeypatch):
+    """
+    Test that /ready answers 503 until the warm-up is done and then reports
+    its duration.
+
+    Args:
+        client (TestClient): The backend test client.
+        backend_app (fixture): The backend app module fixture.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    from src.warmup import Warmup
+
+    warmup = Warmup([backend_app.LLM_SERVER], mode='connect')
+    monkeypatch.setattr(backend_app, "warmup", warmup)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["state"] == "pending"
+
+    warmup.run()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] and response.json()["primed"] == 1
+    assert "parrot_warmup_seconds" in client.get("/metrics").text
+
+
+def test_fanout_streams_one_session_per_language(client):
+    """
+    Test that a fan-out request streams a session per language and saves
+    them under the given session id.
+
+    Args:
+        client (TestClient): The backend test client.
+    """
+    fanout = {key: value for key, value in REQUEST.items() if key != "language"}
+    response = client.post("/generate_fanout", json={
+        **fanout, "languages": ["Hindi", "German", "French"], "exchanges": 2,
+        "session_id": "f"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(result["language"] for result in results) == [
+        "French", "German", "Hindi"]
+    for result in results:
+        assert "error" not in result
+        assert len(result["exchanges"]) == 2
+        assert result["exchanges"][0]["response1"] == "Mocked LLM response"
+        assert result["session_id"] == f"f-{result['language']}"
+    assert client.post("/generate_summary", json={
+        **REQUEST, "session_id": "f-German"}).status_code == 200
+
+    response = client.post("/generate_fanout",
+                           json={**fanout, "languages": ["Klingon"]})
+    assert response.status_code == 400
+    assert "Klingon" in response.json()["detail"]
+
+
+def test_variants_branch_from_a_session(client, backend_app):
+    """
+    Test that variants branch from a stored session, are saved under their
+    own ids, and leave the session as it is.
+
+    Args:
+        client (TestClient): The backend test client.
+        backend_app (fixture): The backend app module fixture.
+    """
+    client.post("/generate_conversation", json={**REQUEST, "session_id": "v"})
+    response = client.post("/generate_variants", json={
+        **REQUEST, "session_id": "v", "variants": 2, "exchanges": 2})
+    assert response.status_code == 200
+    variants = response.json()["variants"]
+    assert [variant["session_id"] for variant in variants] == ["v-v0", "v-v1"]
+    store = backend_app.session_store
+    assert len(store.load("v", "http://mock").transcript) == 2
+    for variant in variants:
+        assert variant["exchanges"][0]["response1"] == "Mocked LLM response"
+        fork = store.load(variant["session_id"], "http://mock")
+        assert len(fork.transcript) == 2 + 2 * len(variant["exchanges"])
+
+    response = client.post("/generate_variants",
+                           json={**REQUEST, "variants": 20})
+    assert response.status_code == 400
+
+
+def test_retried_exchanges_are_not_generated_again(client, backend_app):
+    """
+    Test that a request retried with the same exchange index gets the same
+    exchange without LLM calls, and that skipping an exchange is refused.
+
+    Args:
+        client (TestClient): The backend test client.
+        backend_app (fixture): The backend app module fixture.
+    """
+    create = sys.modules['src.chatbot'].OpenAI.return_value.chat.completions.create
+    turn = {**REQUEST, "session_id": "i", "exchange_index": 0}
+    first = client.post("/generate_conversation", json=turn)
+    assert first.status_code == 200
+    calls = create.call_count
+    retry = client.post("/generate_conversation", json=turn)
+    assert retry.json() == first.json()
+    assert create.call_count == calls
+    assert sys.modules['src.metrics'].REGISTRY.get_sample_value(
+        'parrot_turn_requests_total', {'outcome': 'stored'}) >= 1
+
+    response = client.post("/generate_conversation",
+                           json={**turn, "exchange_index": 2})
+    assert response.status_code == 409
+
+
+def test_concurrent_turns_overlap(client):
+    """
+    Test that the LLM calls of concurrent turn requests overlap rather than
+    run one at a time on the event loop.
+
+    Args:
+        client (TestClient): The backend test client.
+    """
+    create = sys.modules['src.chatbot'].OpenAI.return_value.chat.completions.create
+    response = create.return_value
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def slow_create(**kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.2)
+        with lock:
+            running[0] -= 1
+        return response
+
+    create.side_effect = slow_create
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        statuses = list(executor.map(
+            lambda session_id: client.post(
+                "/generate_conversation",
+                json={**REQUEST, "session_id": session_id,
+                      "scenario": f"at restaurant {session_id}"}).status_code,
+            ["c1", "c2"]))
+        statuses += list(executor.map(
+            lambda session_id: client.post(
+                "/generate_summary",
+                json={**REQUEST, "session_id": session_id}).status_code,
+            ["c1", "c2"]))
+    assert statuses == [200] * 4
+    assert peak[0] == 2
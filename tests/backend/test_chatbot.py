@@ -3,7 +3,8 @@
 from io import BytesIO
 import pytest
 from unittest import mock
-from backend.src.chatbot import Chatbot, DualChatbot
+from backend.src.chatbot import Chatbot, DualChatbot, ScriptChatbot, parse_script
+from backend.src.chatbot import max_response_tokens
 
 
 @pytest.fixture
@@ -135,3 +136,295 @@ def test_dual_chatbot_step(dual_chatbot):
     response1, response2, translate1, translate2 = dual_chatbot.step()
     assert all(item == "Mocked LLM response" for item in [response1, response2,
                                                           translate1, translate2])
+
+
+def test_parse_script():
+    """
+    Test that parse_script splits tagged lines into turns, merges untagged
+    and repeated lines, and normalizes speaker names.
+    """
+    script = (
+        "Here is the script:\n"
+        "**Customer:** नमस्ते\n"
+        "waitstaff: स्वागत है\n"
+        "आइए बैठिए\n"
+        "Waitstaff: मेनू लीजिए\n"
+        "Customer: धन्यवाद</s>"
+    )
+    turns = parse_script(script, ["Customer", "Waitstaff"])
+    assert turns == [
+        ("Customer", "नमस्ते"),
+        ("Waitstaff", "स्वागत है आइए बैठिए मेनू लीजिए"),
+        ("Customer", "धन्यवाद"),
+    ]
+
+
+def test_script_chatbot_step(mock_llm_server):
+    """
+    Test that ScriptChatbot writes and translates the whole script in two
+    completions and serves it one exchange at a time.
+
+    Args:
+        mock_llm_server (fixture): Mocked LLM server fixture.
+    """
+    completions = [
+        "Customer: A1\nWaitstaff: B1\nCustomer: A2\nWaitstaff: B2",
+        "Customer: a1\nWaitstaff: b1\nCustomer: a2\nWaitstaff: b2",
+    ]
+    responses = []
+    for content in completions:
+        response = mock.MagicMock()
+        response.choices[0].message.content = content
+        responses.append(response)
+
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        create = mock_openai.return_value.chat.completions.create
+        create.side_effect = responses
+        role_dict = {
+            'role1': {'name': 'Customer', 'action': 'ordering food'},
+            'role2': {'name': 'Waitstaff', 'action': 'taking the order'}
+        }
+        script_chatbot = ScriptChatbot(
+            "OpenAI", role_dict, "Hindi", "at a restaurant", "Beginner",
+            "Conversation", "Short", llm_server="http://mock-llm-server"
+        )
+        first = script_chatbot.step()
+        second = script_chatbot.step()
+
+    assert first == ("A1", "B1", "a1", "b1")
+    assert second == ("A2", "B2", "a2", "b2")
+    assert create.call_count == 2
+    assert script_chatbot.transcript.texts() == ["A1", "B1", "A2", "B2"]
+
+
+def test_usage_is_recorded(chatbot):
+    """
+    Test that the token usage reported by the language model is accumulated.
+
+    Args:
+        chatbot (Chatbot): The Chatbot instance to test.
+    """
+    response = chatbot.client.chat.completions.create.return_value
+    response.usage.prompt_tokens = 120
+    response.usage.completion_tokens = 30
+    chatbot.complete([{"role": "user", "content": "Hello"}])
+    chatbot.complete([{"role": "user", "content": "Hello"}])
+    assert chatbot.usage == {
+        'calls': 2, 'prompt_tokens': 240, 'completion_tokens': 60
+    }
+
+
+def test_step_sets_stop_sequences_and_max_tokens(chatbot):
+    """
+    Test that a conversation turn is bounded by the partner's role tag and the
+    proficiency-level token ceiling, and that stops at a stop sequence are
+    recorded apart from natural ends of turn.
+
+    Args:
+        chatbot (Chatbot): The Chatbot instance to test.
+    """
+    role = {'name': 'Customer', 'action': 'ordering food'}
+    oppo_role = {'name': 'Waitstaff', 'action': 'taking the order'}
+    chatbot.instruct(role, oppo_role, "Hindi",
+                     "at a restaurant", "Short", "Beginner", "Conversation")
+    create = chatbot.client.chat.completions.create
+    create.return_value.choices[0].message.content = (
+        "एक चाय, please.\nWaitstaff: ज़रूर!"
+    )
+    create.return_value.choices[0].finish_reason = "stop"
+
+    response = chatbot.generate_response(
+        "Hello", max_tokens=max_response_tokens("Beginner", "Hindi"),
+        stop=chatbot._stop_sequences()
+    )
+
+    kwargs = create.call_args.kwargs
+    assert kwargs['max_tokens'] == max_response_tokens("Beginner", "Hindi")
+    assert "\nWaitstaff:" in kwargs['stop']
+    assert response == "एक चाय, please."
+    assert chatbot.finish_reasons == {'stop_sequence': 1}
+
+    create.return_value.choices[0].message.content = "ज़रूर!"
+    assert chatbot.generate_response("Hello", stop=chatbot._stop_sequences()) \
+        == "ज़रूर!"
+    assert chatbot.finish_reasons == {'stop_sequence': 1, 'stop': 1}
+
+
+def test_max_response_tokens_follow_proficiency_level():
+    """
+    Test that the token ceilings grow with the sentence limit of each level.
+    """
+    ceilings = [max_response_tokens(level)
+                for level in ('Beginner', 'Intermediate', 'Advanced')]
+    assert ceilings == sorted(ceilings)
+    assert max_response_tokens('Beginner', 'Hindi') > ceilings[0]
+
+
+def test_dual_chatbot_ends_on_repetition(dual_chatbot):
+    """
+    Test that a conversation repeating the same lines is marked as ended.
+
+    Args:
+        dual_chatbot (DualChatbot): The DualChatbot instance to test.
+    """
+    dual_chatbot.step()
+    assert not dual_chatbot.ended
+    dual_chatbot.step()
+    assert dual_chatbot.ended
+    assert dual_chatbot.end_reason == 'repetition'
+
+
+def test_dual_chatbot_shares_transcript(dual_chatbot):
+    """
+    Test that both chatbots read one transcript, each seeing its own turns as
+    assistant messages and the partner's turns as user messages.
+
+    Args:
+        dual_chatbot (DualChatbot): The DualChatbot instance to test.
+    """
+    customer = dual_chatbot.chatbots['role1']['chatbot']
+    waitstaff = dual_chatbot.chatbots['role2']['chatbot']
+    assert customer.transcript is waitstaff.transcript is dual_chatbot.transcript
+
+    dual_chatbot.step()
+    waitstaff.client.chat.completions.create.reset_mock()
+    waitstaff.step()
+    create = waitstaff.client.chat.completions.create
+    messages = create.call_args_list[0].kwargs['messages']
+    assert [m['role'] for m in messages] == ['system', 'user', 'assistant']
+
+
+def test_streamed_completion_records_token_timings(chatbot):
+    """
+    Test that a streamed completion is assembled from its chunks, closed at
+    the first stop sequence, and timed per token with the reported usage.
+
+    Args:
+        chatbot (Chatbot): The Chatbot instance to test.
+    """
+    def chunk(text=None, finish_reason=None, usage=None):
+        choices = [mock.Mock(delta=mock.Mock(content=text),
+                             finish_reason=finish_reason)]
+        return mock.Mock(choices=choices if usage is None else [], usage=usage)
+
+    stream = mock.MagicMock()
+    stream.__iter__.return_value = iter(
+        [chunk("Una "), chunk("sopa, "), chunk("por favor."),
+         chunk("\nWaitstaff:"), chunk(" Claro.")])
+    usage = mock.Mock(prompt_tokens=50, completion_tokens=4)
+    stream_with_usage = mock.MagicMock()
+    stream_with_usage.__iter__.return_value = iter(
+        [chunk("Hola"), chunk(" amigo", finish_reason="stop"), chunk(usage=usage)])
+    create = chatbot.client.chat.completions.create
+    create.side_effect = [stream, stream_with_usage]
+    chatbot.stream = True
+
+    with mock.patch('backend.src.chatbot.record_llm_call') as record:
+        assert chatbot.complete([{"role": "user", "content": "Hola"}],
+                                stop=["\nWaitstaff:"]) == "Una sopa, por favor."
+        assert chatbot.complete([{"role": "user", "content": "Hola"}]) == \
+            "Hola amigo"
+
+    assert create.call_args.kwargs['stream'] is True
+    assert create.call_args.kwargs['stream_options'] == {'include_usage': True}
+    stream.close.assert_called_once()
+    assert chatbot.finish_reasons == {'stop_sequence': 1, 'stop': 1}
+    assert chatbot.usage == {'calls': 2, 'prompt_tokens': 50,
+                             'completion_tokens': 4}
+    first, second = (args[0] for args, _ in record.call_args_list)
+    assert first['streamed'] and first['completion_chunks'] == 4
+    assert not first['usage_reported'] and 'completion_tokens' not in first
+    assert first['ttft_ms'] is not None and first['ttft_ms'] <= first['total_ms']
+    assert second['usage_reported'] and second['completion_tokens'] == 4
+
+
+def completion(*contents):
+    """
+    Build a mocked chat completion with one choice per content.
+
+    Args:
+        *contents (str): The contents of the choices.
+
+    Returns:
+        mock.MagicMock: The completion.
+    """
+    response = mock.MagicMock()
+    response.choices = [mock.Mock(message=mock.Mock(content=content),
+                                  finish_reason="stop") for content in contents]
+    return response
+
+
+def test_variants_are_sampled_in_one_call(chatbot):
+    """
+    Test that n variants are requested with the n parameter, and that the
+    variants a server does not return are requested in parallel.
+
+    Args:
+        chatbot (Chatbot): The Chatbot instance to test.
+    """
+    messages = [{"role": "user", "content": "Hola"}]
+    create = chatbot.client.chat.completions.create
+    create.return_value = completion("Uno", "Dos", "Tres")
+    assert chatbot.complete(messages, n=3) == ["Uno", "Dos", "Tres"]
+    assert create.call_count == 1 and create.call_args.kwargs['n'] == 3
+
+    create.reset_mock()
+    create.return_value = completion("Uno")
+    assert chatbot.complete(messages, n=3) == ["Uno"] * 3
+    assert create.call_count == 3
+    assert chatbot.finish_reasons['stop'] == 6
+
+
+def test_dual_chatbot_variants_fork_the_session(dual_chatbot):
+    """
+    Test that variants branch from the session's turns, share them, and
+    continue independently while the session is left as it is.
+
+    Args:
+        dual_chatbot (DualChatbot): The DualChatbot instance to test.
+    """
+    dual_chatbot.step()
+    create = dual_chatbot.chatbots['role1']['chatbot'].client.chat.completions.create
+    create.side_effect = lambda **kwargs: (
+        completion("A", "B") if 'n' in kwargs else completion("Reply"))
+    branches = dual_chatbot.variants(2)
+
+    assert [exchange[0] for _, exchange in branches] == ["A", "B"]
+    assert len(dual_chatbot.transcript) == 2
+    first, second = (fork.transcript for fork, _ in branches)
+    assert first[0] is second[0] is dual_chatbot.transcript[0]
+    assert first.texts()[2:] == ["A", "Reply"]
+    assert second.texts()[2:] == ["B", "Reply"]
+    fork = branches[0][0]
+    assert fork.chatbots['role2']['chatbot'].transcript is first
+    assert fork.current_speaker == 'role1'
+
+
+def test_compact_prompt_profile(dual_chatbot):
+    """
+    Test that the compact profile keeps the roles, the scenario and the
+    language of the full system prompt in fewer words, and is kept with the
+    session state.
+
+    Args:
+        dual_chatbot (DualChatbot): The DualChatbot instance to test.
+    """
+    full = dual_chatbot.chatbots['role2']['chatbot'].prompt
+    with mock.patch('backend.src.chatbot.OpenAI'):
+        compact = DualChatbot(
+            "OpenAI", {'role1': {'name': 'Customer', 'action': 'ordering food'},
+                       'role2': {'name': 'Waitstaff', 'action': 'taking the order'}},
+            "Hindi", "at a restaurant", "Beginner", "Conversation", "Short",
+            llm_server="http://mock-llm-server", prompt_profile='compact'
+        )
+        rebuilt = DualChatbot.from_state(compact.to_state(), "http://mock")
+    prompt = compact.chatbots['role2']['chatbot'].prompt
+    assert len(prompt.split()) < len(full.split()) / 2
+    for text in ("Waitstaff taking the order", "Customer ordering food",
+                 "at a restaurant", "only Hindi", "Reply to Customer"):
+        assert text in prompt
+    assert rebuilt.chatbots['role2']['chatbot'].prompt == prompt
+    with pytest.raises(KeyError):
+        compact.chatbots['role1']['chatbot'].instruct(
+            {'name': 'A'}, {'name': 'B'}, "Hindi", "x", "Short", "Beginner",
+            "Conversation", prompt_profile='tiny')
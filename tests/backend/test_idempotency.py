@@ -0,0 +1,150 @@
+""" Tests for idempotent turn requests. """
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest import mock
+from backend.src.chatbot import DualChatbot
+from backend.src.idempotency import ExchangeConflict, InFlight, serve_exchange_once
+from backend.src.session_store import InMemorySessionStore
+
+
+@pytest.fixture
+def store():
+    """
+    Fixture for a session store holding a new session with OpenAI mocked.
+
+    Yields:
+        InMemorySessionStore: The store, with the session under 's1'.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        create = mock_openai.return_value.chat.completions.create
+        create.side_effect = lambda **kwargs: mock.MagicMock(choices=[
+            mock.Mock(message=mock.Mock(content=f"Turn {create.call_count}"))])
+        store = InMemorySessionStore()
+        store.save('s1', DualChatbot(
+            "OpenAI",
+            {'role1': {'name': 'Customer', 'action': 'ordering food'},
+             'role2': {'name': 'Waitstaff', 'action': 'taking the order'}},
+            "English", "at a restaurant", "Beginner", "Conversation", "Short",
+            llm_server="http://mock-llm-server"
+        ))
+        yield store
+
+
+def serve(store, index, **kwargs):
+    """
+    Serve an exchange of the stored session.
+
+    Args:
+        store (InMemorySessionStore): The session store.
+        index (int): The index of the requested exchange.
+        **kwargs: The other arguments of serve_exchange_once().
+
+    Returns:
+        tuple: The responses and translations of the exchange.
+    """
+    def advance(dual_chatbot):
+        exchange = dual_chatbot.step()
+        store.save('s1', dual_chatbot)
+        return exchange
+
+    return serve_exchange_once(
+        store, 's1', index, lambda: store.load('s1', "http://mock"), advance,
+        **kwargs)[1]
+
+
+def test_retries_get_the_stored_exchange(store):
+    """
+    Test that an exchange is generated once, served again to retries, and
+    that exchanges other than the latest or the next one are refused.
+
+    Args:
+        store (InMemorySessionStore): The session store fixture.
+    """
+    first = serve(store, 0)
+    assert serve(store, 0) == first
+    second = serve(store, 1)
+    assert second != first and serve(store, 1) == second
+    assert store.load('s1', "http://mock").exchange_count == 2
+    for index in (0, 3):
+        with pytest.raises(ExchangeConflict):
+            serve(store, index)
+
+
+def test_other_workers_wait_for_the_claimed_exchange(store):
+    """
+    Test that a request for an exchange claimed by another worker waits for
+    it instead of generating it again.
+
+    Args:
+        store (InMemorySessionStore): The session store fixture.
+    """
+    assert store.claim('s1:0', 60)
+
+    def other_worker():
+        time.sleep(0.05)
+        dual_chatbot = store.load('s1', "http://mock")
+        dual_chatbot.step()
+        store.save('s1', dual_chatbot)
+        store.release('s1:0')
+
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    exchange = serve(store, 0, poll_interval=0.01)
+    thread.join()
+    assert exchange == store.load('s1', "http://mock").last_exchange[1]
+    assert store.load('s1', "http://mock").exchange_count == 1
+
+    assert store.claim('s1:1', 60)
+    with pytest.raises(ExchangeConflict):
+        serve(store, 1, claim_ttl=0.05, poll_interval=0.01)
+
+
+def test_concurrent_requests_attach_to_the_computation_in_flight():
+    """
+    Test that concurrent requests of one key share a single run and its
+    result, while other keys run on their own.
+    """
+    in_flight, calls = InFlight(), []
+
+    def work(key):
+        calls.append(key)
+        time.sleep(0.05)
+        return f"exchange of {key}"
+
+    async def requests():
+        return await asyncio.gather(
+            *(in_flight.run(key, lambda key=key: work(key))
+              for key in ('a', 'a', 'a', 'b')))
+
+    assert asyncio.run(requests()) == [
+        "exchange of a", "exchange of a", "exchange of a", "exchange of b"]
+    assert sorted(calls) == ['a', 'b']
+    assert len(in_flight) == 0
+
+
+def test_cancelled_requests_leave_the_run_in_flight():
+    """
+    Test that a request attached to a run still gets its result when the
+    request that started the run is cancelled, e.g. by a disconnect.
+    """
+    in_flight = InFlight()
+
+    def work():
+        time.sleep(0.1)
+        return "exchange"
+
+    async def requests():
+        first = asyncio.ensure_future(in_flight.run('a', work))
+        await asyncio.sleep(0.02)
+        retry = asyncio.ensure_future(in_flight.run('a', work))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        assert await retry == "exchange"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(requests())
+    assert len(in_flight) == 0
@@ -0,0 +1,92 @@
+""" Tests for the pool of LLM servers. """
+
+import threading
+import time
+import pytest
+from backend.src.llm_pool import LLMPool
+
+
+def test_sessions_stick_to_a_server():
+    """
+    Test that a session id always maps to the same server of the pool.
+    """
+    pool = LLMPool(['http://a', 'http://b', 'http://c'])
+    servers = {pool.server_for(f"session-{i}") for i in range(30)}
+    assert servers == {'http://a', 'http://b', 'http://c'}
+    assert pool.server_for('session-1') == pool.server_for('session-1')
+
+
+def test_work_is_bounded_per_server():
+    """
+    Test that submitted work runs on the least busy server, never more than
+    the concurrency limit at once per server.
+    """
+    pool = LLMPool(['http://a', 'http://b'], concurrency=2)
+    lock = threading.Lock()
+    running, peak, used = {}, {}, []
+
+    def work(server):
+        with lock:
+            running[server] = running.get(server, 0) + 1
+            peak[server] = max(peak.get(server, 0), running[server])
+            used.append(server)
+        time.sleep(0.02)
+        with lock:
+            running[server] -= 1
+        return server
+
+    futures = [pool.submit(work) for _ in range(12)]
+    assert sorted(future.result() for future in futures) == sorted(used)
+    assert peak == {'http://a': 2, 'http://b': 2}
+    assert used.count('http://a') == used.count('http://b') == 6
+    assert pool.in_flight == {'http://a': 0, 'http://b': 0}
+
+
+def test_work_for_a_server_waits_for_its_slots():
+    """
+    Test that work submitted for a server runs on it within its concurrency,
+    counting every slot the work books, while other servers stay free.
+    """
+    pool = LLMPool(['http://a', 'http://b'], concurrency=3)
+    lock = threading.Lock()
+    peak, used = [0], []
+
+    def work(server):
+        with lock:
+            used.append(server)
+            peak[0] = max(peak[0], pool.in_flight[server])
+            assert pool.in_flight['http://b'] == 0
+        time.sleep(0.02)
+        return server
+
+    futures = [pool.submit(work, server='http://a', slots=2) for _ in range(3)]
+    futures += [pool.submit(work, server='http://a') for _ in range(4)]
+    assert {future.result() for future in futures} == {'http://a'}
+    assert used == ['http://a'] * 7 and peak[0] <= 3
+    assert pool.in_flight == {'http://a': 0, 'http://b': 0}
+    with pytest.raises(ValueError):
+        pool.submit(work, server='http://c')
+
+
+def test_work_for_a_busy_server_does_not_hold_up_the_others():
+    """
+    Test that work queued for a server whose slots are all taken does not
+    keep work for another server, or for any server, from running.
+    """
+    pool = LLMPool(['http://a', 'http://b'], concurrency=2)
+    release = threading.Event()
+
+    def blocked(server):
+        release.wait()
+        return server
+
+    queued = [pool.submit(blocked, server='http://a') for _ in range(8)]
+    try:
+        assert pool.submit(lambda server: server,
+                           server='http://b').result(timeout=2) == 'http://b'
+        assert pool.submit(lambda server: server).result(timeout=2) == 'http://b'
+        assert pool.in_flight['http://a'] == 2
+    finally:
+        release.set()
+    assert {future.result() for future in queued} == {'http://a'}
+    assert pool.pending == {'http://a': 0, 'http://b': 0}
@@ -0,0 +1,84 @@
+""" Tests for the Prometheus metrics. """
+
+import os
+import subprocess
+import sys
+from backend.src import metrics
+from backend.src.metrics import (
+    REGISTRY, STAGE_LATENCY, request_timings, set_on_scrape,
+    start_request_timings, timed
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def sample(name, labels=None):
+    """
+    Read a sample of the registry of the backend.
+
+    Args:
+        name (str): The sample name.
+        labels (dict, optional): The labels of the sample.
+
+    Returns:
+        float: The value, 0 if the sample does not exist yet.
+    """
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+def test_timed_records_the_histogram_and_the_breakdown():
+    """
+    Test that every timed block is observed once in the histogram and added
+    to the breakdown of the current request.
+    """
+    name = 'parrot_stage_duration_seconds_count'
+    before = sample(name, {'stage': 'tts'})
+    start_request_timings()
+    for _ in range(3):
+        with timed(STAGE_LATENCY, 'tts'):
+            pass
+    assert sample(name, {'stage': 'tts'}) == before + 3
+    seconds, calls = request_timings()['tts']
+    assert calls == 3 and seconds >= 0
+
+
+def test_scraped_gauges_are_rendered(monkeypatch):
+    """
+    Test that gauges set on scrape are rendered with their current value.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    monkeypatch.setattr(metrics, '_SCRAPED_GAUGES', [])
+    sessions = iter((3, 4))
+    set_on_scrape(metrics.ACTIVE_SESSIONS, lambda: next(sessions))
+    assert b'parrot_active_sessions 3.0' in metrics.render_metrics()
+    assert b'parrot_active_sessions 4.0' in metrics.render_metrics()
+
+
+def test_multiprocess_metrics_aggregate_the_workers(tmp_path):
+    """
+    Test that with PROMETHEUS_MULTIPROC_DIR set, a scrape reports the
+    counters of every worker and the live gauges of running workers only.
+
+    Args:
+        tmp_path (pathlib.Path): A temporary directory.
+    """
+    env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)}
+
+    def worker(code):
+        return subprocess.run(
+            [sys.executable, "-c",
+             "from backend.src.metrics import *\n" + code],
+            cwd=PROJECT_ROOT, env=env, capture_output=True, check=True).stdout
+
+    worker("TURN_REQUESTS.labels('generated').inc(2)\n"
+           "LLM_IN_FLIGHT.inc()\n")
+    worker("TURN_REQUESTS.labels('generated').inc(3)\n"
+           "LLM_IN_FLIGHT.inc()\n"
+           "mark_worker_stopped()\n")
+    text = worker("import sys\n"
+                  "sys.stdout.write(render_metrics().decode())\n").decode()
+    assert 'parrot_turn_requests_total{outcome="generated"} 5.0' in text
+    assert 'parrot_llm_requests_in_flight 1.0' in text
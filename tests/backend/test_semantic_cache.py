@@ -0,0 +1,202 @@
+""" Tests for the semantic cache of opening exchanges and scripts. """
+
+import sys
+import types
+import numpy as np
+import pytest
+from unittest import mock
+from backend.src.chatbot import DualChatbot, ScriptChatbot
+from backend.src.semantic_cache import (
+    HashingEmbedder, SemanticCache, SentenceEmbedder, cached_step, create_embedder
+)
+
+ROLES = "Customer ordering food / Waitstaff taking the order"
+PARTITION = ('Hindi', 'Beginner', 'Conversation', 'Short', 'Dialogue')
+
+
+class Clock:
+    """A clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_embedder_matches_rewordings_only():
+    """
+    Test that small rewordings of a scenario embed alike and other
+    scenarios do not.
+    """
+    embed = HashingEmbedder()
+    assert embed("at a restaurant") @ embed("In a restaurant!") > 0.99
+    assert embed("at a restaurant") @ embed("at the restaurant") > 0.85
+    assert embed("at a restaurant") @ embed("at the airport") < 0.3
+
+
+@pytest.mark.parametrize('scenario, other, hit', [
+    ("at a restaurant", "In a restaurant!", True),
+    ("at a restaurant", "at the restaurant", True),
+    ("ordering food at a restaurant", "ordering food in a restaurant", True),
+    ("at the train station", "in the train station", True),
+    (ROLES, "Customer ordering some food / Waitstaff taking the orders", True),
+    ("at a restaurant", "at a resturant", False),
+    ("at a restaurant", "at a diner", False),
+    ("buying groceries", "shopping for food", False),
+    ("Doctor / Patient", "Physician / Patient", False),
+    ("at the airport", "at the train station", False),
+])
+def test_hashing_threshold_on_paraphrases(scenario, other, hit):
+    """
+    Test which paraphrases hit at the default threshold of hashing: rewordings
+    do, while typos and synonyms miss, as matches are lexical.
+
+    Args:
+        scenario (str): The cached text.
+        other (str): The looked up text.
+        hit (bool): Whether the lookup is a hit.
+    """
+    embed = HashingEmbedder()
+    assert (embed(scenario) @ embed(other) >= HashingEmbedder.threshold) == hit
+
+
+def test_sentence_embedder_falls_back_to_hashing(monkeypatch):
+    """
+    Test that a sentence-embedding model is used when sentence-transformers
+    is installed, and hashing when it is not.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    assert isinstance(create_embedder(), HashingEmbedder)
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', None)
+    with pytest.warns(UserWarning, match="falls back to hashing"):
+        assert isinstance(create_embedder('default'), HashingEmbedder)
+
+    synonyms = {"at a restaurant": [1.0, 0.0], "at a diner": [0.96, 0.28]}
+    model = mock.MagicMock()
+    model.get_sentence_embedding_dimension.return_value = 2
+    model.encode.side_effect = lambda text, normalize_embeddings: np.array(
+        synonyms[text])
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', types.SimpleNamespace(
+        SentenceTransformer=lambda name: model))
+    embed = create_embedder('default')
+    assert isinstance(embed, SentenceEmbedder)
+    cache = SemanticCache(embed=embed)
+    assert cache.threshold == SentenceEmbedder.threshold
+    cache.put('opening', PARTITION, ("at a restaurant",), 'cached')
+    assert cache.get('opening', PARTITION, ("at a diner",)) == 'cached'
+
+
+def test_lookups_match_within_a_partition():
+    """
+    Test that hits need similar roles and scenario and the same settings.
+    """
+    cache = SemanticCache()
+    cache.put('opening', PARTITION, (ROLES, "at a restaurant"), 'cached')
+
+    assert cache.get('opening', PARTITION, (ROLES, "in a restaurant")) == 'cached'
+    assert cache.get('opening', PARTITION, (ROLES, "at the airport")) is None
+    assert cache.get('opening', PARTITION,
+                     ("Tourist asking the way / Local giving directions",
+                      "at a restaurant")) is None
+    assert cache.get('opening', ('French',) + PARTITION[1:],
+                     (ROLES, "at a restaurant")) is None
+    assert cache.get('script', PARTITION, (ROLES, "at a restaurant")) is None
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 4,
+                             'hit_rate': 0.2, 'evictions': 0}
+
+
+def test_eviction_policies_and_ttl():
+    """
+    Test that a full cache evicts the least recently or the least frequently
+    used entry, and that expired entries are not served.
+    """
+    for eviction, evicted in (('lru', 'at the airport'),
+                              ('lfu', 'at the bakery')):
+        clock = Clock()
+        cache = SemanticCache(max_entries=2, eviction=eviction, clock=clock)
+        cache.put('opening', PARTITION, (ROLES, "at the airport"), 1)
+        cache.get('opening', PARTITION, (ROLES, "at the airport"))
+        clock.now = 1
+        cache.put('opening', PARTITION, (ROLES, "at the bakery"), 2)
+        cache.put('opening', PARTITION, (ROLES, "at the museum"), 3)
+        assert len(cache) == 2 and cache.evictions == 1
+        assert cache.get('opening', PARTITION, (ROLES, evicted)) is None
+
+    cache = SemanticCache(ttl=10, clock=clock)
+    cache.put('opening', PARTITION, (ROLES, "at the airport"), 1)
+    clock.now = 20
+    assert cache.get('opening', PARTITION, (ROLES, "at the airport")) is None
+    assert len(cache) == 0 and cache.evictions == 1
+
+
+def make_session(cls, scenario, create):
+    """
+    Create a session whose LLM calls go to a mock.
+
+    Args:
+        cls (type): DualChatbot or ScriptChatbot.
+        scenario (str): The scenario.
+        create (mock.Mock): The mocked chat completions.
+
+    Returns:
+        DualChatbot: The session.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        mock_openai.return_value.chat.completions.create = create
+        return cls("OpenAI", {
+            'role1': {'name': 'Customer', 'action': 'ordering food'},
+            'role2': {'name': 'Waitstaff', 'action': 'taking the order'}
+        }, "Hindi", scenario, "Beginner", "Conversation", "Short",
+            llm_server="http://mock-llm-server")
+
+
+def test_similar_dialogues_share_the_opening_exchange(mock_llm_server):
+    """
+    Test that a new dialogue similar to a cached one is served its opening
+    exchange without LLM calls and continues with the LLM.
+
+    Args:
+        mock_llm_server (fixture): Mocked LLM server fixture.
+    """
+    create = mock.MagicMock()
+    create.return_value.choices[0].message.content = "Namaste"
+    cache = SemanticCache()
+    first = make_session(DualChatbot, "at a restaurant", create)
+    opening = cached_step(cache, first)
+    calls = create.call_count
+    assert calls > 0
+
+    second = make_session(DualChatbot, "in a restaurant", create)
+    assert cached_step(cache, second) == opening
+    assert create.call_count == calls
+    assert second.transcript.texts() == first.transcript.texts()
+    cached_step(cache, second)
+    assert create.call_count > calls
+    assert len(cache) == 1
+
+
+def test_similar_scripts_share_the_script(mock_llm_server):
+    """
+    Test that a new script session similar to a cached one is served the
+    whole cached script.
+
+    Args:
+        mock_llm_server (fixture): Mocked LLM server fixture.
+    """
+    responses = []
+    for content in ("Customer: A1\nWaitstaff: B1\nCustomer: A2\nWaitstaff: B2",
+                    "Customer: a1\nWaitstaff: b1\nCustomer: a2\nWaitstaff: b2"):
+        response = mock.MagicMock()
+        response.choices[0].message.content = content
+        responses.append(response)
+    create = mock.MagicMock(side_effect=responses)
+    cache = SemanticCache()
+    cached_step(cache, make_session(ScriptChatbot, "at a restaurant", create))
+
+    second = make_session(ScriptChatbot, "at the restaurant", create)
+    assert cached_step(cache, second) == ("A1", "B1", "a1", "b1")
+    assert cached_step(cache, second) == ("A2", "B2", "a2", "b2")
+    assert create.call_count == 2
@@ -0,0 +1,207 @@
+""" Tests for the session stores. """
+
+import socketserver
+import threading
+import pytest
+from unittest import mock
+from backend.src.chatbot import DualChatbot, ScriptChatbot
+from backend.src.session_store import (
+    InMemorySessionStore, RedisSessionStore, SQLiteSessionStore,
+    create_session_store, decode_state, encode_state
+)
+
+
+class RespStandInHandler(socketserver.StreamRequestHandler):
+    """
+    A minimal Redis-protocol server handling the commands used by the store.
+    """
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            if command == b'GET':
+                reply = self._bulk(data.get(args[1]))
+            elif command == b'SET':
+                if b'NX' in args[3:] and args[1] in data:
+                    reply = self._bulk(None)
+                else:
+                    data[args[1]] = args[2]
+                    reply = b'+OK\r\n'
+            elif command == b'DEL':
+                reply = b':%d\r\n' % int(data.pop(args[1], None) is not None)
+            elif command == b'SCAN':
+                prefix = args[3].rstrip(b'*')
+                keys = [key for key in data if key.startswith(prefix)]
+                reply = b'*2\r\n' + self._bulk(b'0') + b'*%d\r\n' % len(keys)
+                reply += b''.join(self._bulk(key) for key in keys)
+            elif command == b'SELECT':
+                reply = b'+OK\r\n'
+            else:
+                reply = b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def resp_server():
+    """
+    Fixture for running a Redis-protocol stand-in on a free local port.
+
+    Yields:
+        socketserver.ThreadingTCPServer: The running server.
+    """
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), RespStandInHandler)
+    server.daemon_threads = True
+    server.data = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _make_session(chatbot_cls=DualChatbot):
+    """
+    Create a session with two exchanges against a mocked language model.
+
+    Args:
+        chatbot_cls (type): The DualChatbot class to instantiate.
+
+    Returns:
+        DualChatbot: The session.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        (mock_openai.return_value.chat.completions.create
+         .return_value.choices[0].message.content) = "Customer: नमस्ते\nWaitstaff: जी"
+        session = chatbot_cls(
+            "OpenAI",
+            {'role1': {'name': 'Customer', 'action': 'ordering food'},
+             'role2': {'name': 'Waitstaff', 'action': 'taking the order'}},
+            "Hindi", "at a restaurant", "Beginner", "Conversation", "Short",
+            llm_server="http://mock-llm-server"
+        )
+        session.step()
+    return session
+
+
+def test_state_round_trip():
+    """
+    Test that a session survives serialization with its transcript, speaker
+    and pending script exchanges.
+    """
+    for chatbot_cls in (DualChatbot, ScriptChatbot):
+        session = _make_session(chatbot_cls)
+        data = encode_state(session.to_state())
+        assert b'\n' not in data and b', ' not in data
+
+        sqlite_store = SQLiteSessionStore(':memory:')
+        sqlite_store._set('s1', data)
+        with mock.patch('backend.src.chatbot.OpenAI'):
+            loaded = sqlite_store.load('s1', "http://mock-llm-server")
+        assert type(loaded) is chatbot_cls
+        assert loaded.transcript.texts() == session.transcript.texts()
+        assert [t.speaker for t in loaded.transcript] == ['Customer', 'Waitstaff']
+        assert loaded.to_state() == decode_state(data)
+
+        # The in-process store keeps the live object
+        memory_store = InMemorySessionStore()
+        memory_store.save('s1', session)
+        assert memory_store.load('s1', "http://mock-llm-server") is session
+
+
+def test_sqlite_store(tmp_path):
+    """
+    Test that the SQLite store runs in WAL mode and shares sessions between
+    store instances, as separate workers would.
+
+    Args:
+        tmp_path (pathlib.Path): Temporary directory fixture.
+    """
+    url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    worker1 = create_session_store(url)
+    worker2 = create_session_store(url)
+    assert worker1._connection().execute(
+        "PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    worker1.save('s1', _make_session())
+    with mock.patch('backend.src.chatbot.OpenAI'):
+        loaded = worker2.load('s1', "http://mock-llm-server")
+    assert len(loaded.transcript) == 2
+    assert worker2.count() == 1
+    worker2.delete('s1')
+    assert worker1.load('s1', "http://mock-llm-server") is None
+
+
+def test_redis_store(resp_server):
+    """
+    Test the Redis-protocol store against a local stand-in server.
+
+    Args:
+        resp_server (fixture): The Redis-protocol stand-in.
+    """
+    host, port = resp_server.server_address
+    store = create_session_store(f"redis://{host}:{port}/0")
+    assert isinstance(store, RedisSessionStore)
+
+    store.save('s1', _make_session())
+    assert list(resp_server.data) == [b'parrot-ai:session:s1']
+    with mock.patch('backend.src.chatbot.OpenAI'):
+        loaded = store.load('s1', "http://mock-llm-server")
+    assert len(loaded.transcript) == 2
+    assert store.count() == 1
+    store.delete('s1')
+    assert store.load('s1', "http://mock-llm-server") is None
+    assert store.count() == 0
+
+
+def test_claims_are_exclusive(tmp_path, resp_server):
+    """
+    Test that a claim is held by one worker until it is released or expires,
+    in every store.
+
+    Args:
+        tmp_path (pathlib.Path): Temporary directory fixture.
+        resp_server (fixture): The Redis-protocol stand-in.
+    """
+    host, port = resp_server.server_address
+    sqlite_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    memory_store = InMemorySessionStore()
+    for worker1, worker2 in (
+        (memory_store, memory_store),
+        (create_session_store(sqlite_url), create_session_store(sqlite_url)),
+        (create_session_store(f"redis://{host}:{port}/0"),
+         create_session_store(f"redis://{host}:{port}/0"))
+    ):
+        assert worker1.claim('s1:0', 60)
+        assert not worker2.claim('s1:0', 60)
+        assert worker2.claim('s1:1', 60)
+        worker1.release('s1:0')
+        assert worker2.claim('s1:0', 60)
+        assert worker2.count() == 0
+    assert memory_store.claim('s2:0', 0) and memory_store.claim('s2:0', 60)
+
+
+def test_unsupported_store():
+    """
+    Test that an unknown store URL is rejected.
+    """
+    with pytest.raises(KeyError):
+        create_session_store("mongodb://localhost")
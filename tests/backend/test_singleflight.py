@@ -0,0 +1,102 @@
+""" Tests for the coalescing of identical calls in flight. """
+
+import threading
+import time
+import pytest
+from unittest import mock
+from backend.src.chatbot import Chatbot, run_in_parallel
+from backend.src.metrics import REGISTRY, request_llm_calls, start_request_timings
+from backend.src.singleflight import SingleFlight
+
+
+def test_identical_calls_in_flight_share_one_call():
+    """
+    Test that callers of a key in flight share its result or exception, and
+    that nothing is kept once the call returns.
+    """
+    flight = SingleFlight()
+    calls, started = [], threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return len(calls)
+
+    def call(index):
+        if index:
+            started.wait()
+        return flight.do('key', slow)
+
+    assert sorted(run_in_parallel(call, range(4))) == [
+        (1, False), (1, True), (1, True), (1, True)]
+    assert len(flight) == 0
+    assert flight.do('key', slow) == (2, False)
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("LLM server down")
+
+    started.clear()
+
+    def call_failing(index):
+        if index:
+            started.wait()
+        with pytest.raises(RuntimeError):
+            flight.do('other', failing)
+
+    run_in_parallel(call_failing, range(3))
+    assert len(flight) == 0
+
+
+def test_chatbots_coalesce_identical_completions():
+    """
+    Test that coalescing is opt-in, and that once enabled, chatbots sending
+    the same completion at the same time share one LLM call, recorded as
+    coalesced without tokens, while different completions and those of
+    another server are sent separately.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        create = mock_openai.return_value.chat.completions.create
+
+        def respond(**kwargs):
+            time.sleep(0.1)
+            response = mock.MagicMock()
+            response.choices[0].message.content = kwargs['messages'][0]['content']
+            response.usage.prompt_tokens = 100
+            response.usage.completion_tokens = 10
+            return response
+
+        create.side_effect = respond
+        chatbots = [Chatbot("OpenAI", "http://llm-a") for _ in range(3)]
+        chatbots.append(Chatbot("OpenAI", "http://llm-b"))
+    assert not any(chatbot.coalesce for chatbot in chatbots)
+    for chatbot in chatbots:
+        chatbot.coalesce = True
+
+    def coalesced():
+        return REGISTRY.get_sample_value('parrot_llm_coalesced_total',
+                                         {'purpose': 'turn'}) or 0
+
+    before = coalesced()
+
+    def opening(chatbot):
+        start_request_timings()
+        content = chatbot.complete([{"role": "system", "content": "Hola"}],
+                                   max_tokens=20)
+        return content, request_llm_calls()
+
+    results = run_in_parallel(opening, chatbots)
+    assert [content for content, _ in results] == ["Hola"] * 4
+    assert create.call_count == 2
+    assert coalesced() == before + 2
+    shared = [calls[0] for _, calls in results if calls[0].get('coalesced')]
+    assert len(shared) == 2 and all('prompt_tokens' not in call
+                                    for call in shared)
+    assert sum(chatbot.usage['calls'] for chatbot in chatbots) == 2
+
+    create.reset_mock()
+    run_in_parallel(lambda content: chatbots[0].complete(
+        [{"role": "system", "content": content}]), ["Uno", "Dos"])
+    assert create.call_count == 2
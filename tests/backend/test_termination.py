@@ -0,0 +1,58 @@
+""" Tests for the conversation end detection. """
+
+from backend.src.termination import (
+    _words, detect_conversation_end, is_farewell, is_repetition
+)
+
+
+def test_is_farewell():
+    """
+    Test that farewell phrases are recognized per language and only as whole
+    words.
+    """
+    assert is_farewell("Merci, au revoir !", "French")
+    assert is_farewell("Vielen Dank, tschüss!", "German")
+    assert is_farewell("धन्यवाद, अलविदा!", "Hindi")
+    assert not is_farewell("Maybe I will buy a cake.", "English")
+    assert not is_farewell("¡Hola! ¿Qué desea?", "Spanish")
+
+
+def test_is_repetition():
+    """
+    Test that a turn repeating an earlier one is detected.
+    """
+    earlier = ["Would you like something to drink?", "Yes, a coffee please."]
+    assert is_repetition("Would you like something to drink?", earlier)
+    assert not is_repetition("Here is your bill.", earlier)
+    assert not is_repetition("...", earlier)
+
+
+def test_words_keep_their_combining_marks():
+    """
+    Test that Devanagari words keep their vowel signs, so Hindi turns are
+    compared word by word rather than letter by letter.
+    """
+    assert _words("क्या आप कुछ पीना चाहेंगे?") == {
+        'क्या', 'आप', 'कुछ', 'पीना', 'चाहेंगे'}
+    earlier = ["क्या आप कुछ पीना चाहेंगे?"]
+    assert is_repetition("क्या आप कुछ पीना चाहेंगे?", earlier)
+    assert not is_repetition("क्या आप कुछ खाना चाहते हैं?", earlier)
+
+
+def test_detect_conversation_end():
+    """
+    Test that a conversation ends on a mutual goodbye or repeated filler, but
+    never before the minimum number of exchanges.
+    """
+    opening = ["Hello, a table for two please.", "Of course, follow me."]
+    goodbye = ["Thank you, goodbye!", "Bye, have a nice day!"]
+    assert detect_conversation_end(goodbye, "English") is None
+    assert detect_conversation_end(opening + goodbye, "English") == 'farewell'
+    assert detect_conversation_end(opening + opening, "English") == 'repetition'
+    assert detect_conversation_end(opening + ["", "..."], "English") == 'empty'
+    assert detect_conversation_end(
+        opening + [opening[0], ""], "English") is None
+    assert detect_conversation_end(
+        opening + ["What do you recommend?", "The soup is excellent."],
+        "English"
+    ) is None
@@ -0,0 +1,58 @@
+""" Tests for the shared conversation transcript. """
+
+from backend.src.transcript import Transcript
+
+
+def test_transcript_interns_speakers():
+    """
+    Test that turns of the same speaker share one interned name.
+    """
+    transcript = Transcript()
+    first = transcript.append("".join(["Cust", "omer"]), "Hello")
+    second = transcript.append("".join(["Custo", "mer"]), "A coffee, please")
+    assert first.speaker is second.speaker
+    assert len(transcript) == 2
+
+
+def test_view_messages_are_role_relative():
+    """
+    Test that each speaker sees its own turns as assistant messages.
+    """
+    transcript = Transcript()
+    transcript.append("Customer", "Hello")
+    transcript.append("Waitstaff", "Welcome")
+    assert [m['role'] for m in transcript.view("Customer").messages(100)] == [
+        'assistant', 'user'
+    ]
+    assert [m['role'] for m in transcript.view("Waitstaff").messages(100)] == [
+        'user', 'assistant'
+    ]
+
+
+def test_view_messages_respect_token_budget():
+    """
+    Test that the context window keeps the most recent turns within budget,
+    oldest first.
+    """
+    transcript = Transcript()
+    for text in ["one two three", "four five", "six", "seven eight"]:
+        transcript.append("Customer", text)
+    messages = transcript.view("Waitstaff").messages(4)
+    assert [m['content'] for m in messages] == ["six", "seven eight"]
+    assert transcript.view("Waitstaff").messages(0) == []
+    assert len(transcript.view("Waitstaff").messages(100)) == 4
+
+
+def test_forks_share_their_common_prefix():
+    """
+    Test that forks share the turns before the fork and diverge after it.
+    """
+    transcript = Transcript()
+    transcript.append("Customer", "Hello")
+    first, second = transcript.fork(), transcript.fork()
+    first.append("Waitstaff", "Welcome")
+    second.append("Waitstaff", "Good evening, how many are you?")
+    assert first[0] is second[0] is transcript[0]
+    assert len(transcript) == 1
+    assert first.texts() == ["Hello", "Welcome"]
+    assert second.view("Customer").messages(100)[-1]['content'].startswith("Good")
@@ -0,0 +1,92 @@
+""" Tests for the startup warm-up. """
+
+import threading
+from unittest import mock
+from backend.src.chatbot import OPENING_INPUT
+from backend.src.warmup import Warmup, warmup_chatbots
+
+
+def test_warmup_primes_one_system_prompt_per_slot():
+    """
+    Test that the warm-up sends as many system prompts as each server has
+    slots, from the defaults of the frontend on, generating one token each.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value.choices[0].message.content = "Hi"
+        warmup = Warmup(['http://llm-a', 'http://llm-b'], slots=3)
+        warmup.run()
+
+    assert warmup.ready and warmup.seconds is not None
+    assert warmup.prompts == warmup.primed == 2 * 3
+    assert warmup.failed == 0
+    assert create.call_count == warmup.prompts
+    prompts = [call.kwargs['messages'][0]['content']
+               for call in create.call_args_list]
+    assert len(set(prompts)) == 3
+    assert all(call.kwargs['max_tokens'] == 1
+               for call in create.call_args_list)
+    first = create.call_args_list[0].kwargs['messages']
+    assert first[-1] == {'role': 'user', 'content': OPENING_INPUT}
+    assert 'English' in prompts[0] and 'Beginner' in prompts[0]
+
+
+def test_workers_warm_up_each_server_once(tmp_path):
+    """
+    Test that workers sharing a lock directory warm up each server once, and
+    that all of them report ready.
+
+    Args:
+        tmp_path (pathlib.Path): The shared lock directory.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value.choices[0].message.content = "Hi"
+        workers = [Warmup(['http://llm-a', 'http://llm-b'], slots=2,
+                          lock_dir=str(tmp_path)) for _ in range(4)]
+        threads = [threading.Thread(target=worker.run) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert all(worker.ready for worker in workers)
+    assert create.call_count == 2 * 2
+    assert sum(worker.primed for worker in workers) == 2 * 2
+    assert sum(worker.shared for worker in workers) == 3 * 2
+
+
+def test_warmup_waits_for_the_llm_server():
+    """
+    Test that the warm-up retries until the LLM server answers, and that the
+    'connect' mode stops there.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI') as mock_openai:
+        response = mock.MagicMock()
+        response.choices[0].message.content = "Hi"
+        create = mock_openai.return_value.chat.completions.create
+        create.side_effect = [ConnectionError("refused"),
+                              ConnectionError("refused"), response]
+        warmup = Warmup(['http://llm'], mode='connect', retry_interval=0)
+        assert not warmup.ready
+        warmup.run()
+
+    assert warmup.status() == {
+        'ready': True, 'state': 'ready', 'mode': 'connect', 'prompts': 1,
+        'primed': 1, 'failed': 0, 'shared': 0, 'seconds': warmup.seconds,
+        'error': 'refused'}
+    assert create.call_count == 3
+
+
+def test_warmup_chatbots_pair_starters_with_the_opening():
+    """
+    Test that only the starting chatbot of a session is primed with the
+    opening input.
+    """
+    with mock.patch('backend.src.chatbot.OpenAI'):
+        pairs = warmup_chatbots('OpenAI', 'http://llm', languages=('German',),
+                                proficiency_levels=('Beginner',))
+    assert [input_text for _, input_text in pairs] == [
+        OPENING_INPUT, None, OPENING_INPUT, None]
+    assert pairs[2][0].learning_mode == 'Debate'
+    assert 'German' in pairs[0][0].prompt
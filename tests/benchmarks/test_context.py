@@ -0,0 +1,41 @@
+""" Tests for the context-length scaling benchmark. """
+
+import random
+from benchmarks.context import SENTENCES, run_case, synthetic_history
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+
+def test_synthetic_history_has_the_requested_length():
+    """
+    Test that histories reach the requested length in every language and
+    end with the second speaker, so the first speaks next.
+    """
+    for language in SENTENCES:
+        turns = synthetic_history(language, 300, ('A', 'B'), random.Random(0))
+        assert sum(len(text.split()) for _, text in turns) >= 300
+        assert [speaker for speaker, _ in turns[:2]] == ['A', 'B']
+        assert turns[-1][0] == 'B'
+    assert synthetic_history('Spanish', 0, ('A', 'B'), random.Random(0)) == []
+
+
+def test_warm_turns_hit_the_prompt_cache():
+    """
+    Test that the first turn of each role is cold and the later turns of a
+    role, extending its cached prompt, skip its prefill, and that a trimmed
+    history, whose window slides every turn, does not.
+    """
+    server = FakeLLMServer(config=FakeLLMConfig(
+        latency=0, tokens_per_second=1e6, seed=0, prompt_cache_slots=4)).start()
+    try:
+        short = run_case('German', 300, server.url, exchanges=2)
+        trimmed = run_case('German', 5000, server.url, exchanges=2)
+    finally:
+        server.stop()
+
+    assert [(turn['role'], turn['cold']) for turn in short['turns']] == [
+        ('role1', True), ('role2', True), ('role1', False), ('role2', False)]
+    assert short['cold_cached_tokens'] < short['prompt_tokens'] / 2
+    assert all(turn['cached_tokens'] > short['prompt_tokens'] / 2
+               for turn in short['turns'][2:])
+    assert trimmed['trimmed'] and not short['trimmed']
+    assert trimmed['warm_cached_tokens'] < trimmed['prompt_tokens'] / 2
@@ -0,0 +1,39 @@
+""" Tests for the end-to-end throughput benchmark. """
+
+from benchmarks.e2e import run_level, scaling_failures
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import PAYLOAD, run_backend
+
+
+def level(concurrency, throughput):
+    """Build a level summary."""
+    return {'concurrency': concurrency, 'throughput': throughput}
+
+
+def test_scaling_failures():
+    """
+    Test that levels falling short of the share of linear scaling are
+    reported, such as a backend serving one request at a time.
+    """
+    assert scaling_failures([level(1, 2.5), level(2, 4.6), level(4, 8.0),
+                             level(8, 10.3)]) == []
+    assert scaling_failures([level(1, 2.5), level(2, 2.5), level(4, 2.5),
+                             level(8, 2.5)]) == [2, 4, 8]
+
+
+def test_throughput_scales_with_concurrency():
+    """
+    Test that concurrent clients are served concurrently by the backend
+    against the fake LLM server.
+    """
+    llm = FakeLLMServer(config=FakeLLMConfig(
+        latency=0.05, tokens_per_second=1000.0, completion_tokens=10,
+        seed=0)).start()
+    try:
+        with run_backend(llm.url) as url:
+            levels = [run_level(url, concurrency, 2, 2, PAYLOAD)
+                      for concurrency in (1, 4)]
+    finally:
+        llm.stop()
+    assert all(item['errors'] == 0 for item in levels)
+    assert scaling_failures(levels) == []
@@ -0,0 +1,124 @@
+""" Tests for the fake LLM server and the benchmark helpers. """
+
+import pytest
+from openai import OpenAI
+from backend.src.chatbot import Chatbot, DualChatbot, ScriptChatbot
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import compare, parse_server_timing, percentile
+
+
+@pytest.fixture
+def fake_llm():
+    """
+    Fixture for running the fake LLM server without delays.
+
+    Yields:
+        FakeLLMServer: The running server.
+    """
+    server = FakeLLMServer(config=FakeLLMConfig(
+        latency=0, tokens_per_second=1e6, seed=0)).start()
+    yield server
+    server.stop()
+
+
+def _role_dict():
+    return {'role1': {'name': 'Customer', 'action': 'ordering food'},
+            'role2': {'name': 'Waitstaff', 'action': 'taking the order'}}
+
+
+def test_fake_llm_serves_the_chatbots(fake_llm):
+    """
+    Test that both generation modes run against the fake server, including
+    the script and its one-shot translation.
+
+    Args:
+        fake_llm (FakeLLMServer): The fake LLM server.
+    """
+    for chatbot_cls in (DualChatbot, ScriptChatbot):
+        session = chatbot_cls("OpenAI", _role_dict(), "Spanish",
+                              "at a restaurant", "Beginner", "Conversation",
+                              "Short", llm_server=fake_llm.url)
+        response1, response2, translate1, translate2 = session.step()
+        assert response1 and response2 and translate1 and translate2
+        assert len(session.transcript) == 2
+    # One turn, one translation each, then a script and its translation
+    assert fake_llm.stats['requests'] == 6
+    assert fake_llm.stats['failures'] == 0
+
+
+def test_fake_llm_streams_with_usage(fake_llm):
+    """
+    Test that streamed completions arrive token by token, with the usage in
+    a final chunk when requested.
+
+    Args:
+        fake_llm (FakeLLMServer): The fake LLM server.
+    """
+    client = OpenAI(base_url=f"{fake_llm.url}/v1", api_key="sk-no-key-required")
+    stream = client.chat.completions.create(
+        model="LLaMA_CPP", messages=[{"role": "user", "content": "Hola"}],
+        max_tokens=5, stream=True, stream_options={"include_usage": True})
+    chunks = list(stream)
+    content = ''.join(chunk.choices[0].delta.content or ''
+                      for chunk in chunks if chunk.choices)
+    assert len(content.split()) == 5
+    assert chunks[-1].usage.completion_tokens == 5
+
+
+def test_stop_sequences_cut_by_the_server_are_counted(fake_llm):
+    """
+    Test that a completion the server cut at a stop sequence, leaving the
+    sequence out, is counted as 'stop_sequence' rather than a natural end of
+    turn, streamed or not.
+
+    Args:
+        fake_llm (FakeLLMServer): The fake LLM server.
+    """
+    messages = [{"role": "system", "content": (
+        "Write exactly 2 exchanges, one line by Customer followed by one line "
+        "by Waitstaff.")}]
+    for stream in (False, True):
+        chatbot = Chatbot("OpenAI", fake_llm.url)
+        chatbot.stream = stream
+        content = chatbot.complete(messages, stop=["\nWaitstaff:"])
+        assert content.startswith("Customer:") and "Waitstaff" not in content
+        assert chatbot.finish_reasons == {'stop_sequence': 1}
+
+        chatbot.complete(messages, stop=["\nChef:"])
+        assert chatbot.finish_reasons == {'stop_sequence': 1, 'stop': 1}
+
+
+def test_fake_llm_injects_failures():
+    """
+    Test that the configured failure rate is answered with HTTP 500.
+    """
+    server = FakeLLMServer(config=FakeLLMConfig(
+        latency=0, failure_rate=1.0)).start()
+    try:
+        client = OpenAI(base_url=f"{server.url}/v1",
+                        api_key="sk-no-key-required", max_retries=0)
+        with pytest.raises(Exception):
+            client.chat.completions.create(
+                model="LLaMA_CPP", messages=[{"role": "user", "content": "Hola"}])
+    finally:
+        server.stop()
+    assert server.stats['failures'] == 1
+
+
+def test_benchmark_helpers():
+    """
+    Test the percentile, Server-Timing parsing and baseline comparison.
+    """
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+    timings = parse_server_timing(
+        'turn;dur=120.5;desc="2 call(s)", total;dur=130.0')
+    assert timings == {'turn': 120.5, 'total': 130.0}
+
+    comparisons = compare({'throughput': (8.0, True), 'p95': (130.0, False)},
+                          {'throughput': (10.0, True), 'p95': (100.0, False)},
+                          threshold=0.1)
+    assert [item['regression'] for item in comparisons] == [True, True]
@@ -0,0 +1,38 @@
+""" Tests for the latency histogram of the load generator. """
+
+import random
+from benchmarks.histogram import LatencyHistogram, bucket_bounds, bucket_index
+
+
+def test_buckets_cover_values_within_one_percent():
+    """
+    Test that every value falls into its bucket and that buckets are at
+    most 1% wide relative to their values.
+    """
+    rng = random.Random(0)
+    values = list(range(2000)) + [rng.randrange(10 ** 9) for _ in range(2000)]
+    for value in values:
+        low, high = bucket_bounds(bucket_index(value))
+        assert low <= value <= high
+        assert high - low < max(value, 1) * 0.01
+
+
+def test_percentiles_and_merge():
+    """
+    Test the percentiles against exact values and the merge of two
+    histograms.
+    """
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for value in range(1, 501):
+        first.record(float(value))
+    for value in range(501, 1001):
+        second.record(float(value))
+    first.merge(second)
+
+    summary = first.summary()
+    assert summary['count'] == 1000
+    assert summary['min'] == 1.0 and summary['max'] == 1000.0
+    assert abs(summary['p50'] - 500) <= 5
+    assert abs(summary['p99'] - 990) <= 10
+    assert summary['p99.9'] <= summary['max']
+    assert LatencyHistogram().percentile(50) is None
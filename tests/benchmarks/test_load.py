@@ -0,0 +1,54 @@
+""" Tests for the open-loop load generator. """
+
+import asyncio
+import random
+import statistics
+import httpx
+from benchmarks.load import LoadRun, poisson_arrivals
+
+
+def test_poisson_arrivals_match_the_rate():
+    """
+    Test that seeded arrivals are reproducible, ordered, within the duration
+    and close to the target rate, with exponential gaps.
+    """
+    arrivals = list(poisson_arrivals(random.Random(0), 50, 100))
+    assert arrivals == list(poisson_arrivals(random.Random(0), 50, 100))
+    assert arrivals == sorted(arrivals) and 0 < arrivals[-1] < 100
+    assert abs(len(arrivals) - 5000) < 5000 * 0.05
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    assert abs(statistics.mean(gaps) - 0.02) < 0.02 * 0.05
+    assert abs(statistics.stdev(gaps) - 0.02) < 0.02 * 0.1
+
+
+def test_latency_is_measured_from_the_scheduled_send_time():
+    """
+    Test that a request sent late is charged the time it waited since it was
+    scheduled, while the latency from the actual send time leaves it out,
+    and that a learner resets its session after its last exchange.
+    """
+    requests = []
+
+    def backend(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, json={'complete': False})
+
+    load = LoadRun('http://backend', rps=1, duration=1, learners=1,
+                   exchanges_per_session=1, seed=0)
+    learner = load.idle.popleft()
+    session_id = learner.session_id
+
+    async def exchange():
+        async with httpx.AsyncClient(base_url='http://backend',
+                                     transport=httpx.MockTransport(backend)) \
+                as client:
+            scheduled = asyncio.get_running_loop().time() - 0.5
+            await load._exchange(client, learner, scheduled, measured=True)
+
+    asyncio.run(exchange())
+    assert load.corrected.count == load.uncorrected.count == 1
+    assert load.corrected.summary()['p50'] >= 500
+    assert load.uncorrected.summary()['p50'] < 250
+    assert load.max_send_lag >= 500
+    assert requests == ['/generate_conversation', '/reset_conversation']
+    assert learner.session_id != session_id and load.idle[0] is learner
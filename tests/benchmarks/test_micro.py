@@ -0,0 +1,48 @@
+""" Tests for the micro-benchmark suite. """
+
+import json
+import pytest
+from benchmarks import micro
+
+
+def test_micro_benchmarks_run():
+    """
+    Test that every micro-benchmark sets up and calls its target, so the
+    suite keeps up with the code it measures.
+    """
+    for name, setup in micro.BENCHMARKS.items():
+        try:
+            with setup() as function:
+                function()
+        except micro.SkipBenchmark:
+            assert name == 'evaluate.levenshtein_distance'
+
+
+def test_compare_flags_regressions(tmp_path, monkeypatch, capsys):
+    """
+    Test that the compare command exits with an error on a slowdown beyond
+    the threshold.
+
+    Args:
+        tmp_path (pathlib.Path): Temporary directory fixture.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch object.
+        capsys (pytest.CaptureFixture): The output capture fixture.
+    """
+    history = tmp_path / 'history.jsonl'
+    runs = [{'created': str(i), 'revision': str(i),
+             'results': {'bench': {'min_us': value, 'median_us': value,
+                                   'number': 1}}}
+            for i, value in enumerate([10.0, 10.5, 13.0])]
+    history.write_text(''.join(json.dumps(run) + '\n' for run in runs))
+
+    monkeypatch.setattr('sys.argv', ['micro', '--history', str(history),
+                                     'compare', '--against', '0'])
+    with pytest.raises(SystemExit) as excinfo:
+        micro.main()
+    assert excinfo.value.code == 1
+    assert 'REGRESSION' in capsys.readouterr().out
+
+    history.write_text(''.join(json.dumps(run) + '\n' for run in runs[:2]))
+    monkeypatch.setattr('sys.argv', ['micro', '--history', str(history),
+                                     'compare'])
+    micro.main()
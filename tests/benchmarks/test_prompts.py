@@ -0,0 +1,28 @@
+""" Tests for the prompt profile benchmark. """
+
+from backend.src.chatbot import COMPACT_PROMPT_TOKENS
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.prompts import run_case, summarize_profiles
+
+
+def test_compact_profile_prefills_fewer_tokens():
+    """
+    Test that compact prompts fit their budget and cut the prompt tokens of
+    every LLM call, in both learning modes.
+    """
+    server = FakeLLMServer(config=FakeLLMConfig(
+        latency=0, tokens_per_second=1e6, seed=0)).start()
+    try:
+        cases = [run_case(profile, 'Hindi', 'Advanced', mode, server.url)
+                 for profile in ('full', 'compact')
+                 for mode in ('Conversation', 'Debate')]
+    finally:
+        server.stop()
+
+    profiles = summarize_profiles(cases)
+    assert not any(case['over_budget'] for case in cases)
+    assert profiles['compact']['system_tokens'] <= COMPACT_PROMPT_TOKENS
+    assert profiles['compact']['system_tokens'] < \
+        profiles['full']['system_tokens'] / 2
+    assert profiles['compact']['prompt_tokens'] < profiles['full']['prompt_tokens']
+    assert profiles['compact']['exchanges'] == profiles['full']['exchanges'] == 4
@@ -0,0 +1,77 @@
+""" Tests for the replay of request logs. """
+
+import asyncio
+from backend.src.request_log import read_request_log
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+from benchmarks.harness import PAYLOAD, run_backend
+from benchmarks.replay import Replay, replay_requests
+
+
+def record(ts, endpoint, session_id, **fields):
+    """Build a request log record."""
+    return {'ts': ts, 'endpoint': endpoint, 'method': 'POST', 'status': 200,
+            'session_id': session_id, 'shape': {}, 'duration_ms': 10.0,
+            **fields}
+
+
+def test_replay_requests_keep_sessions_and_timing():
+    """
+    Test that replayed requests get fresh session ids, scaled offsets and
+    payloads rebuilt from their shape when none was logged.
+    """
+    records = [
+        record(100.0, '/generate_conversation', 'a',
+               shape={'language': 'German'}),
+        record(101.0, '/generate_conversation', 'b',
+               payload={**PAYLOAD, 'scenario': 'at the bakery'}),
+        record(104.0, '/reset_conversation', 'a'),
+        record(105.0, '/', 'a')
+    ]
+    sessions = replay_requests(records, speed=2, run_id='x')
+
+    assert list(sessions) == ['replay-x-0', 'replay-x-1']
+    first, reset = sessions['replay-x-0']
+    assert first['offset'] == 0 and reset['offset'] == 2.0
+    assert first['json']['language'] == 'German'
+    assert first['json']['role_dict'] == PAYLOAD['role_dict']
+    assert first['json']['session_id'] == 'replay-x-0'
+    assert reset['json'] is None
+    assert reset['params'] == {'session_id': 'replay-x-0'}
+    assert sessions['replay-x-1'][0]['json']['scenario'] == 'at the bakery'
+    assert replay_requests(records, speed=0, run_id='x')[
+        'replay-x-0'][1]['offset'] == 0
+
+
+def test_captured_log_replays_against_the_backend(tmp_path):
+    """
+    Test that traffic logged by the backend replays against it with the same
+    statuses.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    path = str(tmp_path / 'request_log.jsonl')
+    llm = FakeLLMServer(config=FakeLLMConfig(
+        latency=0, tokens_per_second=1e6, seed=0)).start()
+    try:
+        with run_backend(llm.url, env={'REQUEST_LOG': path}) as url:
+            sessions = replay_requests(records=[
+                record(0.0, '/generate_conversation', 'a'),
+                record(0.1, '/generate_conversation', 'a'),
+                record(0.2, '/generate_summary', 'a'),
+                record(0.3, '/reset_conversation', 'a')
+            ], speed=0)
+            asyncio.run(Replay(url, sessions).run())
+            captured = read_request_log(path)
+            results = asyncio.run(Replay(url, replay_requests(captured)).run())
+    finally:
+        llm.stop()
+
+    assert [entry['endpoint'] for entry in captured] == [
+        '/generate_conversation', '/generate_conversation',
+        '/generate_summary', '/reset_conversation']
+    assert captured[0]['tokens']['prompt_tokens'] > 0
+    assert results['sessions'] == 1 and results['requests'] == 4
+    for summary in results['endpoints'].values():
+        assert summary['errors'] == 0 and summary['status_changes'] == 0
+    assert results['endpoints']['/generate_conversation']['latency']['count'] == 2
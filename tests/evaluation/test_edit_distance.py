@@ -0,0 +1,41 @@
+""" Tests for the edit-distance engine of the evaluation. """
+
+import random
+from evaluation.edit_distance import (
+    levenshtein_distance, levenshtein_distance_dp, levenshtein_distances,
+    levenshtein_to_many
+)
+
+
+def _random_text(rng, alphabet, max_length):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randrange(max_length)))
+
+
+def test_matches_the_dynamic_program():
+    """
+    Test that the bit-parallel distance equals the original dynamic program,
+    including empty, non-Latin and long strings.
+    """
+    rng = random.Random(0)
+    pairs = [("", ""), ("", "abc"), ("kitten", "sitting"),
+             ("नमस्ते दोस्त", "नमस्ते"), ("x" * 300 + "ab" * 50, "ab" * 120)]
+    pairs += [(_random_text(rng, "abcé ह", 80), _random_text(rng, "abcé ह", 80))
+              for _ in range(500)]
+    for s1, s2 in pairs:
+        expected = levenshtein_distance_dp(s1, s2)
+        assert levenshtein_distance(s1, s2) == expected
+        assert levenshtein_distance(s2, s1) == expected
+        assert levenshtein_to_many(s1, [s2]) == [expected]
+
+
+def test_batch_api():
+    """
+    Test that the batch API returns the distances in order, with and without
+    worker processes.
+    """
+    rng = random.Random(1)
+    pairs = [(_random_text(rng, "abcd", 30), _random_text(rng, "abcd", 30))
+             for _ in range(600)]
+    expected = [levenshtein_distance_dp(s1, s2) for s1, s2 in pairs]
+    assert levenshtein_distances(pairs) == expected
+    assert levenshtein_distances(pairs, processes=2) == expected
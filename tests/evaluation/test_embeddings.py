@@ -0,0 +1,74 @@
+""" Tests for the batched, cached embedding scorer of the evaluation. """
+
+import numpy as np
+import pytest
+from evaluation.embeddings import EmbeddingScorer, mean_pool
+
+
+class CountingScorer(EmbeddingScorer):
+    """
+    An EmbeddingScorer with a deterministic stand-in for the model, which
+    records the texts it encodes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def _encode(self, texts):
+        self.calls.append(list(texts))
+        vectors = np.array([[len(text), text.count('a') + 1.0, 1.0]
+                            for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_reference_embeddings_are_cached_on_disk(tmp_path):
+    """
+    Test that reference embeddings are encoded once, in one batch, and read
+    from disk by later scorers of the same model only.
+
+    Args:
+        tmp_path (pathlib.Path): Temporary directory fixture.
+    """
+    references = ["a banana", "an apple", "a banana"]
+    scorer = CountingScorer("model-a", cache_dir=str(tmp_path))
+    first = scorer.embed(references, cache=True)
+    assert scorer.calls == [["a banana", "an apple"]]
+    np.testing.assert_array_equal(first[0], first[2])
+
+    again = CountingScorer("model-a", cache_dir=str(tmp_path))
+    np.testing.assert_allclose(again.embed(references, cache=True), first)
+    assert again.calls == []
+
+    other_model = CountingScorer("model-b", cache_dir=str(tmp_path))
+    other_model.embed(references, cache=True)
+    assert other_model.calls == [["a banana", "an apple"]]
+
+
+def test_similarity_matrix_and_pairs(tmp_path):
+    """
+    Test that the similarity matrix holds the cosine similarity of every
+    pair and that its diagonal matches the pairwise scores.
+
+    Args:
+        tmp_path (pathlib.Path): Temporary directory fixture.
+    """
+    scorer = CountingScorer(cache_dir=str(tmp_path))
+    texts = ["banana bread", "hello", "aaa"]
+    references = ["banana cake", "hi there", "a"]
+    matrix = scorer.similarity_matrix(texts, references)
+    assert matrix.shape == (3, 3)
+    np.testing.assert_allclose(np.diag(matrix),
+                               scorer.pairwise_similarity(texts, references),
+                               rtol=1e-6)
+    assert np.all(matrix <= 1 + 1e-6)
+
+
+def test_mean_pool_ignores_padding():
+    """
+    Test that padding tokens do not change a text's pooled embedding.
+    """
+    torch = pytest.importorskip("torch")
+    hidden = torch.tensor([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]])
+    pooled = mean_pool(hidden, torch.tensor([[1, 1, 0]]))
+    assert torch.allclose(pooled, torch.tensor([[2.0, 3.0]]))
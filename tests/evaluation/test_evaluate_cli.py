@@ -0,0 +1,102 @@
+""" Tests for the command line of evaluate.py. """
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+import evaluate
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+# Define the modules that importing evaluate.py must not load: the models,
+# the plotting and table libraries and the backend, only needed by the stages
+HEAVY_MODULES = ('torch', 'transformers', 'nltk', 'matplotlib', 'seaborn',
+                 'pandas', 'numpy', 'openai', 'tqdm', 'backend', 'src')
+
+
+def test_import_loads_no_heavy_module():
+    """
+    Test that importing evaluate.py loads no heavy dependency, so --help and
+    the stages that do not need them start at once.
+    """
+    code = (
+        "import sys\n"
+        "import evaluate\n"
+        f"heavy = {{m.split('.')[0] for m in sys.modules}} & set({HEAVY_MODULES!r})\n"
+        "print(','.join(sorted(heavy)))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == ''
+
+
+def test_help_runs_without_models():
+    """
+    Test that --help lists the stages without loading any model.
+    """
+    result = subprocess.run([sys.executable, "evaluate.py", "--help"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True,
+                            timeout=30)
+    assert result.returncode == 0
+    assert "latency,load,quality,plots" in result.stdout
+
+
+def test_quality_stage_scores_saved_outputs(tmp_path):
+    """
+    Test that the quality stage scores the outputs saved by the latency
+    stage, here without the embedding model.
+
+    Args:
+        tmp_path (pathlib.Path): Temporary directory fixture.
+    """
+    evaluate.save_stage(str(tmp_path), "latency", {"cases": [
+        {"input": "Hi", "expected": "kitten", "output": "sitting",
+         "latency": 1.0, "llm_calls": []}
+    ]})
+    evaluate.main(["quality", "--results-dir", str(tmp_path), "--skip-embeddings"])
+    with open(tmp_path / "quality.json") as f:
+        assert json.load(f) == {"levenshtein_scores": [3], "similarity_scores": []}
+
+
+def test_token_timings_group_streamed_calls_by_purpose():
+    """
+    Test that the per-call token timings reported by the backend are grouped
+    by purpose, skipping calls that were not streamed.
+    """
+    cases = [{"llm_calls": [
+        {"purpose": "turn", "ttft_ms": 80.0, "itl_ms": 5.0,
+         "decode_tokens_per_second": 200.0},
+        {"purpose": "translate", "ttft_ms": 40.0, "itl_ms": None,
+         "decode_tokens_per_second": None},
+        {"purpose": "turn", "streamed": False}
+    ]}, {"llm_calls": None}]
+    assert evaluate.token_timings(cases) == {
+        "ttft_ms": {"turn": [80.0], "translate": [40.0]},
+        "itl_ms": {"turn": [5.0]},
+        "decode_tokens_per_second": {"turn": [200.0]}
+    }
+
+
+def test_load_requests_use_sessions_of_their_own(monkeypatch):
+    """
+    Test that the concurrent requests of the load test each open their own
+    session rather than advancing a shared one.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    pytest.importorskip("tqdm")
+    payloads = []
+
+    def measure_latency(endpoint, payload):
+        payloads.append(payload)
+        return 0.1, {}
+
+    monkeypatch.setattr(evaluate, "measure_latency", measure_latency)
+    assert evaluate.load_test("generate_conversation", evaluate.PAYLOAD, 8) \
+        == [0.1] * 8
+    assert len({payload["session_id"] for payload in payloads}) == 8
+    assert not any("input_text" in payload for payload in payloads)
+    assert "session_id" not in evaluate.PAYLOAD
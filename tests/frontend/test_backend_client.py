@@ -0,0 +1,85 @@
+""" Tests for the backend client and the pipelining of exchanges. """
+
+import threading
+import time
+import pytest
+import requests
+import requests_mock
+from frontend.src.backend_client import BackendClient, prefetch
+
+
+def test_client_reuses_one_session():
+    """
+    Test that the client sends its requests through one pooled session,
+    raises on error statuses and reads streamed fan-out sessions.
+    """
+    client = BackendClient("http://backend:8000/")
+    with requests_mock.Mocker(session=client.session) as m:
+        m.post('http://backend:8000/generate_conversation',
+               json={"response1": "Hola", "response2": "Buenas"})
+        m.post('http://backend:8000/generate_summary', status_code=500)
+        m.post('http://backend:8000/generate_fanout',
+               text='{"language": "Hindi"}\n\n{"language": "German"}\n')
+        assert client.generate_conversation({})["response1"] == "Hola"
+        assert client.generate_conversation({})["response2"] == "Buenas"
+        with pytest.raises(requests.HTTPError):
+            client.generate_summary({})
+        assert [session["language"] for session in
+                client.generate_fanout({})] == ["Hindi", "German"]
+    assert m.call_count == 4
+
+
+def test_prefetch_overlaps_fetching_with_displaying():
+    """
+    Test that the next result is fetched while the previous one is used,
+    that fetches never overlap, and that nothing is fetched after a stop.
+    """
+    running, overlaps, calls = [0], [], []
+    lock = threading.Lock()
+
+    def fetch():
+        with lock:
+            running[0] += 1
+            overlaps.append(running[0] > 1)
+        time.sleep(0.1)
+        calls.append(len(calls))
+        with lock:
+            running[0] -= 1
+        return {"index": calls[-1], "complete": calls[-1] == 3}
+
+    start = time.perf_counter()
+    results = []
+    for result in prefetch(fetch, 8, stop=lambda result: result["complete"]):
+        time.sleep(0.1)  # Display the exchange
+        results.append(result["index"])
+    elapsed = time.perf_counter() - start
+
+    assert results == [0, 1, 2, 3]
+    assert len(calls) == 4 and not any(overlaps)
+    # Four fetches and four displays of 0.1 s each take about 0.5 s when
+    # they overlap, instead of 0.8 s
+    assert elapsed < 0.7
+
+
+def test_only_idempotent_exchange_requests_are_retried():
+    """
+    Test that an exchange request naming its exchange_index is retried after
+    a timeout, while one without it is not.
+    """
+    client = BackendClient("http://backend:8000")
+    with requests_mock.Mocker(session=client.session) as m:
+        m.post('http://backend:8000/generate_conversation',
+               [{'exc': requests.exceptions.ReadTimeout},
+                {'json': {"response1": "Hola"}}])
+        assert client.generate_conversation(
+            {"exchange_index": 0})["response1"] == "Hola"
+        assert m.call_count == 2
+
+        m.post('http://backend:8000/generate_conversation',
+               exc=requests.exceptions.ConnectionError)
+        with pytest.raises(requests.ConnectionError):
+            client.generate_conversation({})
+        assert m.call_count == 3
+        with pytest.raises(requests.ConnectionError):
+            client.generate_conversation({"exchange_index": 1}, retries=1)
+        assert m.call_count == 5
@@ -1,8 +1,8 @@
 """ Tests for the conversation module. """
 
 from unittest import mock
-import streamlit as st
 from frontend.src.conversation import generate_conversation, setup_conversation
+from frontend.src.conversation import set_exchange_flag
 
 
 def test_generate_conversation(mock_backend_server):
@@ -36,7 +36,6 @@ def test_setup_conversation(mock_backend_server, mock_streamlit):
     """
     mock_container, mock_column, mock_session_state = mock_streamlit
     conversation_container = mock_container.return_value
-    translate_col, original_col, audio_col = st.columns(3)
 
     # Clear the session state before the test
     mock_session_state.clear()
@@ -59,8 +58,7 @@ def test_setup_conversation(mock_backend_server, mock_streamlit):
                             "translate2": "Hi there"
                         }):
             setup_conversation(
-                conversation_container, translate_col, original_col, audio_col,
-                "Conversation",
+                conversation_container, "Conversation",
                 {'role1': {'name': 'Customer'}, 'role2': {'name': 'Waitstaff'}},
                 "English", "at a restaurant", "Beginner", "Short", 2
             )
@@ -78,3 +76,100 @@ def test_setup_conversation(mock_backend_server, mock_streamlit):
     assert isinstance(mock_session_state['bot1_mesg'], list)
     assert isinstance(mock_session_state['bot2_mesg'], list)
     assert mock_session_state['first_time_exec'] is False
+
+
+def test_setup_conversation_stops_when_complete(mock_backend_server, mock_streamlit):
+    """
+    Test that setup_conversation skips the remaining exchanges once the backend
+    marks the conversation as complete.
+
+    Args:
+        mock_backend_server (fixture): Mocked backend server fixture.
+        mock_streamlit (fixture): Mocked Streamlit fixture.
+    """
+    mock_container, mock_column, mock_session_state = mock_streamlit
+    mock_session_state.clear()
+    mock_session_state['translate_flag'] = False
+    mock_session_state['batch_flag'] = False
+    mock_session_state['audio_flag'] = False
+
+    with mock.patch('streamlit.sidebar.button', return_value=True), \
+            mock.patch('frontend.src.conversation.show_messages', return_value=2), \
+            mock.patch('frontend.src.conversation.generate_conversation',
+                       return_value={
+                           "response1": "Goodbye",
+                           "response2": "Bye",
+                           "translate1": "Goodbye",
+                           "translate2": "Bye",
+                           "complete": True
+                       }) as mock_generate:
+        setup_conversation(
+            mock_container.return_value, "Conversation",
+            {'role1': {'name': 'Customer'}, 'role2': {'name': 'Waitstaff'}},
+            "English", "at a restaurant", "Beginner", "Short", 0
+        )
+
+    assert mock_generate.call_count == 1
+    assert len(mock_session_state['bot1_mesg']) == 1
+
+
+def test_rerun_displays_history_without_generating(mock_streamlit):
+    """
+    Test that a rerun, e.g. after clicking a button, displays the stored
+    exchanges at once without contacting the backend, each with its own
+    toggles starting from the flags of the conversation.
+
+    Args:
+        mock_streamlit (fixture): Mocked Streamlit fixture.
+    """
+    mock_container, mock_column, mock_session_state = mock_streamlit
+    mock_column.button.return_value = False
+    mesgs = [{"id": f"s-{index}-1", "role": "Customer", "content": "Hola",
+              "translation": "Hello", "language": "Spanish"}
+             for index in range(2)]
+    mock_session_state.clear()
+    mock_session_state.update({
+        'dual_chatbots': True, 'first_time_exec': False, 'summary': "Summary",
+        'bot1_mesg': mesgs, 'bot2_mesg': mesgs, 's-1-1-translate': False,
+        'translate_flag': True, 'batch_flag': True, 'audio_flag': False
+    })
+
+    with mock.patch('streamlit.sidebar.button', return_value=False), \
+            mock.patch('streamlit.toggle',
+                       side_effect=lambda label, key: mock_session_state[key]), \
+            mock.patch('frontend.src.conversation.show_messages') as mock_show, \
+            mock.patch('frontend.src.conversation.generate_conversation') \
+            as mock_generate:
+        setup_conversation(
+            mock_container.return_value, "Conversation",
+            {'role1': {'name': 'Customer'}, 'role2': {'name': 'Waitstaff'}},
+            "Spanish", "at a restaurant", "Beginner", "Short", 2
+        )
+
+    assert mock_generate.call_count == 0
+    assert mock_show.call_count == 2
+    assert all(call.kwargs['batch'] and not call.kwargs['audio']
+               for call in mock_show.call_args_list)
+    assert [call.kwargs['translation'] for call in mock_show.call_args_list] \
+        == [True, False]
+    assert mock_session_state['message_counter'] == 4
+
+
+def test_buttons_set_the_toggles_of_every_exchange(mock_streamlit):
+    """
+    Test that the buttons of the conversation set the toggles of each of its
+    exchanges.
+
+    Args:
+        mock_streamlit (fixture): Mocked Streamlit fixture.
+    """
+    _, _, mock_session_state = mock_streamlit
+    mock_session_state.clear()
+    mock_session_state.update({
+        'bot1_mesg': [{"id": "s-0-1"}, {"id": "s-1-1"}], 's-0-1-audio': False,
+        'translate_flag': False, 'audio_flag': False
+    })
+    set_exchange_flag('audio', True)
+    assert mock_session_state['audio_flag'] is True
+    assert mock_session_state['s-0-1-audio'] is True
+    assert mock_session_state['s-1-1-audio'] is True
@@ -60,3 +60,28 @@ def test_text_to_speech():
         # Assert that the result is a BytesIO object
         assert isinstance(result, BytesIO)
         mock_gtts.assert_called_once_with(text="Hello", lang="en")
+
+
+def test_message_audio_is_synthesized_once_per_message(mock_streamlit):
+    """
+    Test that the audio of a message is synthesized on its first display only
+    and that its blocks are keyed by the message id.
+
+    Args:
+        mock_streamlit (fixture): Mocked Streamlit fixture.
+    """
+    mock_container, mock_column, mock_session_state = mock_streamlit
+    mesg_1 = {"id": "s-0-1", "role": "Customer", "content": "Hola",
+              "translation": "Hello", "language": "Spanish"}
+    mesg_2 = {"id": "s-0-2", "role": "Waitstaff", "content": "Buenas",
+              "translation": "Good evening", "language": "Spanish"}
+    with mock.patch('frontend.src.utils.gTTS') as mock_gtts, \
+            mock.patch('frontend.src.utils.message') as mock_message, \
+            mock.patch('streamlit.audio') as mock_audio:
+        for _ in range(3):
+            show_messages(mesg_1, mesg_2, 0, time_delay=0, batch=True,
+                          audio=True, translation=True)
+    assert mock_gtts.call_count == 2
+    assert mock_audio.call_count == 6
+    keys = [call.kwargs['key'] for call in mock_message.call_args_list[:4]]
+    assert keys == ["s-0-1", "s-0-1-translation", "s-0-2", "s-0-2-translation"]